@@ -5,23 +5,35 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Iterable, Iterator, List, Optional
+import asyncio
 import json
 from pathlib import Path
 import uuid
-from datetime import datetime
-import io
+import zlib
+from datetime import datetime, timedelta
 
 from auth import get_current_user, require_role
+from core.json_writer import get_json_writer
+from core.question_bank import question_bank
+from schemas import QuestionMetadata, parse_question
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 DATA_DIR = Path(__file__).parent / "data"
-QUESTIONS_FILE = DATA_DIR / "questions.json"
 TAGS_FILE = DATA_DIR / "tags.json"
 IMPORT_TASKS_FILE = DATA_DIR / "import_tasks.json"
 DATA_DIR.mkdir(exist_ok=True)
 
+tags_writer = get_json_writer(TAGS_FILE, lambda: {"tags": []})
+import_tasks_writer = get_json_writer(IMPORT_TASKS_FILE, lambda: {"tasks": []})
+
+# 导出时每个响应分块的大小（字节）
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# 题目的读取-修改-写回在进程内串行执行，避免并发编辑同一题目时互相覆盖
+_question_edits = asyncio.Lock()
+
 class QuestionUpdate(BaseModel):
     type: Optional[str] = None
     difficulty: Optional[str] = None
@@ -58,109 +70,105 @@ class ExportFilters(BaseModel):
 async def get_questions(page: int = Query(1, ge=1), pageSize: int = Query(20, ge=1, le=100),
                        status: Optional[str] = None, type: Optional[str] = None,
                        taskId: Optional[str] = None, keyword: Optional[str] = None,
+                       keywordMode: str = Query("and", pattern="^(and|or)$"),
                        current_user: dict = Depends(get_current_user)):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        questions = []
-    filtered = questions
-    if status:
-        filtered = [q for q in filtered if q.get('status') == status]
-    if type:
-        filtered = [q for q in filtered if q.get('type') == type]
-    if taskId:
-        filtered = [q for q in filtered if q.get('sourceTaskId') == taskId]
-    if keyword:
-        keyword_lower = keyword.lower()
-        filtered = [q for q in filtered if keyword_lower in q.get('stemMarkdown', q.get('question', '')).lower()]
-    total = len(filtered)
-    start = (page - 1) * pageSize
-    end = start + pageSize
-    paginated = filtered[start:end]
+    """
+    题目列表
+
+    keyword 通过题库的全文检索索引匹配题干、选项和解析，结果按相关度排序；
+    多个关键词以空格分隔，keywordMode=and 要求全部命中，or 命中任一即可，
+    也可在关键词之间写 OR（如 "函数 单调 OR 导数"）
+    """
+    def list_page():
+        # 筛选走题库的索引（包括管理端录入的不完整记录），只读取当前页的题目
+        store = _question_store()
+        ids = _question_ids(
+            statuses=[status] if status else None,
+            question_types=[type] if type else None,
+            source_task_ids=[taskId] if taskId else None,
+        )
+        if keyword:
+            matched = set(ids)
+            ids = [qid for qid in store.search_ids(keyword, keywordMode, include_incomplete=True) if qid in matched]
+        start = (page - 1) * pageSize
+        questions = (store.get(qid, include_incomplete=True) for qid in ids[start:start + pageSize])
+        return [_question_dict(q) for q in questions if q is not None], len(ids)
+
+    paginated, total = await asyncio.to_thread(list_page)
     return {"questions": paginated, "total": total, "page": page, "pageSize": pageSize}
 
+def _question_store():
+    """获取共享题库（配置的存储后端，必要时先从文件重新加载）；管理端的题目读写都经由它"""
+    question_bank.reload_if_changed()
+    return question_bank
+
+def _question_dict(question: QuestionMetadata) -> dict:
+    """题目转换为接口返回的字典（只包含记录中实际存在的字段）"""
+    return question.model_dump(mode='json', exclude_unset=True, warnings=False)
+
+def _updated(question: QuestionMetadata, update_dict: dict) -> QuestionMetadata:
+    """合并更新字段后的题目（重新解析，字段补齐后可能成为完整的题目）"""
+    item = _question_dict(question)
+    item.update(update_dict)
+    return parse_question(item)
+
+def _question_ids(**filters) -> List[str]:
+    """符合筛选条件的题目ID（包括不完整的记录，筛选参数同 iter_query）"""
+    return [qid for _, qid in _question_store().iter_query_ids(include_incomplete=True, **filters)]
+
 @router.get("/questions/{question_id}")
 async def get_question(question_id: str, current_user: dict = Depends(get_current_user)):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
+    question = _question_store().get(question_id, include_incomplete=True)
+    if question is None:
         raise HTTPException(status_code=404, detail="题目未找到")
-    for q in questions:
-        if q.get('questionId') == question_id or q.get('id') == question_id:
-            return q
-    raise HTTPException(status_code=404, detail="题目未找到")
+    return _question_dict(question)
 
 @router.post("/questions")
 async def create_question(question: dict, current_user: dict = Depends(require_role(["admin", "operator"]))):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        questions = []
     question_id = question.get('id') or question.get('questionId') or f"q_{uuid.uuid4().hex[:8]}"
     question['id'] = question_id
     question['questionId'] = question_id
     question['createdBy'] = current_user['id']
     question['createdAt'] = datetime.now().isoformat()
     question['updatedAt'] = datetime.now().isoformat()
-    questions.append(question)
-    with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
+    try:
+        await asyncio.to_thread(_question_store().add, parse_question(question))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return question
 
 @router.put("/questions/{question_id}")
 async def update_question(question_id: str, updates: QuestionUpdate,
                         current_user: dict = Depends(get_current_user)):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="题目未找到")
-    for i, q in enumerate(questions):
-        if q.get('questionId') == question_id or q.get('id') == question_id:
-            update_dict = updates.dict(exclude_unset=True)
-            questions[i].update(update_dict)
-            questions[i]['updatedAt'] = datetime.now().isoformat()
-            with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(questions, f, ensure_ascii=False, indent=2)
-            return questions[i]
-    raise HTTPException(status_code=404, detail="题目未找到")
+    update_dict = updates.dict(exclude_unset=True)
+    def apply():
+        store = _question_store()
+        question = store.get(question_id, include_incomplete=True)
+        if question is None:
+            raise HTTPException(status_code=404, detail="题目未找到")
+        return _question_dict(store.update(_updated(question, update_dict)))
+    async with _question_edits:
+        return await asyncio.to_thread(apply)
 
 @router.delete("/questions/{question_id}")
 async def delete_question(question_id: str, current_user: dict = Depends(require_role(["admin"]))):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="题目未找到")
-    original_count = len(questions)
-    questions = [q for q in questions if q.get('questionId') != question_id and q.get('id') != question_id]
-    if len(questions) == original_count:
+    if not await asyncio.to_thread(_question_store().delete, question_id):
         raise HTTPException(status_code=404, detail="题目未找到")
-    with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
     return {"message": "删除成功"}
 
 @router.post("/questions/batch-update")
 async def batch_update_questions(request: BatchUpdateRequest,
                                 current_user: dict = Depends(require_role(["admin", "operator"]))):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="题目未找到")
-    updated_count = 0
     update_dict = request.updates.dict(exclude_unset=True)
-    for i, q in enumerate(questions):
-        if q.get('questionId') in request.questionIds or q.get('id') in request.questionIds:
-            questions[i].update(update_dict)
-            questions[i]['updatedAt'] = datetime.now().isoformat()
-            updated_count += 1
-    if updated_count > 0:
-        with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(questions, f, ensure_ascii=False, indent=2)
+    def apply():
+        store = _question_store()
+        questions = (store.get(qid, include_incomplete=True) for qid in dict.fromkeys(request.questionIds))
+        changed = [_updated(q, update_dict) for q in questions if q is not None]
+        if changed:
+            store.upsert_many(changed)
+        return len(changed)
+    async with _question_edits:
+        updated_count = await asyncio.to_thread(apply)
     return {"updated": updated_count}
 
 @router.get("/import-tasks")
@@ -196,14 +204,7 @@ async def create_import_task(file: UploadFile = File(...), sourceType: str = Que
            "sourceFilePath": str(file_path), "sourceType": sourceType,
            "totalQuestions": 0, "status": "pending", "createdBy": current_user['id'],
            "createdAt": datetime.now().isoformat(), "updatedAt": datetime.now().isoformat()}
-    try:
-        with open(IMPORT_TASKS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        data = {"tasks": []}
-    data["tasks"].append(task)
-    with open(IMPORT_TASKS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    await import_tasks_writer.submit(lambda data: data.setdefault("tasks", []).append(task))
     return {"taskId": task_id, "status": "pending"}
 
 @router.get("/import-tasks/{task_id}")
@@ -215,13 +216,7 @@ async def get_import_task(task_id: str, current_user: dict = Depends(require_rol
         raise HTTPException(status_code=404, detail="任务未找到")
     for task in tasks:
         if task.get('id') == task_id:
-            try:
-                with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                    questions = json.load(f)
-                question_ids = [q.get('id') or q.get('questionId') for q in questions if q.get('sourceTaskId') == task_id]
-                task['questions'] = question_ids
-            except:
-                task['questions'] = []
+            task['questions'] = _question_ids(source_task_ids=[task_id])
             return task
     raise HTTPException(status_code=404, detail="任务未找到")
 
@@ -232,25 +227,15 @@ async def reprocess_task(task_id: str, current_user: dict = Depends(require_role
 @router.delete("/import-tasks/{task_id}")
 async def delete_import_task(task_id: str, deleteQuestions: bool = Query(False),
                             current_user: dict = Depends(require_role(["admin"]))):
-    try:
-        with open(IMPORT_TASKS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            tasks = data.get('tasks', [])
-    except FileNotFoundError:
+    if not IMPORT_TASKS_FILE.exists():
         raise HTTPException(status_code=404, detail="任务未找到")
-    tasks = [t for t in tasks if t.get('id') != task_id]
-    data["tasks"] = tasks
-    with open(IMPORT_TASKS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    def apply_tasks(data):
+        data["tasks"] = [t for t in data.get('tasks', []) if t.get('id') != task_id]
+    await import_tasks_writer.submit(apply_tasks)
     if deleteQuestions:
-        try:
-            with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-                questions = json.load(f)
-            questions = [q for q in questions if q.get('sourceTaskId') != task_id]
-            with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(questions, f, ensure_ascii=False, indent=2)
-        except:
-            pass
+        def delete_questions():
+            _question_store().delete_many(_question_ids(source_task_ids=[task_id]))
+        await asyncio.to_thread(delete_questions)
     return {"message": "删除成功"}
 
 @router.get("/tags")
@@ -266,76 +251,69 @@ async def get_tags(type: Optional[str] = None, current_user: dict = Depends(get_
 
 @router.post("/tags")
 async def create_tag(tag: CreateTagRequest, current_user: dict = Depends(require_role(["admin", "teacher"]))):
-    try:
-        with open(TAGS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            tags = data.get('tags', [])
-    except FileNotFoundError:
-        data = {"tags": []}
-        tags = []
-    new_tag = {"id": uuid.uuid4().hex[:8], "name": tag.name, "type": tag.type,
-              "parentId": tag.parentId, "order": len(tags), "usageCount": 0,
-              "createdAt": datetime.now().isoformat(), "updatedAt": datetime.now().isoformat()}
-    tags.append(new_tag)
-    data["tags"] = tags
-    with open(TAGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    return new_tag
+    def apply(data):
+        tags = data.setdefault("tags", [])
+        new_tag = {"id": uuid.uuid4().hex[:8], "name": tag.name, "type": tag.type,
+                  "parentId": tag.parentId, "order": len(tags), "usageCount": 0,
+                  "createdAt": datetime.now().isoformat(), "updatedAt": datetime.now().isoformat()}
+        tags.append(new_tag)
+        return new_tag
+    return await tags_writer.submit(apply)
 
 @router.put("/tags/{tag_id}")
 async def update_tag(tag_id: str, updates: UpdateTagRequest,
                     current_user: dict = Depends(require_role(["admin", "teacher"]))):
-    try:
-        with open(TAGS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            tags = data.get('tags', [])
-    except FileNotFoundError:
+    update_dict = updates.dict(exclude_unset=True)
+    def apply(data):
+        tags = data.get('tags', [])
+        for i, tag in enumerate(tags):
+            if tag.get('id') == tag_id:
+                tags[i].update(update_dict)
+                tags[i]['updatedAt'] = datetime.now().isoformat()
+                return dict(tags[i])
         raise HTTPException(status_code=404, detail="标签未找到")
-    for i, tag in enumerate(tags):
-        if tag.get('id') == tag_id:
-            update_dict = updates.dict(exclude_unset=True)
-            tags[i].update(update_dict)
-            tags[i]['updatedAt'] = datetime.now().isoformat()
-            data["tags"] = tags
-            with open(TAGS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
-            return tags[i]
-    raise HTTPException(status_code=404, detail="标签未找到")
+    return await tags_writer.submit(apply)
 
 @router.delete("/tags/{tag_id}")
 async def delete_tag(tag_id: str, current_user: dict = Depends(require_role(["admin"]))):
-    try:
-        with open(TAGS_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            tags = data.get('tags', [])
-    except FileNotFoundError:
+    if not TAGS_FILE.exists():
         raise HTTPException(status_code=404, detail="标签未找到")
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-        affected = sum(1 for q in questions if tag_id in q.get('chapterIds', []) or tag_id in q.get('knowledgePointIds', []))
-    except:
-        affected = 0
-    tags = [t for t in tags if t.get('id') != tag_id]
-    data["tags"] = tags
-    with open(TAGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    affected = len(set(_question_ids(chapter_ids=[tag_id])) | set(_question_ids(knowledge_point_ids=[tag_id])))
+    def apply(data):
+        data["tags"] = [t for t in data.get('tags', []) if t.get('id') != tag_id]
+    await tags_writer.submit(apply)
     return {"success": True, "affectedQuestions": affected}
 
-@router.post("/export/sft-jsonl")
-async def export_sft_jsonl(filters: ExportFilters, current_user: dict = Depends(require_role(["admin"]))):
+def _parse_export_date(value: Optional[str], end: bool = False) -> Optional[datetime]:
+    """解析导出的日期条件；只有日期的结束时间包含当天整天"""
+    if not value:
+        return None
     try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        questions = []
-    filtered = questions
-    if filters.status:
-        filtered = [q for q in filtered if q.get('status') in filters.status]
-    if filters.type:
-        filtered = [q for q in filtered if q.get('type') in filters.type]
-    lines = []
-    for q in filtered:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"日期格式不正确: {value}")
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def _iter_export_questions(filters: ExportFilters) -> Iterator[dict]:
+    """按导出条件逐条产出题目（通过题库索引筛选，包括管理端录入的不完整记录；条件在开始输出前校验）"""
+    created_from = _parse_export_date(filters.startDate)
+    created_to = _parse_export_date(filters.endDate, end=True)
+    matches = _question_store().iter_query(
+        statuses=filters.status,
+        question_types=filters.type,
+        chapter_ids=filters.chapterIds,
+        knowledge_point_ids=filters.knowledgePointIds,
+        created_from=created_from,
+        created_to=created_to,
+        include_incomplete=True,
+    )
+    return (_question_dict(question) for _, question in matches)
+
+def _iter_sft_lines(questions: Iterable[dict]) -> Iterator[str]:
+    """每道题转换为一行SFT训练样本"""
+    for q in questions:
         prompt = f"题目：{q.get('stemMarkdown', q.get('question', ''))}\\n"
         if q.get('options'):
             prompt += "选项：\\n"
@@ -345,23 +323,49 @@ async def export_sft_jsonl(filters: ExportFilters, current_user: dict = Depends(
         if q.get('solutionMarkdown') or q.get('solution'):
             completion += f"解析：{q.get('solutionMarkdown', q.get('solution', ''))}"
         sft_record = {"prompt": prompt, "completion": completion}
-        lines.append(json.dumps(sft_record, ensure_ascii=False))
-    content = "\\n".join(lines)
-    return StreamingResponse(io.BytesIO(content.encode('utf-8')), media_type="application/jsonl",
-                           headers={"Content-Disposition": f"attachment; filename=export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"})
+        yield json.dumps(sft_record, ensure_ascii=False) + "\n"
+
+def _iter_json_array(questions: Iterable[dict]) -> Iterator[str]:
+    """逐条输出与 json.dumps(questions, ensure_ascii=False, indent=2) 相同的文本"""
+    first = True
+    for q in questions:
+        item = json.dumps(q, ensure_ascii=False, indent=2).replace("\n", "\n  ")
+        yield ("[\n  " if first else ",\n  ") + item
+        first = False
+    yield "[]" if first else "\n]"
+
+def _chunked(pieces: Iterable[str], compress: bool) -> Iterator[bytes]:
+    """把文本片段编码并合并成固定大小的块，可选gzip压缩"""
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = bytearray()
+    for piece in pieces:
+        data = piece.encode('utf-8')
+        buffer += compressor.compress(data) if compressor else data
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if compressor:
+        buffer += compressor.flush()
+    if buffer:
+        yield bytes(buffer)
+
+def _export_response(pieces: Iterable[str], media_type: str, extension: str, compress: bool) -> StreamingResponse:
+    """构造分块传输的导出下载响应"""
+    filename = f"export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(_chunked(pieces, compress), media_type=media_type,
+                           headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+@router.post("/export/sft-jsonl")
+async def export_sft_jsonl(filters: ExportFilters, gzip: bool = False,
+                           current_user: dict = Depends(require_role(["admin"]))):
+    questions = _iter_export_questions(filters)
+    return _export_response(_iter_sft_lines(questions), "application/jsonl", "jsonl", gzip)
 
 @router.post("/export/questions-json")
-async def export_questions_json(filters: ExportFilters, current_user: dict = Depends(require_role(["admin"]))):
-    try:
-        with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-            questions = json.load(f)
-    except FileNotFoundError:
-        questions = []
-    filtered = questions
-    if filters.status:
-        filtered = [q for q in filtered if q.get('status') in filters.status]
-    if filters.type:
-        filtered = [q for q in filtered if q.get('type') in filters.type]
-    content = json.dumps(filtered, ensure_ascii=False, indent=2)
-    return StreamingResponse(io.BytesIO(content.encode('utf-8')), media_type="application/json",
-                           headers={"Content-Disposition": f"attachment; filename=export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"})
+async def export_questions_json(filters: ExportFilters, gzip: bool = False,
+                                current_user: dict = Depends(require_role(["admin"]))):
+    questions = _iter_export_questions(filters)
+    return _export_response(_iter_json_array(questions), "application/json", "json", gzip)
@@ -0,0 +1,569 @@
+"""
+作答记录列式存储模块
+每条作答记录拆成定长的整数列，字符串按字典编码：
+    student      int32   学生下标（字典 students）
+    question     int32   题目下标（字典 questions）
+    correct      bool    是否正确
+    time_spent   int16   用时（秒，超出范围的按上下限截断）
+    answered_at  int64   作答时间（1970-01-01 起的微秒数；带时区的时间换算为 UTC 后存储，不保留时区）
+    answer       int32   作答内容下标（字典 answers）
+    record_end   int64   记录ID在 record_ids 中的结束偏移
+    record_ids   uint8   记录ID（UTF-8，首尾相接）
+字典下标按首次出现的顺序编号。
+
+每列是一个文件，通过 np.memmap 映射，容量不够时扩大文件并重新映射。
+一组列文件放在一个版本目录（<prefix>.<随机串>/）中，指针文件 <prefix>.current 记录当前版本；
+三个字典各自追加到 <字典名>.jsonl（每行一个JSON字符串），检查点（checkpoint）时只写入新增的取值，
+meta.json 记录已保存的记录数与各字典文件的有效条数和长度，在检查点时整体替换。
+记录只追加：检查点之后写入的行在 meta.json 更新前不算数，重启后由调用方从日志重放。
+
+列存储只支持一个写入进程（见 acquire_writer）：各进程按自己内存中的记录数追加，
+发布新版本时删除其他版本目录，两个进程同时写入会互相覆盖。
+
+压缩（roll_up）把最早的一段记录汇总为 Rollup，与剩余的原始记录一起写入新的版本目录：
+    按 (学生, 题目)：作答次数、正确次数、用时合计
+    按 (题目, 选项)：选择次数
+汇总行按首次作答的顺序排列，排在原始记录之前，统计结果与压缩前逐条计算的一致。
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from schemas import AnswerRecord
+
+try:
+    import fcntl
+except ImportError:  # Windows：不检查其他写入进程
+    fcntl = None
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_TIME_MIN, _TIME_MAX = np.iinfo(np.int16).min, np.iinfo(np.int16).max
+
+COLUMNS = (
+    ("student", np.int32),
+    ("question", np.int32),
+    ("correct", np.bool_),
+    ("time_spent", np.int16),
+    ("answered_at", np.int64),
+    ("answer", np.int32),
+    ("record_end", np.int64),
+)
+ROLLUP_PAIR_COLUMNS = (
+    ("student", np.int32),
+    ("question", np.int32),
+    ("attempts", np.int32),
+    ("correct", np.int32),
+    ("time_spent", np.int64),
+)
+ROLLUP_OPTION_COLUMNS = (
+    ("question", np.int32),
+    ("answer", np.int32),
+    ("count", np.int64),
+)
+META_FILE = "meta.json"
+DICTIONARIES = ("students", "questions", "answers")
+# 新建列文件的初始容量（行数/字节数）
+INITIAL_CAPACITY = 4096
+
+
+def _timestamp(value: datetime) -> int:
+    """datetime -> 微秒数"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MICROSECOND
+
+
+class _Column:
+    """可增长的定长类型列（文件 + np.memmap）"""
+
+    def __init__(self, path: str, dtype):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        self.data: np.ndarray = None
+        self._map(max(size // self.dtype.itemsize, INITIAL_CAPACITY))
+
+    def _map(self, capacity: int):
+        with open(self.path, 'ab') as f:
+            if f.tell() < capacity * self.dtype.itemsize:
+                f.truncate(capacity * self.dtype.itemsize)
+        # 扩容后旧的映射仍然有效，正在读取旧数组的线程不受影响
+        self.data = np.memmap(self.path, dtype=self.dtype, mode='r+', shape=(capacity,))
+
+    def reserve(self, size: int):
+        """保证容量不小于 size（按倍数扩大）"""
+        capacity = len(self.data)
+        if size > capacity:
+            self.data.flush()
+            self._map(max(size, capacity * 2))
+
+    def flush(self):
+        self.data.flush()
+
+
+class _Dictionary:
+    """字符串字典编码（下标按首次出现的顺序）"""
+
+    def __init__(self, values: Sequence[str] = ()):
+        self.values: List[str] = list(values)
+        self.codes: Dict[str, int] = {value: code for code, value in enumerate(self.values)}
+
+    def encode(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class Rollup:
+    """
+    已压缩记录的汇总（创建后不再修改）
+
+    Attributes:
+        pairs: 按 (学生, 题目) 汇总的列（ROLLUP_PAIR_COLUMNS）
+        options: 按 (题目, 选项) 汇总的列（ROLLUP_OPTION_COLUMNS）
+        records: 累计压缩的原始记录数
+        before: 最近一次压缩的时间界限（微秒数），为 0 表示没有压缩过
+    """
+
+    def __init__(
+        self,
+        pairs: Optional[Dict[str, np.ndarray]] = None,
+        options: Optional[Dict[str, np.ndarray]] = None,
+        records: int = 0,
+        before: int = 0
+    ):
+        self.pairs = pairs or {name: np.zeros(0, dtype) for name, dtype in ROLLUP_PAIR_COLUMNS}
+        self.options = options or {name: np.zeros(0, dtype) for name, dtype in ROLLUP_OPTION_COLUMNS}
+        self.records = records
+        self.before = before
+
+    def __len__(self) -> int:
+        return len(self.pairs["student"])
+
+    @classmethod
+    def load(cls, directory: str, meta: Optional[Dict]) -> "Rollup":
+        """读取版本目录中的汇总（只读映射）"""
+        if not meta:
+            return cls()
+
+        def read(table, columns, size):
+            if size == 0:
+                return {name: np.zeros(0, dtype) for name, dtype in columns}
+            return {
+                name: np.load(os.path.join(directory, f"{table}.{name}.npy"), mmap_mode='r')
+                for name, _ in columns
+            }
+
+        return cls(
+            read("rollup_pairs", ROLLUP_PAIR_COLUMNS, meta["pairs"]),
+            read("rollup_options", ROLLUP_OPTION_COLUMNS, meta["options"]),
+            meta["records"],
+            meta["before"]
+        )
+
+    def save(self, directory: str) -> Dict:
+        """写入版本目录，返回记入 meta.json 的信息"""
+        for table, values in (("rollup_pairs", self.pairs), ("rollup_options", self.options)):
+            if len(next(iter(values.values()))) == 0:
+                continue
+            for name, array_ in values.items():
+                with open(os.path.join(directory, f"{table}.{name}.npy"), 'wb') as f:
+                    np.save(f, array_)
+                    f.flush()
+                    os.fsync(f.fileno())
+        return {
+            "pairs": len(self),
+            "options": len(self.options["question"]),
+            "records": self.records,
+            "before": self.before,
+        }
+
+
+class ColumnView:
+    """列存储在某一时刻的只读视图（numpy 数组为 [0, count) 范围的切片，字典为当时的副本）"""
+
+    def __init__(self, store: "AnswerColumns"):
+        count = store.count
+        for name, _ in COLUMNS:
+            setattr(self, name, store.columns[name].data[:count])
+        self.count = count
+        self.record_ids = store.record_ids.data[:int(store.columns["record_end"].data[count - 1]) if count else 0]
+        self.students = list(store.students.values)
+        self.questions = list(store.questions.values)
+        self.answers = list(store.answers.values)
+        self.rollup = store.rollup
+
+
+class AnswerColumns:
+    """一个版本目录中的作答记录列"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        meta = self.read_meta(directory) or {}
+        self.count: int = meta.get("count", 0)
+        self.log_segment: int = meta.get("logSegment", 0)
+        # 字典名 -> 字典文件中已保存的 (条数, 字节数)
+        self._saved: Dict[str, tuple] = {}
+        self.students = self._load_dictionary(meta, "students")
+        self.questions = self._load_dictionary(meta, "questions")
+        self.answers = self._load_dictionary(meta, "answers")
+        self.columns: Dict[str, _Column] = {
+            name: _Column(os.path.join(directory, f"{name}.bin"), dtype) for name, dtype in COLUMNS
+        }
+        self.record_ids = _Column(os.path.join(directory, "record_ids.bin"), np.uint8)
+        self.rollup = Rollup.load(directory, meta.get("rollup"))
+        self._rollup_meta: Optional[Dict] = meta.get("rollup")
+
+    @staticmethod
+    def read_meta(directory: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(directory, META_FILE), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _dictionary_file(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def _load_dictionary(self, meta: Dict, name: str) -> _Dictionary:
+        """读取字典文件中 meta.json 记录的有效部分（旧版本的 meta.json 直接包含字典取值）"""
+        if isinstance(meta.get(name), list):
+            self._saved[name] = (0, 0)
+            return _Dictionary(meta[name])
+        count, size = meta.get("dictionaries", {}).get(name, (0, 0))
+        values = []
+        if size:
+            with open(self._dictionary_file(name), 'rb') as f:
+                data = f.read(size)
+            values = [json.loads(line) for line in data.splitlines()[:count]]
+        self._saved[name] = (count, size)
+        return _Dictionary(values)
+
+    def _save_dictionary(self, name: str, dictionary: _Dictionary) -> tuple:
+        """把上次检查点之后新增的取值追加到字典文件（截掉崩溃时写了一半的部分），返回 (条数, 字节数)"""
+        count, size = self._saved[name]
+        if len(dictionary) == count:
+            return count, size
+        data = "".join(json.dumps(value, ensure_ascii=False) + "\n"
+                       for value in dictionary.values[count:]).encode('utf-8')
+        path = self._dictionary_file(name)
+        with open(path, 'r+b' if os.path.exists(path) else 'wb') as f:
+            f.seek(size)
+            f.truncate()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return len(dictionary), size + len(data)
+
+    def append(self, record: AnswerRecord) -> int:
+        """追加一条记录，返回其下标"""
+        record_id = record.recordId.encode('utf-8')
+        with self._lock:
+            position = self.count
+            start = int(self.columns["record_end"].data[position - 1]) if position else 0
+            end = start + len(record_id)
+            for column in self.columns.values():
+                column.reserve(position + 1)
+            self.record_ids.reserve(end)
+
+            columns = self.columns
+            columns["student"].data[position] = self.students.encode(record.studentId)
+            columns["question"].data[position] = self.questions.encode(record.questionId)
+            columns["correct"].data[position] = record.isCorrect
+            columns["time_spent"].data[position] = min(max(record.timeSpent, _TIME_MIN), _TIME_MAX)
+            columns["answered_at"].data[position] = _timestamp(record.answeredAt)
+            columns["answer"].data[position] = self.answers.encode(record.userAnswer)
+            columns["record_end"].data[position] = end
+            self.record_ids.data[start:end] = np.frombuffer(record_id, dtype=np.uint8)
+            self.count = position + 1
+        return position
+
+    def extend(self, records: Sequence[AnswerRecord]):
+        """批量追加记录（按列整体写入）"""
+        if not records:
+            return
+        n = len(records)
+        record_ids = [r.recordId.encode('utf-8') for r in records]
+        with self._lock:
+            position = self.count
+            start = int(self.columns["record_end"].data[position - 1]) if position else 0
+            lengths = np.fromiter((len(b) for b in record_ids), dtype=np.int64, count=n)
+            ends = start + np.cumsum(lengths)
+            for column in self.columns.values():
+                column.reserve(position + n)
+            self.record_ids.reserve(int(ends[-1]))
+
+            values = {
+                "student": np.fromiter((self.students.encode(r.studentId) for r in records), np.int32, n),
+                "question": np.fromiter((self.questions.encode(r.questionId) for r in records), np.int32, n),
+                "correct": np.fromiter((r.isCorrect for r in records), np.bool_, n),
+                "time_spent": np.clip(
+                    np.fromiter((r.timeSpent for r in records), np.int64, n), _TIME_MIN, _TIME_MAX
+                ),
+                "answered_at": np.fromiter((_timestamp(r.answeredAt) for r in records), np.int64, n),
+                "answer": np.fromiter((self.answers.encode(r.userAnswer) for r in records), np.int32, n),
+                "record_end": ends,
+            }
+            for name, column in self.columns.items():
+                column.data[position:position + n] = values[name]
+            self.record_ids.data[start:int(ends[-1])] = np.frombuffer(b"".join(record_ids), dtype=np.uint8)
+            self.count = position + n
+
+    def copy_rows(self, view: ColumnView, start: int, end: int):
+        """
+        追加另一个存储的视图中 [start, end) 范围的行（按列整体复制，不重新编码）
+        本存储改用 view 的字典：view 的字典须以本存储已有的字典为前缀（同一存储的较新视图）
+        """
+        n = end - start
+        with self._lock:
+            self.students = _Dictionary(view.students)
+            self.questions = _Dictionary(view.questions)
+            self.answers = _Dictionary(view.answers)
+            if n <= 0:
+                return
+            position = self.count
+            heap_start = int(self.columns["record_end"].data[position - 1]) if position else 0
+            source_start = int(view.record_end[start - 1]) if start else 0
+            source_end = int(view.record_end[end - 1])
+            for column in self.columns.values():
+                column.reserve(position + n)
+            self.record_ids.reserve(heap_start + source_end - source_start)
+
+            for name, column in self.columns.items():
+                if name != "record_end":
+                    column.data[position:position + n] = getattr(view, name)[start:end]
+            self.columns["record_end"].data[position:position + n] = (
+                view.record_end[start:end] - source_start + heap_start
+            )
+            self.record_ids.data[heap_start:heap_start + source_end - source_start] = (
+                view.record_ids[source_start:source_end]
+            )
+            self.count = position + n
+
+    def set_rollup(self, rollup: Rollup):
+        """写入汇总（只用于尚未发布的新版本）"""
+        with self._lock:
+            self._rollup_meta = rollup.save(self.directory)
+            self.rollup = Rollup.load(self.directory, self._rollup_meta)
+
+    def record(self, position: int) -> AnswerRecord:
+        """按下标还原记录"""
+        columns = self.columns
+        start = int(columns["record_end"].data[position - 1]) if position else 0
+        end = int(columns["record_end"].data[position])
+        return AnswerRecord.model_construct(
+            recordId=self.record_ids.data[start:end].tobytes().decode('utf-8'),
+            studentId=self.students.values[columns["student"].data[position]],
+            questionId=self.questions.values[columns["question"].data[position]],
+            userAnswer=self.answers.values[columns["answer"].data[position]],
+            isCorrect=bool(columns["correct"].data[position]),
+            timeSpent=int(columns["time_spent"].data[position]),
+            answeredAt=_EPOCH + timedelta(microseconds=int(columns["answered_at"].data[position])),
+        )
+
+    def view(self) -> ColumnView:
+        """当前记录的只读视图（之后追加的记录不可见）"""
+        with self._lock:
+            return ColumnView(self)
+
+    def checkpoint(self, log_segment: int):
+        """
+        刷新列文件，追加字典的新增取值并替换 meta.json
+
+        Args:
+            log_segment: 段号小于该值的日志段中的记录都已在列中
+        """
+        with self._lock:
+            for column in self.columns.values():
+                column.flush()
+            self.record_ids.flush()
+            saved = {name: self._save_dictionary(name, getattr(self, name)) for name in DICTIONARIES}
+            meta = {
+                "count": self.count,
+                "logSegment": log_segment,
+                "dictionaries": saved,
+            }
+            if self._rollup_meta:
+                meta["rollup"] = self._rollup_meta
+            tmp_file = os.path.join(self.directory, META_FILE + ".tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(meta, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, os.path.join(self.directory, META_FILE))
+            self._saved = saved
+            self.log_segment = log_segment
+
+
+def _pointer_file(prefix: str) -> str:
+    """记录当前版本目录名的指针文件"""
+    return prefix + ".current"
+
+
+# 本进程持有写入锁的前缀 -> 锁文件（进程退出时由操作系统释放）
+_writer_locks: Dict[str, object] = {}
+_writer_locks_guard = threading.Lock()
+
+
+def acquire_writer(prefix: str):
+    """
+    取得 prefix 的写入锁（prefix.lock 上的 flock），保持到进程退出或 remove_all
+    同一进程可以重复调用（如重新打开同一份作答记录）
+
+    Raises:
+        RuntimeError: 另一个进程正在写入
+    """
+    if fcntl is None:
+        return
+    key = os.path.abspath(prefix)
+    with _writer_locks_guard:
+        if key in _writer_locks:
+            return
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        f = open(prefix + ".lock", 'a')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            raise RuntimeError(f"作答记录 {prefix} 正由另一个进程写入（只支持单个写入进程）") from None
+        _writer_locks[key] = f
+
+
+def _release_writer(prefix: str):
+    """删除锁文件并释放写入锁"""
+    with _writer_locks_guard:
+        f = _writer_locks.pop(os.path.abspath(prefix), None)
+    if f is not None:
+        os.remove(prefix + ".lock")
+        f.close()
+
+
+def open_current(prefix: str) -> Optional[AnswerColumns]:
+    """
+    打开 prefix 当前版本的列存储
+
+    Returns:
+        列存储；尚未创建或当前版本缺少 meta.json 时返回 None
+    """
+    try:
+        with open(_pointer_file(prefix), 'r', encoding='utf-8') as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    directory = os.path.join(os.path.dirname(prefix), name)
+    if AnswerColumns.read_meta(directory) is None:
+        print(f"Warning: Answer columns {directory} have no metadata, ignoring")
+        return None
+    return AnswerColumns(directory)
+
+
+def create_version(prefix: str) -> AnswerColumns:
+    """新建一个空的版本目录（发布前不会被 open_current 打开）"""
+    name = f"{os.path.basename(prefix)}.{uuid.uuid4().hex}"
+    directory = os.path.join(os.path.dirname(prefix), name)
+    os.makedirs(directory)
+    return AnswerColumns(directory)
+
+
+def publish(prefix: str, store: AnswerColumns, log_segment: int):
+    """写入检查点并把指针切换到 store 所在的版本目录，随后删除其他版本"""
+    store.checkpoint(log_segment)
+    name = os.path.basename(store.directory)
+    pointer_tmp = f"{_pointer_file(prefix)}.{os.getpid()}.tmp"
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(pointer_tmp, _pointer_file(prefix))
+
+    parent = os.path.dirname(prefix) or "."
+    base = os.path.basename(prefix) + "."
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if entry.startswith(base) and entry != name and os.path.isdir(path):
+            # 已映射旧版本的进程仍可继续读取（Linux 下删除不影响已有映射）
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def remove_all(prefix: str):
+    """删除 prefix 的指针文件与全部版本目录，并释放写入锁"""
+    try:
+        os.remove(_pointer_file(prefix))
+    except FileNotFoundError:
+        pass
+    parent = os.path.dirname(prefix) or "."
+    base = os.path.basename(prefix) + "."
+    for entry in os.listdir(parent):
+        path = os.path.join(parent, entry)
+        if entry.startswith(base) and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+    _release_writer(prefix)
+
+
+def _sum_by_key(keys: np.ndarray, weights: Dict[str, np.ndarray]):
+    """按键求和，键按首次出现的顺序排列，返回 (键, {列名: 合计})"""
+    unique, first_seen, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    order = np.argsort(first_seen, kind="stable")
+    sums = {
+        name: np.bincount(inverse, weights=values, minlength=len(unique)).astype(np.int64)[order]
+        for name, values in weights.items()
+    }
+    return unique[order], sums
+
+
+def compactable_count(view: ColumnView, before: datetime) -> int:
+    """
+    作答时间早于 before 的最长前缀的记录数
+    只压缩最早的连续一段：时间乱序的记录留在原始记录中，汇总行总在原始记录之前，首次作答的顺序不变
+    """
+    newer = np.flatnonzero(view.answered_at >= _timestamp(before))
+    return int(newer[0]) if len(newer) else view.count
+
+
+def roll_up(view: ColumnView, end: int, before: datetime) -> Rollup:
+    """
+    把视图已有的汇总与 [0, end) 范围的原始记录合并为新的汇总
+
+    Args:
+        view: 列存储视图
+        end: 压缩的原始记录数（通常为 compactable_count 的结果）
+        before: 本次压缩的时间界限
+    """
+    old = view.rollup
+    pairs, options = old.pairs, old.options
+    ones = np.ones(end, dtype=np.int64)
+
+    n_questions = max(1, len(view.questions))
+    student = np.concatenate([pairs["student"], view.student[:end]]).astype(np.int64)
+    question = np.concatenate([pairs["question"], view.question[:end]]).astype(np.int64)
+    keys, sums = _sum_by_key(student * n_questions + question, {
+        "attempts": np.concatenate([pairs["attempts"], ones]),
+        "correct": np.concatenate([pairs["correct"], view.correct[:end]]),
+        "time_spent": np.concatenate([pairs["time_spent"], view.time_spent[:end]]),
+    })
+    new_pairs = {"student": keys // n_questions, "question": keys % n_questions, **sums}
+
+    n_answers = max(1, len(view.answers))
+    question = np.concatenate([options["question"], view.question[:end]]).astype(np.int64)
+    answer = np.concatenate([options["answer"], view.answer[:end]]).astype(np.int64)
+    keys, sums = _sum_by_key(question * n_answers + answer, {
+        "count": np.concatenate([options["count"], ones]),
+    })
+    new_options = {"question": keys // n_answers, "answer": keys % n_answers, **sums}
+    return Rollup(
+        {name: new_pairs[name].astype(dtype) for name, dtype in ROLLUP_PAIR_COLUMNS},
+        {name: new_options[name].astype(dtype) for name, dtype in ROLLUP_OPTION_COLUMNS},
+        old.records + end,
+        max(old.before, _timestamp(before))
+    )
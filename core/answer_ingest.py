@@ -0,0 +1,118 @@
+"""
+作答记录写入队列模块
+提交答案的请求只把 AnswerRecord 放入有界的内存队列后立即返回，不等待磁盘写入；
+后台写入线程把排队的记录成批交给 AnswerTracker.add_records（写入列存储与追加日志）
+
+队列已满时 submit 抛出 queue.Full，由接口返回 503 让客户端稍后重试；
+进程退出时写入线程先写完队列中剩余的记录
+"""
+import atexit
+import os
+import queue
+import threading
+from typing import Optional
+
+from schemas import AnswerRecord
+
+# 队列容量（条）：写入跟不上时最多积压这么多条记录
+QUEUE_SIZE = int(os.getenv('ANSWER_INGEST_QUEUE_SIZE', '10000'))
+# 每批最多写入的记录数
+BATCH_SIZE = int(os.getenv('ANSWER_INGEST_BATCH', '500'))
+
+_STOP = object()
+
+
+class AnswerIngestQueue:
+    """作答记录写入队列（单个后台写入线程）"""
+
+    def __init__(self, tracker, maxsize: int = QUEUE_SIZE, batch: int = BATCH_SIZE):
+        """
+        Args:
+            tracker: 写入的 AnswerTracker
+            maxsize: 队列容量
+            batch: 每批最多写入的记录数
+        """
+        self.tracker = tracker
+        self.batch = max(1, batch)
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # 累计写入/写入失败的记录数
+        self.written = 0
+        self.failed = 0
+
+    def submit(self, record: AnswerRecord):
+        """
+        记录入队（不阻塞）
+
+        Raises:
+            queue.Full: 队列已满
+        """
+        self._ensure_started()
+        self._queue.put_nowait(record)
+
+    @property
+    def pending(self) -> int:
+        """排队中尚未写入的记录数"""
+        return self._queue.qsize()
+
+    def join(self):
+        """等待已入队的记录全部写入（供脚本调用）"""
+        self._queue.join()
+
+    def close(self):
+        """写完剩余记录后停止写入线程"""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join()
+
+    def _ensure_started(self):
+        """首次提交时启动写入线程"""
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+                # 在 AnswerTracker 关闭日志之前执行（atexit 按注册的逆序执行）
+                atexit.register(self.close)
+
+    def _run(self):
+        """写入线程主循环：取出一条后再顺带取出已排队的记录，整批写入"""
+        stop = False
+        while not stop:
+            items = [self._queue.get()]
+            while items[-1] is not _STOP and len(items) < self.batch:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = items[-1] is _STOP
+            batch = items[:-1] if stop else items
+
+            try:
+                self.tracker.add_records(batch)
+                self.written += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                print(f"Warning: Failed to write {len(batch)} answer records: {e}")
+            finally:
+                for _ in items:
+                    self._queue.task_done()
+
+
+_singleton_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    """全局单例 answer_ingest 在首次访问时创建（同时创建 core.answer_tracker 的单例）"""
+    if name != "answer_ingest":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _singleton_lock:
+        if name not in globals():
+            from core.answer_tracker import answer_tracker
+            globals()[name] = AnswerIngestQueue(answer_tracker)
+    return globals()[name]
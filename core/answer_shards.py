@@ -0,0 +1,299 @@
+"""
+作答记录分片模块
+按学生ID的哈希把作答记录分到 N 个 AnswerTracker 分片，每个分片有自己的锁、列存储、追加日志与索引，
+不同学生的提交落在不同分片时互不阻塞。
+按学生的操作（作答记录、画像）只访问学生所在的分片；跨学生的统计（题目质量统计、区分度的学生分组）
+取各分片编码后的作答合并计算（EncodedRecords.merge）
+
+分片文件为 data/answer_records.shard<i>of<N>.columns.*/ 与 data/answer_records.shard<i>of<N>.log.*.jsonl，
+分片数记录在 data/answer_records.shards 中。首次启用分片或分片数变化时，原有记录（未分片的存储或旧分片）
+按学生重新分配到新分片；旧分片的文件随后删除，未分片的存储保留不动
+"""
+import glob
+import json
+import os
+import zlib
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from schemas import AnswerRecord, QualityStats, StudentProfile
+from core.answer_columns import Rollup, ROLLUP_OPTION_COLUMNS, ROLLUP_PAIR_COLUMNS, create_version, open_current
+from core.answer_tracker import AnswerTracker, question_stats
+from core.quality_stats import EncodedRecords
+
+
+def shard_index(student_id: str, shards: int) -> int:
+    """学生所在的分片（CRC32，与进程无关，重启后不变）"""
+    return zlib.crc32(student_id.encode('utf-8')) % shards
+
+
+def layout_file(data_file: str) -> str:
+    """记录分片数的文件"""
+    return os.path.splitext(data_file)[0] + ".shards"
+
+
+class _ChainedRecords(Sequence):
+    """依次连接各分片记录的只读序列"""
+
+    def __init__(self, parts: List[Sequence]):
+        self._parts = parts
+        self._ends: List[int] = []
+        total = 0
+        for part in parts:
+            total += len(part)
+            self._ends.append(total)
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("record index out of range")
+        part = bisect_right(self._ends, index)
+        start = self._ends[part - 1] if part else 0
+        return self._parts[part][index - start]
+
+
+class ShardedAnswerTracker:
+    """按学生ID哈希分片的作答记录追踪器（接口与 AnswerTracker 相同）"""
+
+    def __init__(
+        self,
+        shards: int,
+        data_file: str = "data/answer_records.json",
+        question_bank_ref=None,
+        **options
+    ):
+        """
+        Args:
+            shards: 分片数
+            data_file: 未分片时的记录文件（分片文件放在同目录，以其文件名为前缀）
+            question_bank_ref: 绑定的题库（见 AnswerTracker）
+            **options: 传给每个分片 AnswerTracker 的其他参数（日志、检查点等）
+        """
+        if shards < 1:
+            raise ValueError("分片数必须为正整数")
+        self.data_file = data_file
+        self.shard_count = shards
+        self._options = options
+        self.shards: List[AnswerTracker] = [
+            AnswerTracker(self._shard_file(i, shards), question_bank_ref=question_bank_ref, **options)
+            for i in range(shards)
+        ]
+        self._migrate()
+
+    def _shard_file(self, index: int, shards: int) -> str:
+        stem, ext = os.path.splitext(self.data_file)
+        return f"{stem}.shard{index}of{shards}{ext}"
+
+    def shard_for(self, student_id: str) -> AnswerTracker:
+        """学生所在的分片"""
+        return self.shards[shard_index(student_id, self.shard_count)]
+
+    # ---------- 分片数变化时的迁移 ----------
+
+    def _read_layout(self) -> Optional[int]:
+        try:
+            with open(layout_file(self.data_file), 'r', encoding='utf-8') as f:
+                return json.load(f)["shards"]
+        except FileNotFoundError:
+            return None
+
+    def _write_layout(self):
+        path = layout_file(self.data_file)
+        tmp_file = path + ".tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({"shards": self.shard_count}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, path)
+
+    def _has_unsharded_data(self) -> bool:
+        stem = os.path.splitext(self.data_file)[0]
+        return (
+            open_current(stem + ".columns") is not None
+            or os.path.exists(self.data_file)
+            or bool(glob.glob(glob.escape(stem) + ".log.*.jsonl"))
+        )
+
+    def _migrate(self):
+        """分片数与已有数据不一致时，把原有记录按学生重新分配到当前分片"""
+        previous = self._read_layout()
+        if previous == self.shard_count:
+            return
+        if previous is None:
+            # 首次启用分片：导入未分片的存储（保留原文件）
+            sources = [AnswerTracker(self.data_file, **self._options)] if self._has_unsharded_data() else []
+        else:
+            sources = [AnswerTracker(self._shard_file(i, previous), **self._options) for i in range(previous)]
+
+        if sources:
+            self._redistribute(sources)
+        # 分片数写入后才删除旧分片：中途失败时下次启动重新迁移
+        self._write_layout()
+        if previous is not None:
+            for source in sources:
+                source.remove_files()
+
+    def _redistribute(self, sources: List[AnswerTracker]):
+        """把各来源的原始记录与压缩汇总按学生分配到当前分片（每个分片写入一个新版本）"""
+        n = self.shard_count
+        records: List[List[AnswerRecord]] = [[] for _ in range(n)]
+        # 分片 -> [(视图, 汇总行下标)]；(题目, 选项) 汇总与学生无关，全部放入第一个分片
+        pair_rows: List[list] = [[] for _ in range(n)]
+        option_rows: list = []
+        views = []
+        before = 0
+
+        for source in sources:
+            view = source.columns.view()
+            views.append(view)
+            student_shard = np.fromiter(
+                (shard_index(s, n) for s in view.students), dtype=np.int64, count=len(view.students)
+            )
+            record_shard = student_shard[view.student]
+            rollup_shard = student_shard[view.rollup.pairs["student"]]
+            for i in range(n):
+                records[i].extend(source.columns.record(p) for p in np.flatnonzero(record_shard == i).tolist())
+                pair_rows[i].append((view, np.flatnonzero(rollup_shard == i)))
+            option_rows.append((view, np.arange(len(view.rollup.options["question"]))))
+            before = max(before, view.rollup.before)
+
+        for i, shard in enumerate(self.shards):
+            store = create_version(shard.columns_prefix)
+            # 字典沿用来源的编号顺序（首次作答的顺序），区分度分组中同分学生的先后与迁移前一致
+            for view in views:
+                for student in view.students:
+                    if shard_index(student, n) == i:
+                        store.students.encode(student)
+                for question in view.questions:
+                    store.questions.encode(question)
+                for answer in view.answers:
+                    store.answers.encode(answer)
+            store.extend(records[i])
+            pairs = self._encode_rollup(store, pair_rows[i], "pairs", ROLLUP_PAIR_COLUMNS)
+            options = self._encode_rollup(store, option_rows if i == 0 else [], "options", ROLLUP_OPTION_COLUMNS)
+            if len(pairs["student"]) or len(options["question"]):
+                store.set_rollup(Rollup(pairs, options, int(pairs["attempts"].sum()), before))
+            shard.publish_version(store)
+
+    @staticmethod
+    def _encode_rollup(store, rows: list, table: str, columns) -> Dict[str, np.ndarray]:
+        """取出各来源的汇总行，学生/题目/选项按新分片的字典重新编码"""
+        dictionaries = {"student": (store.students, "students"),
+                        "question": (store.questions, "questions"),
+                        "answer": (store.answers, "answers")}
+        result = {}
+        for name, dtype in columns:
+            chunks = []
+            for view, selected in rows:
+                values = np.asarray(getattr(view.rollup, table)[name])[selected]
+                if name in dictionaries:
+                    dictionary, attr = dictionaries[name]
+                    names = getattr(view, attr)
+                    values = np.fromiter((dictionary.encode(names[c]) for c in values.tolist()), dtype, len(values))
+                chunks.append(values.astype(dtype))
+            result[name] = np.concatenate(chunks) if chunks else np.zeros(0, dtype)
+        return result
+
+    # ---------- 写入 ----------
+
+    @property
+    def records(self) -> Sequence:
+        """各分片保留的原始作答记录（依次连接，分片内按作答顺序）"""
+        return _ChainedRecords([shard.records for shard in self.shards])
+
+    @records.setter
+    def records(self, records: Sequence):
+        """整体替换作答记录（按学生分配到各分片）"""
+        parts: List[List[AnswerRecord]] = [[] for _ in self.shards]
+        for record in records:
+            parts[shard_index(record.studentId, self.shard_count)].append(record)
+        for shard, part in zip(self.shards, parts):
+            shard.records = part
+
+    def add_record(self, record: AnswerRecord):
+        """添加作答记录（只锁定学生所在的分片）"""
+        self.shard_for(record.studentId).add_record(record)
+
+    def add_records(self, records: List[AnswerRecord]):
+        """批量添加作答记录（按分片分组，每个分片一次写入）"""
+        parts: Dict[int, List[AnswerRecord]] = {}
+        for record in records:
+            parts.setdefault(shard_index(record.studentId, self.shard_count), []).append(record)
+        for index, part in parts.items():
+            self.shards[index].add_records(part)
+
+    def save(self):
+        """各分片写入检查点"""
+        for shard in self.shards:
+            shard.save()
+
+    def compact(self, retention_days: Optional[int] = None) -> Dict:
+        """各分片分别压缩（见 AnswerTracker.compact），返回合计"""
+        results = [shard.compact(retention_days) for shard in self.shards]
+        summary = {
+            key: sum(result[key] for result in results)
+            for key in ("compactedRecords", "totalCompactedRecords", "remainingRecords", "rollupRows")
+        }
+        summary["before"] = results[0]["before"]
+        return summary
+
+    # ---------- 按学生的查询（单个分片） ----------
+
+    def get_student_records(self, student_id: str) -> List[AnswerRecord]:
+        """获取某学生的所有记录"""
+        return self.shard_for(student_id).get_student_records(student_id)
+
+    def calculate_student_profile(self, student_id: str, question_bank_ref=None) -> StudentProfile:
+        """计算学生能力画像（见 AnswerTracker.calculate_student_profile）"""
+        return self.shard_for(student_id).calculate_student_profile(student_id, question_bank_ref)
+
+    def bind_question_bank(self, question_bank_ref):
+        """绑定题库并重建各分片的累计统计"""
+        for shard in self.shards:
+            shard.bind_question_bank(question_bank_ref)
+
+    def rebuild_profiles(self):
+        """重建各分片的学生累计统计"""
+        for shard in self.shards:
+            shard.rebuild_profiles()
+
+    # ---------- 跨学生的统计（合并各分片） ----------
+
+    def get_question_records(self, question_id: str) -> List[AnswerRecord]:
+        """获取某题目在各分片中的记录（按作答时间排序）"""
+        records = [r for shard in self.shards for r in shard.get_question_records(question_id)]
+        records.sort(key=lambda r: r.answeredAt)
+        return records
+
+    def encoded_records(self, since: Optional[tuple] = None) -> tuple:
+        """
+        合并各分片编码后的作答（见 AnswerTracker.encoded_records）
+
+        Returns:
+            (EncodedRecords, 各分片位置组成的元组, 新作答题目的下标或 None)
+        """
+        if since is not None and len(since) != self.shard_count:
+            since = None
+        parts = [shard.encoded_records(since[i] if since else None) for i, shard in enumerate(self.shards)]
+        merged = EncodedRecords.merge([encoded for encoded, _, _ in parts])
+        position = tuple(p for _, p, _ in parts)
+
+        new_codes = None
+        if since is not None and all(codes is not None for _, _, codes in parts):
+            merged_codes = {qid: code for code, qid in enumerate(merged.question_ids)}
+            new_ids = {encoded.question_ids[c] for encoded, _, codes in parts for c in codes.tolist()}
+            new_codes = np.array(sorted(merged_codes[qid] for qid in new_ids), dtype=np.int64)
+        return merged, position, new_codes
+
+    def calculate_question_stats(self, question_id: str) -> QualityStats:
+        """计算题目质量统计（合并各分片，区分度按全部学生的总正确率分组）"""
+        return question_stats(self.encoded_records()[0], question_id)
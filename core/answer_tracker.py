@@ -1,177 +1,530 @@
 """
 作答记录跟踪模块
 记录学生答题数据，用于质量统计和能力画像分析
+
+作答记录以列式存储（core.answer_columns）保存在 data/answer_records.columns.*/ 中，
+新记录同时追加到日志（data/answer_records.log.*.jsonl），检查点时刷新列文件并删除已包含的日志段。
+data/answer_records.json 只在首次启动（尚无列存储）时导入一次。
+
+保留策略：compact 把早于保留期的记录汇总为按 (学生, 题目) 与 (题目, 选项) 的计数（见 core.answer_columns.Rollup），
+只保留之后的原始记录；学生画像与题目质量统计同时读取汇总与原始记录，结果与压缩前一致，
+get_student_records / get_question_records 只返回保留期内的原始记录。
 """
+import atexit
 import json
 import os
-from typing import List, Dict
-from datetime import datetime
-from collections import defaultdict
-from schemas import AnswerRecord, StudentProfile, QualityStats
+import shutil
+import threading
+from array import array
+from collections.abc import Sequence
+from typing import List, Dict, Optional
+from datetime import datetime, timedelta
+import numpy as np
+from pydantic import ValidationError
+from schemas import AnswerRecord, QuestionMetadata, StudentProfile, QualityStats
+from core.answer_columns import (
+    AnswerColumns, acquire_writer, compactable_count, create_version, open_current, publish, remove_all, roll_up
+)
+from core.quality_stats import EncodedRecords, compute_chunk_stats
+from core.question_bank import question_bank
+from core.record_log import RecordLog
+from core.snapshot import gc_paused
+
+# 追加日志：新记录追加到 data/answer_records.log.*.jsonl，检查点之前由日志保证不丢失
+LOG_ENABLED = os.getenv('ANSWER_TRACKER_LOG', '1').lower() in ('1', 'true', 'yes')
+LOG_FSYNC = os.getenv('ANSWER_TRACKER_LOG_FSYNC', 'interval').lower()
+LOG_FSYNC_INTERVAL_MS = int(os.getenv('ANSWER_TRACKER_LOG_FSYNC_INTERVAL_MS', '100'))
+LOG_FSYNC_BATCH = int(os.getenv('ANSWER_TRACKER_LOG_FSYNC_BATCH', '100'))
+LOG_SEGMENT_MB = int(os.getenv('ANSWER_TRACKER_LOG_SEGMENT_MB', '64'))
+# 日志模式下每追加多少条记录做一次检查点（不使用日志时每条记录都做检查点）
+CHECKPOINT_RECORDS = int(os.getenv('ANSWER_TRACKER_CHECKPOINT_RECORDS', '100000'))
+# 原始记录保留天数：压缩（compact）时更早的记录汇总为计数
+RETENTION_DAYS = int(os.getenv('ANSWER_TRACKER_RETENTION_DAYS', '180'))
+# 分片数：大于 1 时按学生ID哈希分片，每个分片独立加锁、写日志（见 core.answer_shards）
+SHARDS = int(os.getenv('ANSWER_TRACKER_SHARDS', '1'))
+
+
+class _ProfileAggregate:
+    """单个学生的累计作答统计（分组计数为 [正确数, 总数]，按首次作答的顺序排列）"""
+
+    __slots__ = ("total", "correct", "time_spent", "knowledge", "types", "difficulties")
+
+    def __init__(self):
+        self.total = 0
+        self.correct = 0
+        self.time_spent = 0
+        self.knowledge: Dict[str, List[int]] = {}
+        self.types: Dict[str, List[int]] = {}
+        self.difficulties: Dict[str, List[int]] = {}
+
+    def add(self, is_correct: bool, time_spent: int, question: Optional[QuestionMetadata]):
+        """计入一条记录（题目不在题库中时只计入总数）"""
+        correct = 1 if is_correct else 0
+        self.total += 1
+        self.correct += correct
+        self.time_spent += time_spent
+        if question is not None:
+            self.add_question(question, correct, 1)
+
+    def add_question(self, question: QuestionMetadata, correct: int, total: int):
+        """按题目的知识点/题型/难度计入同一道题的 total 次作答（其中 correct 次正确）"""
+        for group, key in (
+            *((self.knowledge, kp) for kp in question.knowledgePoints),
+            (self.types, question.type.value),
+            (self.difficulties, question.difficulty.value),
+        ):
+            counts = group.get(key)
+            if counts is None:
+                counts = group[key] = [0, 0]
+            counts[0] += correct
+            counts[1] += total
+
+
+def question_stats(encoded: EncodedRecords, question_id: str) -> QualityStats:
+    """计算编码后的作答中单个题目的质量统计（区分度按全部学生的总正确率分组）"""
+    stats = []
+    if question_id in encoded.question_ids:
+        code = np.array([encoded.question_ids.index(question_id)], dtype=np.int64)
+        stats = compute_chunk_stats(*encoded.chunk_args(code, encoded.record_groups()))
+
+    if not stats:
+        return QualityStats(
+            questionId=question_id,
+            totalAttempts=0,
+            correctCount=0,
+            correctRate=0.0,
+            avgTimeSeconds=0.0
+        )
+    return stats[0]
+
+
+def _accuracy(group: Dict[str, List[int]]) -> Dict[str, float]:
+    """[正确数, 总数] 计数 -> 正确率"""
+    return {key: correct / total for key, (correct, total) in group.items() if total > 0}
+
+
+def _group_positions(codes: np.ndarray, names: List[str]) -> Dict[str, array]:
+    """按字典下标分组的记录下标（组内按作答顺序）"""
+    order = np.argsort(codes, kind="stable").astype(np.int64)
+    counts = np.bincount(codes, minlength=len(names)).tolist()
+    groups: Dict[str, array] = {}
+    start = 0
+    for code, count in enumerate(counts):
+        if count:
+            positions = groups[names[code]] = array('q')
+            positions.frombytes(order[start:start + count].tobytes())
+            start += count
+    return groups
+
+
+class _RecordsView(Sequence):
+    """按下标从列存储还原 AnswerRecord 的只读序列（长度固定为创建时的记录数）"""
+
+    def __init__(self, store: AnswerColumns):
+        self._store = store
+        self._count = store.count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._store.record(i) for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("record index out of range")
+        return self._store.record(index)
 
 
 class AnswerTracker:
     """作答记录追踪器"""
 
-    def __init__(self, data_file: str = "data/answer_records.json"):
+    def __init__(
+        self,
+        data_file: str = "data/answer_records.json",
+        log: bool = LOG_ENABLED,
+        log_fsync: str = LOG_FSYNC,
+        log_fsync_interval_ms: int = LOG_FSYNC_INTERVAL_MS,
+        log_fsync_batch: int = LOG_FSYNC_BATCH,
+        log_segment_mb: int = LOG_SEGMENT_MB,
+        checkpoint_records: int = CHECKPOINT_RECORDS,
+        question_bank_ref=None
+    ):
+        """
+        Args:
+            data_file: 旧版 JSON 记录文件（列存储放在同目录，首次启动时从该文件导入）
+            checkpoint_records: 日志模式下每追加多少条记录做一次检查点
+            question_bank_ref: 绑定的题库；绑定后按题目的知识点/题型/难度维护每个学生的累计统计，
+                用该题库计算画像时不必逐条回查作答记录
+
+        Raises:
+            RuntimeError: 另一个进程正在写入同一份作答记录（见 core.answer_columns.acquire_writer）
+        """
         self.data_file = data_file
-        self.records: List[AnswerRecord] = []
+        self.checkpoint_records = max(1, checkpoint_records)
+        self._lock = threading.RLock()
+        self._columns: Optional[AnswerColumns] = None
+        # 上次检查点之后追加的记录数
+        self._pending = 0
+        # 学生ID/题目ID -> 记录下标（按作答顺序）
+        self._by_student: Dict[str, array] = {}
+        self._by_question: Dict[str, array] = {}
+        # 学生ID -> 累计统计（add_record 时按题目的知识点增量更新）
+        self._question_bank = question_bank_ref
+        self._profiles: Dict[str, _ProfileAggregate] = {}
+
+        # 打开日志（会截掉最后一段末尾不完整的行）之前确认没有其他进程在写入
+        acquire_writer(self.columns_prefix)
+        self._log: Optional[RecordLog] = None
+        if log:
+            self._log = RecordLog(
+                self.log_prefix,
+                fsync=log_fsync,
+                interval_ms=log_fsync_interval_ms,
+                batch=log_fsync_batch,
+                segment_bytes=log_segment_mb * 1024 * 1024
+            )
+            # 退出时把 interval/batch 策略下尚未同步的记录落盘
+            atexit.register(self._log.close)
         self.load()
 
+    @property
+    def log_prefix(self) -> str:
+        """追加日志段的路径前缀（段文件为 <prefix>.000001.jsonl ...）"""
+        return os.path.splitext(self.data_file)[0] + ".log"
+
+    @property
+    def columns_prefix(self) -> str:
+        """列存储版本目录的路径前缀（<prefix>.<版本>/ 与指针文件 <prefix>.current）"""
+        return os.path.splitext(self.data_file)[0] + ".columns"
+
+    @property
+    def columns(self) -> AnswerColumns:
+        """当前的列存储（统计分析直接读取其 view()）"""
+        return self._columns
+
+    @property
+    def records(self) -> Sequence:
+        """保留的原始作答记录（按作答顺序的只读序列，读取时才还原为 AnswerRecord；不含已压缩的记录）"""
+        return _RecordsView(self._columns)
+
+    @records.setter
+    def records(self, records: Sequence):
+        """整体替换作答记录（连同已压缩的汇总）：写入新的列存储版本并立即生效，旧版本与日志段随后删除"""
+        os.makedirs(os.path.dirname(self.data_file) or ".", exist_ok=True)
+        store = create_version(self.columns_prefix)
+        store.extend(list(records))
+        self.publish_version(store)
+
+    def publish_version(self, store: AnswerColumns):
+        """切换到调用方构建好的列存储版本（由 create_version(self.columns_prefix) 创建），旧版本与日志段随后删除"""
+        with self._lock:
+            self._publish(store)
+
+    def remove_files(self):
+        """删除本追踪器的列存储与日志（分片数调整、数据迁移到新分片之后清理旧分片）"""
+        with self._lock:
+            if self._log is not None:
+                self._log.clear()
+                self._log.close()
+            remove_all(self.columns_prefix)
+
     def load(self):
-        """从文件加载记录"""
-        if not os.path.exists(self.data_file):
-            os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
-            self.save()
-            return
+        """打开列存储（首次启动时从 answer_records.json 导入），日志模式下再重放检查点之后的日志段"""
+        with self._lock:
+            store = open_current(self.columns_prefix)
+            if store is None:
+                self._import_legacy()
+                return
+            if self._log is not None:
+                self._pending = self._replay_log(store, store.log_segment)
+            self._columns = store
+            self._rebuild_indexes()
+            self.rebuild_profiles()
+
+    def _import_legacy(self):
+        """首次启动：把 answer_records.json 与已有日志段中的记录导入新的列存储"""
+        os.makedirs(os.path.dirname(self.data_file) or ".", exist_ok=True)
+        store = create_version(self.columns_prefix)
+        if os.path.exists(self.data_file):
+            with open(self.data_file, 'r', encoding='utf-8') as f, gc_paused():
+                store.extend([AnswerRecord(**item) for item in json.load(f)])
+        if self._log is not None:
+            self._replay_log(store, 0)
+        self._publish(store)
+
+    def _publish(self, store: AnswerColumns):
+        """切换到新的列存储版本并删除它已包含的日志段（调用方需持有锁）"""
+        segment = self._log.rotate() if self._log is not None else 0
+        publish(self.columns_prefix, store, segment)
+        if self._log is not None:
+            self._log.remove_before(segment)
+        self._columns = store
+        self._pending = 0
+        self._rebuild_indexes()
+        self.rebuild_profiles()
+
+    def _replay_log(self, store: AnswerColumns, start_segment: int) -> int:
+        """把段号不小于 start_segment 的日志段中的记录追加到列存储（无法校验的记录跳过），返回条数"""
+        records = []
+        with gc_paused():
+            for item in self._log.replay(start_segment):
+                try:
+                    records.append(AnswerRecord(**item))
+                except (ValidationError, TypeError) as e:
+                    print(f"Warning: Skipping invalid answer record in log: {e}")
+        store.extend(records)
+        return len(records)
+
+    def _rebuild_indexes(self):
+        """根据列存储重建学生/题目索引"""
+        view = self._columns.view()
+        self._by_student = _group_positions(view.student, view.students)
+        self._by_question = _group_positions(view.question, view.questions)
+
+    def _index_record(self, position: int, record: AnswerRecord):
+        """登记一条记录的下标（下标用 array 存储，每条只占 8 字节）"""
+        positions = self._by_student.get(record.studentId)
+        if positions is None:
+            positions = self._by_student[record.studentId] = array('q')
+        positions.append(position)
+        positions = self._by_question.get(record.questionId)
+        if positions is None:
+            positions = self._by_question[record.questionId] = array('q')
+        positions.append(position)
+
+    def bind_question_bank(self, question_bank_ref):
+        """绑定题库并按其题目元信息重建累计统计"""
+        self._question_bank = question_bank_ref
+        self.rebuild_profiles()
+
+    def rebuild_profiles(self):
+        """
+        按绑定题库中当前的题目元信息重建所有学生的累计统计
+        题目的知识点、题型或难度修改后需要调用，否则画像仍按旧的元信息统计
 
-        with open(self.data_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.records = [AnswerRecord(**item) for item in data]
+        统计在锁外按当前视图计算，替换前在锁内补入计算期间追加的记录，期间的作答不会丢失
+        """
+        store = self._columns
+        view = store.view()
+        # 压缩后的汇总行在前、原始记录在后，均按首次作答的顺序
+        encoded = EncodedRecords.from_columns(view)
+        student = encoded.student_idx
+        n_students = len(view.students)
+        totals = np.bincount(student, weights=encoded.attempts, minlength=n_students)
+        corrects = np.bincount(student, weights=encoded.correct, minlength=n_students)
+        times = np.bincount(student, weights=encoded.time_spent, minlength=n_students)
+
+        aggregates: Dict[int, _ProfileAggregate] = {}
+        for code in np.flatnonzero(totals).tolist():
+            aggregate = aggregates[code] = _ProfileAggregate()
+            aggregate.total = int(totals[code])
+            aggregate.correct = int(corrects[code])
+            aggregate.time_spent = int(times[code])
+
+        bank = self._question_bank
+        if bank is not None and len(student):
+            # 每道题只查一次题库；同一学生对同一题的多次作答合并计入
+            questions = [bank.get(qid, include_cold=False) for qid in view.questions]
+            n_questions = len(view.questions)
+            pairs, first_seen, inverse = np.unique(
+                student * n_questions + encoded.question_idx, return_index=True, return_inverse=True
+            )
+            pair_totals = np.bincount(inverse, weights=encoded.attempts, minlength=len(pairs))
+            pair_corrects = np.bincount(inverse, weights=encoded.correct, minlength=len(pairs))
+            pair_totals = pair_totals.astype(np.int64).tolist()
+            pair_corrects = pair_corrects.astype(np.int64).tolist()
+            pairs = pairs.tolist()
+            # 按首次作答的顺序计入，各分组的键顺序与逐条累计时一致
+            for p in np.argsort(first_seen, kind="stable").tolist():
+                code, q = divmod(pairs[p], n_questions)
+                question = questions[q]
+                if question is not None:
+                    aggregates[code].add_question(question, pair_corrects[p], pair_totals[p])
+
+        profiles = {view.students[code]: aggregate for code, aggregate in aggregates.items()}
+        with self._lock:
+            if self._columns is not store:
+                # 计算期间记录被整体替换，切换版本时已经重建过
+                return
+            for position in range(view.count, store.count):
+                self._update_profile(store.record(position), profiles)
+            self._profiles = profiles
+
+    def _update_profile(self, record: AnswerRecord, profiles: Optional[Dict[str, _ProfileAggregate]] = None):
+        """将一条新记录计入学生的累计统计（profiles 默认为当前的累计统计）"""
+        if profiles is None:
+            profiles = self._profiles
+        aggregate = profiles.get(record.studentId)
+        if aggregate is None:
+            aggregate = profiles[record.studentId] = _ProfileAggregate()
+        question = None
+        if self._question_bank is not None:
+            question = self._question_bank.get(record.questionId, include_cold=False)
+        aggregate.add(record.isCorrect, record.timeSpent, question)
 
     def save(self):
-        """保存记录到文件"""
-        data = [r.model_dump(mode='json') for r in self.records]
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        """保存：刷新列文件并写入检查点，删除已包含在列存储中的日志段"""
+        with self._lock:
+            self._checkpoint()
+
+    def _checkpoint(self):
+        """检查点（调用方需持有锁）"""
+        segment = self._log.rotate() if self._log is not None else 0
+        self._columns.checkpoint(segment)
+        if self._log is not None:
+            self._log.remove_before(segment)
+        self._pending = 0
 
     def add_record(self, record: AnswerRecord):
         """添加作答记录"""
-        self.records.append(record)
-        self.save()
+        self.add_records([record])
+
+    def add_records(self, records: List[AnswerRecord]):
+        """批量添加作答记录（整批一次写入列存储与日志）"""
+        if not records:
+            return
+        with self._lock:
+            start = self._columns.count
+            if len(records) == 1:
+                self._columns.append(records[0])
+            else:
+                self._columns.extend(records)
+            for position, record in enumerate(records, start):
+                self._index_record(position, record)
+                self._update_profile(record)
+            if self._log is None:
+                self._checkpoint()
+                return
+            self._log.append([record.model_dump(mode='json') for record in records])
+            self._pending += len(records)
+            if self._pending >= self.checkpoint_records:
+                self._checkpoint()
 
     def get_student_records(self, student_id: str) -> List[AnswerRecord]:
         """获取某学生的所有记录"""
-        return [r for r in self.records if r.studentId == student_id]
+        record = self._columns.record
+        return [record(i) for i in self._by_student.get(student_id, ())]
 
     def get_question_records(self, question_id: str) -> List[AnswerRecord]:
         """获取某题目的所有记录"""
-        return [r for r in self.records if r.questionId == question_id]
-
-    def calculate_question_stats(self, question_id: str) -> QualityStats:
-        """计算题目质量统计"""
-        records = self.get_question_records(question_id)
-
-        if not records:
-            return QualityStats(
-                questionId=question_id,
-                totalAttempts=0,
-                correctCount=0,
-                correctRate=0.0,
-                avgTimeSeconds=0.0
-            )
+        record = self._columns.record
+        return [record(i) for i in self._by_question.get(question_id, ())]
 
-        total = len(records)
-        correct = sum(1 for r in records if r.isCorrect)
-        correct_rate = correct / total if total > 0 else 0.0
-        avg_time = sum(r.timeSpent for r in records) / total if total > 0 else 0.0
-
-        # 计算区分度（需要学生总分数据）
-        discrimination = self._calculate_discrimination(question_id, records)
+    def encoded_records(self, since: Optional[tuple] = None) -> tuple:
+        """
+        编码后的全部作答（压缩汇总 + 原始记录），供题目质量统计使用
 
-        # 计算选项分布（如果有用户答案）
-        option_dist = self._calculate_option_distribution(records)
+        Args:
+            since: 之前调用返回的位置；给出时同时返回此后有新作答的题目
 
-        return QualityStats(
-            questionId=question_id,
-            totalAttempts=total,
-            correctCount=correct,
-            correctRate=correct_rate,
-            avgTimeSeconds=avg_time,
-            discriminationIndex=discrimination,
-            optionDistribution=option_dist
-        )
-
-    def _calculate_discrimination(
-        self,
-        question_id: str,
-        records: List[AnswerRecord]
-    ) -> float:
+        Returns:
+            (EncodedRecords, 当前位置, 新作答题目的下标)；since 为空或记录已被整体替换/压缩（换了版本）时
+            新作答题目为 None
         """
-        计算区分度
-        区分度 = 高分组正确率 - 低分组正确率
-        """
-        # 按学生分组，计算每个学生的总正确率
-        student_scores = defaultdict(lambda: {"correct": 0, "total": 0})
-
-        for record in self.records:
-            sid = record.studentId
-            student_scores[sid]["total"] += 1
-            if record.isCorrect:
-                student_scores[sid]["correct"] += 1
-
-        # 计算每个学生的正确率
-        student_rates = {}
-        for sid, stats in student_scores.items():
-            if stats["total"] > 0:
-                student_rates[sid] = stats["correct"] / stats["total"]
-
-        if len(student_rates) < 10:  # 样本太少，不计算区分度
-            return None
-
-        # 排序，取前27%和后27%
-        sorted_students = sorted(student_rates.items(), key=lambda x: x[1], reverse=True)
-        n = len(sorted_students)
-        top_27 = int(n * 0.27)
-
-        top_group = [sid for sid, _ in sorted_students[:top_27]]
-        low_group = [sid for sid, _ in sorted_students[-top_27:]]
-
-        # 计算这道题在两组的正确率
-        top_records = [r for r in records if r.studentId in top_group]
-        low_records = [r for r in records if r.studentId in low_group]
-
-        top_correct_rate = (
-            sum(1 for r in top_records if r.isCorrect) / len(top_records)
-            if top_records else 0
-        )
-        low_correct_rate = (
-            sum(1 for r in low_records if r.isCorrect) / len(low_records)
-            if low_records else 0
-        )
-
-        return top_correct_rate - low_correct_rate
+        store = self._columns
+        view = store.view()
+        encoded = EncodedRecords.from_columns(view)
+        new_codes = None
+        if since is not None and since[0] == store.directory and since[1] <= view.count:
+            new_codes = np.unique(encoded.question_idx[encoded.raw_start + since[1]:])
+        return encoded, (store.directory, view.count), new_codes
 
-    def _calculate_option_distribution(
-        self,
-        records: List[AnswerRecord]
-    ) -> Dict[str, float]:
-        """计算选项分布（仅用于选择题）"""
-        if not records:
-            return {}
+    def calculate_question_stats(self, question_id: str) -> QualityStats:
+        """计算题目质量统计（直接读取列数据与压缩汇总，区分度按全部学生的总正确率分组）"""
+        return question_stats(self.encoded_records()[0], question_id)
 
-        option_counts = defaultdict(int)
-        total = len(records)
+    def compact(self, retention_days: Optional[int] = None) -> Dict:
+        """
+        压缩早于保留期的作答记录：汇总为计数后写入新的列存储版本，只保留之后的原始记录
+        计算汇总期间追加的记录在切换版本前补入新版本，不会丢失
 
-        for record in records:
-            # 假设userAnswer是选项字母，如"A", "B", "C", "D"
-            option_counts[record.userAnswer] += 1
+        Args:
+            retention_days: 原始记录保留天数（默认为 ANSWER_TRACKER_RETENTION_DAYS）
 
-        # 转换为比例
-        option_dist = {
-            option: count / total
-            for option, count in option_counts.items()
+        Returns:
+            本次压缩的记录数、累计压缩的记录数、保留的原始记录数与汇总行数
+        """
+        if retention_days is None:
+            retention_days = RETENTION_DAYS
+        if retention_days < 0:
+            raise ValueError("保留天数不能为负数")
+        before = datetime.now() - timedelta(days=retention_days)
+        source = self._columns
+        view = source.view()
+        end = compactable_count(view, before)
+
+        compacted = 0
+        if end > 0:
+            store = create_version(self.columns_prefix)
+            store.set_rollup(roll_up(view, end, before))
+            store.copy_rows(view, end, view.count)
+            with self._lock:
+                if self._columns is not source:
+                    shutil.rmtree(store.directory, ignore_errors=True)
+                    raise ValueError("作答记录在压缩期间被整体替换，请重试")
+                # 补入计算汇总期间追加的记录（字典只追加，新视图的编码与旧视图兼容）
+                latest = source.view()
+                store.copy_rows(latest, view.count, latest.count)
+                self._publish(store)
+            compacted = end
+
+        current = self._columns
+        return {
+            "compactedRecords": compacted,
+            "totalCompactedRecords": current.rollup.records,
+            "remainingRecords": current.count,
+            "rollupRows": len(current.rollup),
+            "before": before.isoformat(),
         }
 
-        return option_dist
+    def _student_question_counts(self, student_id: str) -> List[tuple]:
+        """某学生按题目合并的 (题目ID, 正确次数, 作答次数)，按首次作答的顺序"""
+        store = self._columns
+        counts: Dict[str, List[int]] = {}
+        code = store.students.codes.get(student_id)
+        if code is not None:
+            pairs = store.rollup.pairs
+            questions = store.questions.values
+            for row in np.flatnonzero(pairs["student"] == code).tolist():
+                counts[questions[pairs["question"][row]]] = [int(pairs["correct"][row]), int(pairs["attempts"][row])]
+        for record in self.get_student_records(student_id):
+            question_counts = counts.get(record.questionId)
+            if question_counts is None:
+                question_counts = counts[record.questionId] = [0, 0]
+            question_counts[0] += 1 if record.isCorrect else 0
+            question_counts[1] += 1
+        return [(qid, correct, total) for qid, (correct, total) in counts.items()]
+
+    def _is_bound_bank(self, question_bank_ref) -> bool:
+        """question_bank_ref 是否为绑定的题库或其快照"""
+        bank = self._question_bank
+        return bank is not None and (
+            question_bank_ref is bank or getattr(question_bank_ref, "_bank", None) is bank
+        )
 
     def calculate_student_profile(
         self,
         student_id: str,
         question_bank_ref=None  # 引用QuestionBank以获取题目元信息
     ) -> StudentProfile:
-        """计算学生能力画像"""
-        records = self.get_student_records(student_id)
+        """
+        计算学生能力画像
+        不传题库或传入绑定的题库（及其快照）时直接读取累计统计，
+        传入其他题库时逐条回查作答记录的题目
+        """
+        aggregate = self._profiles.get(student_id)
 
-        if not records:
+        if aggregate is None:
             return StudentProfile(
                 studentId=student_id,
                 updatedAt=datetime.now()
             )
 
-        total = len(records)
-        correct = sum(1 for r in records if r.isCorrect)
-        avg_time = sum(r.timeSpent for r in records) / total if total > 0 else None
+        total = aggregate.total
+        correct = aggregate.correct
+        avg_time = aggregate.time_spent / total if total > 0 else None
 
         # 如果有题库引用，计算更详细的画像
         knowledge_mastery = {}
@@ -179,53 +532,27 @@ class AnswerTracker:
         difficulty_accuracy = {}
         weak_points = []
 
-        if question_bank_ref:
-            # 按知识点统计
-            kp_stats = defaultdict(lambda: {"correct": 0, "total": 0})
-            type_stats = defaultdict(lambda: {"correct": 0, "total": 0})
-            diff_stats = defaultdict(lambda: {"correct": 0, "total": 0})
-
-            for record in records:
-                question = question_bank_ref.get(record.questionId)
-                if not question:
-                    continue
-
-                # 知识点统计
-                for kp in question.knowledgePoints:
-                    kp_stats[kp]["total"] += 1
-                    if record.isCorrect:
-                        kp_stats[kp]["correct"] += 1
-
-                # 题型统计
-                qtype = question.type.value
-                type_stats[qtype]["total"] += 1
-                if record.isCorrect:
-                    type_stats[qtype]["correct"] += 1
-
-                # 难度统计
-                diff = question.difficulty.value
-                diff_stats[diff]["total"] += 1
-                if record.isCorrect:
-                    diff_stats[diff]["correct"] += 1
-
-            # 计算掌握度
-            knowledge_mastery = {
-                kp: stats["correct"] / stats["total"]
-                for kp, stats in kp_stats.items()
-                if stats["total"] > 0
-            }
-
-            type_accuracy = {
-                qtype: stats["correct"] / stats["total"]
-                for qtype, stats in type_stats.items()
-                if stats["total"] > 0
-            }
-
-            difficulty_accuracy = {
-                diff: stats["correct"] / stats["total"]
-                for diff, stats in diff_stats.items()
-                if stats["total"] > 0
-            }
+        if question_bank_ref and self._is_bound_bank(question_bank_ref):
+            knowledge_mastery = _accuracy(aggregate.knowledge)
+            type_accuracy = _accuracy(aggregate.types)
+            difficulty_accuracy = _accuracy(aggregate.difficulties)
+
+            # 找出薄弱知识点（正确率<0.6）
+            weak_points = [
+                kp for kp, rate in knowledge_mastery.items()
+                if rate < 0.6
+            ]
+        elif question_bank_ref:
+            # 按题目合并该学生的作答（含压缩汇总），再回查其他题库中的题目元信息
+            grouped = _ProfileAggregate()
+            for question_id, question_correct, question_total in self._student_question_counts(student_id):
+                question = question_bank_ref.get(question_id, include_cold=False)
+                if question:
+                    grouped.add_question(question, question_correct, question_total)
+
+            knowledge_mastery = _accuracy(grouped.knowledge)
+            type_accuracy = _accuracy(grouped.types)
+            difficulty_accuracy = _accuracy(grouped.difficulties)
 
             # 找出薄弱知识点（正确率<0.6）
             weak_points = [
@@ -256,8 +583,37 @@ class AnswerTracker:
         )
 
 
-# 全局单例
-answer_tracker = AnswerTracker()
+def create_answer_tracker(question_bank_ref=None):
+    """
+    按配置创建作答记录追踪器
+
+    ANSWER_TRACKER_SHARDS 大于 1 时按学生ID哈希分片（core.answer_shards.ShardedAnswerTracker），
+    否则为单个 AnswerTracker
+    """
+    if SHARDS > 1:
+        from core.answer_shards import ShardedAnswerTracker
+        return ShardedAnswerTracker(SHARDS, question_bank_ref=question_bank_ref)
+    tracker = AnswerTracker(question_bank_ref=question_bank_ref)
+    if os.path.exists(os.path.splitext(tracker.data_file)[0] + ".shards"):
+        print("Warning: Answer records were sharded (ANSWER_TRACKER_SHARDS>1); "
+              "sharded data is not read when running unsharded")
+    return tracker
+
+
+_singleton_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    """
+    全局单例 answer_tracker 在首次访问时创建：
+    只用到 AnswerTracker 等类的脚本不会打开 data/ 下的作答记录（同时取得其写入锁）
+    """
+    if name != "answer_tracker":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _singleton_lock:
+        if name not in globals():
+            globals()[name] = create_answer_tracker(question_bank)
+    return globals()[name]
 
 
 
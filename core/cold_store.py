@@ -0,0 +1,297 @@
+"""
+冷数据存储模块
+题目中体积大、列表和推荐用不到的字段（解析、选项分布等）单独存放在文件中，
+内存里只保留引用值，读取时通过 mmap 按需取出
+
+多进程部署时，冷数据发布为不可变的共享文件（publish_shared），各工作进程只读映射同一个文件，
+页缓存中只有一份；进程加载之后新写入的数据块放在进程私有的临时文件中
+"""
+import glob
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows：不做进程间互斥，同时启动的进程可能各自发布一份
+    fcntl = None
+
+# 引用值 = 段号 << 64 | 偏移 << 32 | 长度；段号 0 为共享文件，其余为私有文件
+# 单个数据块和单个文件都不超过 4GB
+_LENGTH_BITS = 32
+_LENGTH_MASK = (1 << _LENGTH_BITS) - 1
+_SEGMENT_SHIFT = 64
+
+# 共享文件格式：MAGIC(8字节) | 索引偏移(uint64) | 数据块... | 索引JSON {键: 引用值}
+SHARED_MAGIC = b"MSKCOLD\x00"
+_SHARED_PREFIX = struct.Struct("<8sQ")
+
+
+def _split_ref(ref: int) -> Tuple[int, int, int]:
+    """引用值 -> (段号, 偏移, 长度)"""
+    return ref >> _SEGMENT_SHIFT, (ref >> _LENGTH_BITS) & _LENGTH_MASK, ref & _LENGTH_MASK
+
+
+class SharedColdFile:
+    """
+    只读映射的共享冷数据文件
+
+    文件发布后不再修改；多个进程映射同一个文件时共用页缓存。
+    文件被新版本替换并删除后，已映射的进程仍可继续读取，直到不再引用。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, index_offset = _SHARED_PREFIX.unpack_from(self._map)
+            if magic != SHARED_MAGIC:
+                raise ValueError(f"not a shared cold file: {path}")
+            # 键 -> 文件内的 (偏移 << 32 | 长度)
+            self.index: Dict[str, int] = json.loads(self._map[index_offset:])
+        except Exception:
+            self._map.close()
+            raise
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self._map[offset:offset + length]
+
+    @property
+    def size(self) -> int:
+        """文件字节数"""
+        return len(self._map)
+
+    def lookup(self, key: str, data: bytes) -> Optional[int]:
+        """文件中 key 对应的数据块与 data 完全相同时返回其引用值，否则返回 None"""
+        ref = self.index.get(key)
+        if ref is None or ref & _LENGTH_MASK != len(data):
+            return None
+        offset = ref >> _LENGTH_BITS
+        return ref if self._map[offset:offset + len(data)] == data else None
+
+    def close(self):
+        self._map.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _pointer_file(prefix: str) -> str:
+    """记录当前共享文件名的指针文件"""
+    return prefix + ".current"
+
+
+@contextmanager
+def shared_lock(prefix: str):
+    """
+    进程间互斥锁（prefix.lock 文件上的 flock）
+
+    同时启动的多个进程在锁内依次"打开共享文件-检查-必要时发布"，
+    只有第一个进程发布，其余进程直接映射它发布的文件。
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(prefix + ".lock", 'a') as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def open_shared(prefix: str) -> Optional[SharedColdFile]:
+    """
+    映射 prefix 当前发布的共享文件
+
+    Args:
+        prefix: 共享文件路径前缀（如 data/questions.cold）
+
+    Returns:
+        共享文件；尚未发布或文件损坏时返回 None
+    """
+    # 读到指针后、打开文件前，文件可能恰好被新版本替换并删除，重读一次指针
+    for _ in range(2):
+        try:
+            with open(_pointer_file(prefix), 'r', encoding='utf-8') as f:
+                name = f.read().strip()
+            return SharedColdFile(os.path.join(os.path.dirname(prefix), name))
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Warning: Failed to open shared cold file for {prefix}: {e}")
+            return None
+    return None
+
+
+def publish_shared(prefix: str, blocks: Iterable[Tuple[str, bytes]]) -> SharedColdFile:
+    """
+    发布新版本的共享文件并原子切换指针
+
+    每个版本写入独立的文件（prefix.<随机串>.bin），写完后替换指针文件；
+    之后加载的进程映射新文件，已映射旧文件的进程不受影响。旧版本文件随即删除。
+
+    Args:
+        prefix: 共享文件路径前缀
+        blocks: (键, 数据块) 序列
+
+    Returns:
+        新发布的共享文件
+    """
+    name = f"{os.path.basename(prefix)}.{uuid.uuid4().hex}.bin"
+    path = os.path.join(os.path.dirname(prefix), name)
+    tmp_path = path + ".tmp"
+    index: Dict[str, int] = {}
+    with open(tmp_path, 'wb') as f:
+        f.write(_SHARED_PREFIX.pack(SHARED_MAGIC, 0))
+        offset = _SHARED_PREFIX.size
+        for key, data in blocks:
+            f.write(data)
+            index[key] = (offset << _LENGTH_BITS) | len(data)
+            offset += len(data)
+        f.write(json.dumps(index, ensure_ascii=False).encode('utf-8'))
+        f.seek(0)
+        f.write(_SHARED_PREFIX.pack(SHARED_MAGIC, offset))
+    os.replace(tmp_path, path)
+
+    pointer_tmp = f"{_pointer_file(prefix)}.{os.getpid()}.tmp"
+    with open(pointer_tmp, 'w', encoding='utf-8') as f:
+        f.write(name)
+    os.replace(pointer_tmp, _pointer_file(prefix))
+
+    for stale in glob.glob(glob.escape(prefix) + ".*.bin"):
+        if os.path.basename(stale) != name:
+            try:
+                os.remove(stale)
+            except OSError:
+                # Windows 下仍被映射的文件无法删除，下次发布时再清理
+                pass
+    return SharedColdFile(path)
+
+
+class _PrivateSegment:
+    """进程私有的只追加临时文件（关闭或进程退出后自动删除）"""
+
+    def __init__(self, directory: Optional[str]):
+        # 不使用缓冲：fork 出的子进程不会把父进程缓冲区里的数据再写一遍
+        self.file = tempfile.TemporaryFile(dir=directory, prefix="questions.cold.", buffering=0)
+        self.pid = os.getpid()
+        self.size = 0
+        self.map: Optional[mmap.mmap] = None
+
+    def append(self, data: bytes) -> int:
+        offset = self.size
+        self.file.write(data)
+        self.size += len(data)
+        return offset
+
+    def read(self, offset: int, length: int) -> bytes:
+        if self.map is None or offset + length > len(self.map):
+            # 文件增长后重新映射；空文件无法映射，至少写入过一个字节后才会走到这里
+            if self.map is not None:
+                self.map.close()
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map[offset:offset + length]
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+
+class ColdStore:
+    """
+    只追加写入的字节块存储
+
+    可选的共享文件（shared）作为只读的基础段：append 时给出 key 且共享文件中
+    已有相同的数据块，直接引用共享文件，否则写入进程私有的临时文件。
+    fork 之后子进程继承的私有文件只读，子进程的新数据写入自己的私有文件。
+
+    私有文件只追加、不回收：调用方通过 release 登记不再引用的数据块（garbage），
+    垃圾过多时把仍在使用的数据块复制到新的存储（copy），旧存储随最后一个引用它的记录释放。
+    """
+
+    def __init__(self, directory: Optional[str] = None, shared: Optional[SharedColdFile] = None):
+        self._directory = directory
+        self.shared = shared
+        self._segments: List[_PrivateSegment] = []
+        self._lock = threading.Lock()
+        # 私有文件中已不再被引用的字节数
+        self.garbage = 0
+
+    def append(self, data: bytes, key: Optional[str] = None, previous: Optional[int] = None) -> int:
+        """
+        追加一个数据块，返回其引用值
+
+        Args:
+            key: 共享文件中的键，共享文件中有相同的数据块时直接引用
+            previous: 同一条数据之前的引用值，内容没有变化时沿用，不再写入
+        """
+        if previous is not None and previous & _LENGTH_MASK == len(data) and self.read(previous) == data:
+            return previous
+        if key is not None and self.shared is not None:
+            ref = self.shared.lookup(key, data)
+            if ref is not None:
+                return ref
+
+        with self._lock:
+            segment = self._segments[-1] if self._segments else None
+            if segment is None or segment.pid != os.getpid():
+                segment = _PrivateSegment(self._directory)
+                self._segments.append(segment)
+            number = len(self._segments)
+            offset = segment.append(data)
+        return (number << _SEGMENT_SHIFT) | (offset << _LENGTH_BITS) | len(data)
+
+    def read(self, ref: int) -> bytes:
+        """按引用值读取数据块"""
+        number, offset, length = _split_ref(ref)
+        if number == 0:
+            return self.shared.read(offset, length)
+        with self._lock:
+            return self._segments[number - 1].read(offset, length)
+
+    def release(self, ref: int):
+        """登记一个不再被引用的数据块（共享文件中的数据块不计入）"""
+        number, _, length = _split_ref(ref)
+        if number:
+            with self._lock:
+                self.garbage += length
+
+    def copy(self, source: "ColdStore", ref: int) -> int:
+        """把 source 中的数据块复制到本存储，返回新的引用值（共用同一个共享文件时直接沿用）"""
+        if ref >> _SEGMENT_SHIFT == 0 and source.shared is self.shared:
+            return ref
+        return self.append(source.read(ref))
+
+    def shared_ref(self, key: str) -> Optional[int]:
+        """共享文件中 key 对应的引用值"""
+        return self.shared.index.get(key) if self.shared is not None else None
+
+    @property
+    def size(self) -> int:
+        """私有文件字节数（不含共享文件）"""
+        return sum(segment.size for segment in self._segments)
+
+    def close(self):
+        with self._lock:
+            for segment in self._segments:
+                segment.close()
+            self._segments = []
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
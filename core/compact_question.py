@@ -0,0 +1,274 @@
+"""
+题目紧凑存储模块
+题库在内存中以紧凑记录保存题目：标签类字符串驻留共享，相同的标签组合共用同一个元组，
+难度/题型/审核状态存为小整数编码，记录使用 __slots__；
+冷字段可以移到 ColdStore 中，只保留引用；
+只在交给调用方时才转换为 QuestionMetadata；
+启动快照按列保存紧凑记录（dump_records / load_records），恢复时不经过 QuestionMetadata
+"""
+import json
+import sys
+from typing import Any, Dict, List, Optional, Tuple
+
+from schemas import (
+    IncompleteQuestion, QuestionMetadata, AbilityTag, AnswerType, Difficulty, ProblemType, ReviewStatus
+)
+from core.cold_store import ColdStore
+from core.snapshot import decode_column, encode_column
+
+FIELDS = tuple(QuestionMetadata.model_fields)
+
+# 枚举字段：存储成员在枚举中的下标
+ENUM_FIELDS = {
+    "difficulty": tuple(Difficulty),
+    "type": tuple(ProblemType),
+    "reviewStatus": tuple(ReviewStatus),
+}
+_ENUM_CODES = {field: {member: code for code, member in enumerate(members)}
+               for field, members in ENUM_FIELDS.items()}
+
+# 单个标签字段：字符串驻留
+LABEL_FIELDS = frozenset({"topic", "chapter", "section", "source", "paperId", "templateId"})
+
+# 标签列表字段：元素驻留，整个元组在题目之间共享
+LABEL_LIST_FIELDS = frozenset({"knowledgePoints", "abilityTags", "tags"})
+
+# 冷字段：体积大，列表筛选和推荐用不到
+COLD_FIELDS = frozenset({"solution", "detailedSolution", "optionDistribution"})
+
+# 热字段：快照中按列存储
+HOT_FIELDS = tuple(field for field in FIELDS if field not in COLD_FIELDS)
+
+# 快照中可能出现的枚举（见 core.snapshot.encode_column）
+SNAPSHOT_ENUMS = {cls.__name__: cls for cls in (Difficulty, ProblemType, ReviewStatus, AnswerType, AbilityTag)}
+
+# 共享的标签元组与字段集合
+_shared: Dict[Any, Any] = {}
+
+
+def _share(value):
+    """返回与 value 相等的共享对象"""
+    return _shared.setdefault(value, value)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _freeze(value, labels: bool = False):
+    """列表转为元组（labels 为真时元素驻留并共享整个元组），字典浅拷贝"""
+    if isinstance(value, list):
+        if labels:
+            frozen = tuple(_intern(_freeze(item)) for item in value)
+            try:
+                return _share(frozen)
+            except TypeError:
+                # 元素中含有字典等不可哈希的值，不共享
+                return frozen
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return {key: _freeze(item) for key, item in value.items()}
+    return value
+
+
+def _refreeze(value, labels: bool = False):
+    """与 _freeze 相同；字符串列表（最常见的情况）走快速路径"""
+    if type(value) is list and all(type(item) is str for item in value):
+        if labels:
+            return _share(tuple(map(sys.intern, value)))
+        return tuple(value)
+    return _freeze(value, labels)
+
+
+def _thaw(value):
+    """_freeze 的逆操作：返回调用方可以随意修改的副本"""
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _thaw(item) for key, item in value.items()}
+    return value
+
+
+class CompactQuestion:
+    """
+    题目的紧凑记录
+
+    每个 QuestionMetadata 字段占一个槽位；fields_set 记录原始数据中出现过的字段，
+    转换回模型后 exclude_unset 的输出与原模型一致。
+    扩展字段（extra）中的字符串列表视为标签（如管理端的 chapterIds）。
+    给定 cold_store 时，COLD_FIELDS 以JSON写入冷数据文件（以题目ID为键，可复用共享文件中的数据），
+    槽位中只有 cold_ref。
+    incomplete 为真表示记录来自 IncompleteQuestion（未通过校验），转换回来时仍为 IncompleteQuestion。
+    """
+
+    __slots__ = FIELDS + ("fields_set", "extra", "cold_store", "cold_ref", "incomplete")
+
+    @classmethod
+    def from_model(
+        cls, question: QuestionMetadata, cold_store: Optional[ColdStore] = None, previous_ref: Optional[int] = None
+    ) -> "CompactQuestion":
+        """
+        由模型构造紧凑记录
+
+        Args:
+            previous_ref: 同一题目在 cold_store 中原来的冷数据引用，冷字段没有变化时沿用
+        """
+        record = cls.__new__(cls)
+        values = question.__dict__
+        record.cold_store = cold_store
+        record.cold_ref = None
+        if cold_store is not None:
+            cold = {field: values[field] for field in COLD_FIELDS if field in values}
+            record.cold_ref = cold_store.append(json.dumps(cold, ensure_ascii=False).encode('utf-8'),
+                                                key=question.questionId, previous=previous_ref)
+
+        for field in FIELDS:
+            value = values.get(field)
+            if cold_store is not None and field in COLD_FIELDS:
+                value = None
+            elif field in _ENUM_CODES:
+                value = _ENUM_CODES[field].get(value, value)
+            elif field in LABEL_FIELDS:
+                value = _intern(value)
+            else:
+                value = _freeze(value, labels=field in LABEL_LIST_FIELDS)
+            setattr(record, field, value)
+        record.fields_set = _share(frozenset(question.model_fields_set))
+        record.incomplete = isinstance(question, IncompleteQuestion)
+        extra = question.model_extra
+        record.extra = {_intern(k): _freeze(v, labels=True) for k, v in extra.items()} if extra else None
+        return record
+
+    def relocate(self, cold_store: ColdStore) -> "CompactQuestion":
+        """复制一份记录，冷数据复制到 cold_store（原记录不变，仍可被旧快照读取）"""
+        record = CompactQuestion.__new__(CompactQuestion)
+        for slot in self.__slots__:
+            setattr(record, slot, getattr(self, slot))
+        if self.cold_store is not None:
+            record.cold_store = cold_store
+            record.cold_ref = cold_store.copy(self.cold_store, self.cold_ref)
+        return record
+
+    def cold_json(self) -> str:
+        """冷字段的JSON文本（与是否使用冷数据存储无关）"""
+        if self.cold_store is not None:
+            return self.cold_store.read(self.cold_ref).decode('utf-8')
+        return json.dumps({field: getattr(self, field) for field in COLD_FIELDS}, ensure_ascii=False)
+
+    def attach_cold(self, data: bytes, cold_store: Optional[ColdStore] = None):
+        """
+        设置冷字段（load_records 恢复的记录尚未设置）
+
+        Args:
+            data: cold_json 导出的JSON文本
+            cold_store: 写入的冷数据存储；为 None 时冷字段放回槽位
+        """
+        self.cold_store = cold_store
+        self.cold_ref = None
+        if cold_store is not None:
+            self.cold_ref = cold_store.append(data, key=self.questionId)
+            return
+        for field, value in json.loads(data).items():
+            setattr(self, field, _freeze(value))
+
+    def to_model(self, include_cold: bool = True) -> QuestionMetadata:
+        """
+        转换为 QuestionMetadata
+
+        Args:
+            include_cold: 为 False 时不读取冷字段，返回的模型缺少这些字段，
+                只适合用于筛选，不应直接序列化返回给客户端
+        """
+        values = {}
+        for field in FIELDS:
+            value = getattr(self, field)
+            if field in ENUM_FIELDS:
+                if type(value) is int:
+                    value = ENUM_FIELDS[field][value]
+            else:
+                value = _thaw(value)
+            values[field] = value
+        if self.extra:
+            values.update((key, _thaw(value)) for key, value in self.extra.items())
+
+        model_cls = IncompleteQuestion if self.incomplete else QuestionMetadata
+        if not include_cold:
+            for field in COLD_FIELDS:
+                del values[field]
+            return model_cls.model_construct(_fields_set=set(self.fields_set - COLD_FIELDS), **values)
+        if self.cold_store is not None:
+            values.update(json.loads(self.cold_store.read(self.cold_ref)))
+        return model_cls.model_construct(_fields_set=set(self.fields_set), **values)
+
+
+def dump_records(records: List[CompactQuestion]) -> Dict[str, Any]:
+    """
+    按列导出紧凑记录（可JSON序列化，供启动快照使用）
+
+    冷字段统一导出为每条记录一个JSON文本（见 CompactQuestion.cold_json）
+
+    Raises:
+        TypeError: 记录中有快照无法保存的取值
+    """
+    fields_sets: Dict[frozenset, int] = {}
+    state = {
+        "fields": list(HOT_FIELDS),
+        "columns": [encode_column([getattr(r, field) for r in records], SNAPSHOT_ENUMS) for field in HOT_FIELDS],
+        "fieldsSetIndex": [fields_sets.setdefault(r.fields_set, len(fields_sets)) for r in records],
+        "extra": encode_column([r.extra for r in records], SNAPSHOT_ENUMS),
+        "incomplete": [r.incomplete for r in records],
+        "cold": [r.cold_json() for r in records],
+    }
+    state["fieldsSets"] = [sorted(fs) for fs in fields_sets]
+    return state
+
+
+def load_records(state: Dict[str, Any]) -> List[Tuple[CompactQuestion, bytes]]:
+    """
+    由 dump_records 导出的状态恢复紧凑记录
+
+    与 from_model 一样驻留标签、共享标签元组；冷字段尚未设置，由调用方通过 attach_cold 写入
+
+    Returns:
+        [(记录, 冷字段JSON)]
+
+    Raises:
+        ValueError: 状态与当前的记录结构不一致
+    """
+    if state["fields"] != list(HOT_FIELDS):
+        raise ValueError("snapshot fields do not match CompactQuestion")
+    count = len(state["incomplete"])
+
+    columns = []
+    for field, column in zip(HOT_FIELDS, state["columns"]):
+        values = decode_column(column, SNAPSHOT_ENUMS)
+        if len(values) != count:
+            raise ValueError(f"snapshot column {field} has {len(values)} values, expected {count}")
+        if field in LABEL_FIELDS:
+            values = [_intern(value) for value in values]
+        elif field not in _ENUM_CODES and any(isinstance(value, (list, dict)) for value in values):
+            labels = field in LABEL_LIST_FIELDS
+            values = [_refreeze(value, labels) for value in values]
+        columns.append(values)
+    fields_sets = [_share(frozenset(fs)) for fs in state["fieldsSets"]]
+    extras = decode_column(state["extra"], SNAPSHOT_ENUMS)
+    if len(extras) != count or len(state["cold"]) != count or len(state["fieldsSetIndex"]) != count:
+        raise ValueError("snapshot columns have different lengths")
+
+    new = CompactQuestion.__new__
+    loaded = []
+    for values, fs, extra, incomplete, cold in zip(
+        zip(*columns), state["fieldsSetIndex"], extras, state["incomplete"], state["cold"]
+    ):
+        record = new(CompactQuestion)
+        for field, value in zip(HOT_FIELDS, values):
+            setattr(record, field, value)
+        for field in COLD_FIELDS:
+            setattr(record, field, None)
+        record.fields_set = fields_sets[fs]
+        record.extra = {_intern(k): _freeze(v, labels=True) for k, v in extra.items()} if extra else None
+        record.incomplete = incomplete
+        record.cold_store = None
+        record.cold_ref = None
+        loaded.append((record, cold.encode('utf-8')))
+    return loaded
@@ -0,0 +1,130 @@
+"""
+JSON数据文件写入模块
+每个数据文件由唯一的后台写入任务负责：请求处理函数提交变更闭包，
+写入任务把短时间窗口内排队的变更合并为一次"读取-修改-写回"，
+以临时文件+重命名的方式原子写入，再把结果交还给各个调用方
+"""
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 变更闭包：接收文件中的数据（原地修改），返回值交给调用方
+Mutation = Callable[[Any], Any]
+
+
+class JSONFileWriter:
+    """单个JSON文件的组提交写入器"""
+
+    def __init__(self, path: Path, default_factory: Callable[[], Any], window: float = 0.01):
+        """
+        Args:
+            path: 数据文件路径
+            default_factory: 文件不存在时的初始数据
+            window: 合并写入的时间窗口（秒）
+        """
+        self.path = Path(path)
+        self.default_factory = default_factory
+        self.window = window
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # 读取-修改-写回期间持有（事件循环变化后旧任务可能仍在写入）
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        """在当前事件循环中启动写入任务（事件循环变化时重新创建）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run())
+
+    async def submit(self, mutation: Mutation) -> Any:
+        """
+        提交一个变更并等待其写入磁盘
+
+        闭包应先完成校验再修改数据：闭包抛出的异常会原样抛给调用方，
+        但已做的修改仍会随同一批次写回。
+
+        Returns:
+            闭包的返回值
+        """
+        self._ensure_started()
+        future = self._loop.create_future()
+        await self._queue.put((mutation, future))
+        return await future
+
+    async def _run(self):
+        """写入任务主循环"""
+        while True:
+            batch = [await self._queue.get()]
+            # 等待一个时间窗口，收集同一批次的其余变更
+            await asyncio.sleep(self.window)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                outcomes = await asyncio.to_thread(self._apply, [m for m, _ in batch])
+            except Exception as e:
+                # 读写文件失败，本批次全部失败
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), (error, result) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def _read(self) -> Any:
+        """读取文件当前内容"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return self.default_factory()
+
+    def _write(self, data: Any):
+        """原子写入：先写临时文件并落盘，再重命名覆盖"""
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, mutations: List[Mutation]) -> List[Tuple[Optional[BaseException], Any]]:
+        """在工作线程中执行一次读取-修改-写回"""
+        with self._lock:
+            data = self._read()
+            outcomes = []
+            for mutation in mutations:
+                try:
+                    outcomes.append((None, mutation(data)))
+                except Exception as e:
+                    outcomes.append((e, None))
+
+            if any(error is None for error, _ in outcomes):
+                self._write(data)
+        return outcomes
+
+
+_writers: Dict[str, JSONFileWriter] = {}
+
+
+def get_json_writer(path: Path, default_factory: Callable[[], Any] = list) -> JSONFileWriter:
+    """获取数据文件对应的写入器（每个文件只有一个）"""
+    key = str(Path(path).resolve())
+    writer = _writers.get(key)
+    if writer is None:
+        writer = JSONFileWriter(path, default_factory)
+        _writers[key] = writer
+    return writer
@@ -0,0 +1,308 @@
+"""
+题目质量统计批量计算模块
+把全部作答记录编码为 NumPy 数组（学生下标、题目下标、是否正确、用时、选项下标），
+一次向量化计算所有题目的正确率、平均用时、区分度与选项分布，
+AnswerTracker.calculate_question_stats 计算单题时使用同一套实现
+
+记录可以由 AnswerRecord 列表编码，也可以直接取自列存储（EncodedRecords.from_columns，包括压缩后的汇总行）；
+按题目拆分的计算（compute_chunk_stats）只依赖传入的数组，可以放到其他进程中执行（见 core.stats_jobs）
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from schemas import AnswerRecord, QualityStats
+
+# 参与计算区分度的最少学生数（样本太少时不计算区分度）
+MIN_DISCRIMINATION_STUDENTS = 10
+# 高分组/低分组各占学生总数的比例
+GROUP_RATIO = 0.27
+
+# 记录所属分组：0 中间组  1 高分组  2 低分组
+TOP_GROUP = 1
+LOW_GROUP = 2
+
+
+def _encode(values: Iterable[str], codes: Dict[str, int], count: int) -> np.ndarray:
+    """字符串按首次出现的顺序编码为下标"""
+    setdefault = codes.setdefault
+    return np.fromiter((setdefault(v, len(codes)) for v in values), dtype=np.int64, count=count)
+
+
+class EncodedRecords:
+    """
+    编码为数组的作答记录（题目、学生、选项下标均按首次出现的顺序编号）
+
+    每行是同一学生对同一题目的若干次作答：attempts 次作答、correct 次正确、用时合计 time_spent，
+    原始记录每条一行（attempts 为 1）；列存储压缩后的汇总行排在原始记录之前（raw_start 为原始记录的起始行）。
+    选项分布另按 (题目, 选项) 计数：option_question_idx / option_idx / option_count
+    """
+
+    def __init__(self, records: Sequence[AnswerRecord]):
+        count = len(records)
+        students: Dict[str, int] = {}
+        questions: Dict[str, int] = {}
+        options: Dict[str, int] = {}
+        self.student_idx = _encode((r.studentId for r in records), students, count)
+        self.question_idx = _encode((r.questionId for r in records), questions, count)
+        self.attempts = np.ones(count, dtype=np.int64)
+        self.correct = np.fromiter((r.isCorrect for r in records), dtype=np.int64, count=count)
+        self.time_spent = np.fromiter((r.timeSpent for r in records), dtype=np.int64, count=count)
+        self.option_question_idx = self.question_idx
+        self.option_idx = _encode((r.userAnswer for r in records), options, count)
+        self.option_count = self.attempts
+        self.raw_start = 0
+        self.student_count = len(students)
+        self.student_ids: List[str] = list(students)
+        self.question_ids: List[str] = list(questions)
+        self.option_names: List[str] = list(options)
+
+    @classmethod
+    def from_columns(cls, view) -> "EncodedRecords":
+        """由列存储的视图（core.answer_columns.ColumnView）构造，不经过 AnswerRecord"""
+        pairs, options = view.rollup.pairs, view.rollup.options
+        encoded = cls.__new__(cls)
+        encoded.student_idx = np.concatenate([pairs["student"], view.student]).astype(np.int64)
+        encoded.question_idx = np.concatenate([pairs["question"], view.question]).astype(np.int64)
+        encoded.attempts = np.concatenate([pairs["attempts"], np.ones(view.count, dtype=np.int64)])
+        encoded.correct = np.concatenate([pairs["correct"], view.correct]).astype(np.int64)
+        encoded.time_spent = np.concatenate([pairs["time_spent"], view.time_spent]).astype(np.int64)
+        encoded.option_question_idx = np.concatenate([options["question"], view.question]).astype(np.int64)
+        encoded.option_idx = np.concatenate([options["answer"], view.answer]).astype(np.int64)
+        encoded.option_count = np.concatenate([options["count"], np.ones(view.count, dtype=np.int64)])
+        encoded.raw_start = len(pairs["student"])
+        encoded.student_count = len(view.students)
+        encoded.student_ids = view.students
+        encoded.question_ids = view.questions
+        encoded.option_names = view.answers
+        return encoded
+
+    @classmethod
+    def merge(cls, parts: Sequence["EncodedRecords"]) -> "EncodedRecords":
+        """
+        合并多组编码后的作答（如各个分片），学生、题目、选项下标按合并后的字典重新编号
+        各组的汇总行排在全部原始记录之前，组内保持原有顺序
+        """
+        students: Dict[str, int] = {}
+        questions: Dict[str, int] = {}
+        options: Dict[str, int] = {}
+        student_maps, question_maps, option_maps = [], [], []
+        for part in parts:
+            student_maps.append(_encode(part.student_ids, students, len(part.student_ids)))
+            question_maps.append(_encode(part.question_ids, questions, len(part.question_ids)))
+            option_maps.append(_encode(part.option_names, options, len(part.option_names)))
+
+        def rows(name, maps=None, section=None):
+            chunks = []
+            for i, part in enumerate(parts):
+                values = getattr(part, name)
+                values = values[:part.raw_start] if section == "rollup" else values[part.raw_start:]
+                chunks.append(maps[i][values] if maps is not None else values)
+            return chunks
+
+        merged = cls.__new__(cls)
+        for name, maps in (
+            ("student_idx", student_maps),
+            ("question_idx", question_maps),
+            ("attempts", None),
+            ("correct", None),
+            ("time_spent", None),
+        ):
+            merged_rows = rows(name, maps, "rollup") + rows(name, maps)
+            setattr(merged, name, np.concatenate(merged_rows) if merged_rows else np.zeros(0, dtype=np.int64))
+        merged.option_question_idx = np.concatenate(
+            [question_maps[i][part.option_question_idx] for i, part in enumerate(parts)] or [np.zeros(0, np.int64)]
+        )
+        merged.option_idx = np.concatenate(
+            [option_maps[i][part.option_idx] for i, part in enumerate(parts)] or [np.zeros(0, np.int64)]
+        )
+        merged.option_count = np.concatenate([part.option_count for part in parts] or [np.zeros(0, np.int64)])
+        merged.raw_start = sum(part.raw_start for part in parts)
+        merged.student_count = len(students)
+        merged.student_ids = list(students)
+        merged.question_ids = list(questions)
+        merged.option_names = list(options)
+        return merged
+
+    def record_groups(self) -> Optional[np.ndarray]:
+        """
+        每行所属学生的分组
+        按学生总正确率从高到低排序（同分保持首次作答的顺序），前后各取 27% 的学生；
+        学生数不足时返回 None（不计算区分度）
+        """
+        student_totals = np.bincount(self.student_idx, weights=self.attempts, minlength=self.student_count)
+        # 字典中可能有已没有记录的学生，不参与排名
+        active = np.flatnonzero(student_totals)
+        n_students = len(active)
+        if n_students < MIN_DISCRIMINATION_STUDENTS:
+            return None
+
+        student_correct = np.bincount(self.student_idx, weights=self.correct, minlength=self.student_count)
+        rates = student_correct[active] / student_totals[active]
+        ranking = active[np.argsort(-rates, kind="stable")]
+        group_size = int(n_students * GROUP_RATIO)
+
+        group = np.zeros(self.student_count, dtype=np.int8)
+        group[ranking[:group_size]] = TOP_GROUP
+        group[ranking[n_students - group_size:]] = LOW_GROUP
+        return group[self.student_idx]
+
+    def chunk_args(self, codes: np.ndarray, record_group: Optional[np.ndarray]) -> tuple:
+        """
+        取出一组题目的行作为 compute_chunk_stats 的参数，题目下标重新编号为组内下标
+
+        Args:
+            codes: 题目下标
+            record_group: record_groups() 的结果
+        """
+        local = np.full(len(self.question_ids), -1, dtype=np.int64)
+        local[codes] = np.arange(len(codes))
+        row_local = local[self.question_idx]
+        selected = row_local >= 0
+        option_local = local[self.option_question_idx]
+        option_selected = option_local >= 0
+        return (
+            [self.question_ids[q] for q in codes.tolist()],
+            row_local[selected],
+            self.attempts[selected],
+            self.correct[selected],
+            self.time_spent[selected],
+            record_group[selected] if record_group is not None else None,
+            option_local[option_selected],
+            self.option_idx[option_selected],
+            self.option_count[option_selected],
+            self.option_names,
+        )
+
+
+def _sum(idx: np.ndarray, weights: np.ndarray, size: int) -> np.ndarray:
+    """按下标对整数权重求和"""
+    return np.bincount(idx, weights=weights, minlength=size).astype(np.int64)
+
+
+def compute_chunk_stats(
+    question_ids: List[str],
+    question_idx: np.ndarray,
+    attempts: np.ndarray,
+    correct: np.ndarray,
+    time_spent: np.ndarray,
+    record_group: Optional[np.ndarray],
+    option_question_idx: np.ndarray,
+    option_idx: np.ndarray,
+    option_count: np.ndarray,
+    option_names: List[str]
+) -> List[QualityStats]:
+    """
+    计算一组题目的质量统计
+
+    Args:
+        question_ids: 本组题目ID（question_idx 为其下标）
+        question_idx / attempts / correct / time_spent: 本组题目的作答行（作答次数、正确次数、用时合计）
+        record_group: 每行的学生分组（None 表示不计算区分度）
+        option_question_idx / option_idx / option_count: 本组题目的 (题目, 选项) 计数
+        option_names: 选项下标 -> 选项
+
+    Returns:
+        按 question_ids 顺序的质量统计（没有作答记录的题目跳过）
+    """
+    n_questions = len(question_ids)
+    totals = _sum(question_idx, attempts, n_questions)
+    correct_counts = _sum(question_idx, correct, n_questions)
+    time_sums = _sum(question_idx, time_spent, n_questions)
+
+    discrimination = None
+    if record_group is not None:
+        group_rates = []
+        for label in (TOP_GROUP, LOW_GROUP):
+            mask = record_group == label
+            group_attempts = _sum(question_idx[mask], attempts[mask], n_questions)
+            hits = _sum(question_idx[mask], correct[mask], n_questions)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                group_rates.append(np.where(group_attempts > 0, hits / group_attempts, 0.0))
+        discrimination = (group_rates[0] - group_rates[1]).tolist()
+
+    distributions = _option_distributions(option_question_idx, option_idx, option_count, option_names, totals)
+
+    result = []
+    for q, qid in enumerate(question_ids):
+        total = int(totals[q])
+        if total == 0:
+            continue
+        result.append(QualityStats(
+            questionId=qid,
+            totalAttempts=total,
+            correctCount=int(correct_counts[q]),
+            correctRate=int(correct_counts[q]) / total,
+            avgTimeSeconds=float(time_sums[q]) / total,
+            discriminationIndex=discrimination[q] if discrimination is not None else None,
+            optionDistribution=distributions[q]
+        ))
+    return result
+
+
+def _option_distributions(
+    question_idx: np.ndarray,
+    option_idx: np.ndarray,
+    option_count: np.ndarray,
+    option_names: List[str],
+    totals: np.ndarray
+) -> List[Dict[str, float]]:
+    """各题的选项分布（选项按在该题中首次出现的顺序排列）"""
+    n_options = max(1, len(option_names))
+    pairs = question_idx * n_options + option_idx
+    unique_pairs, first_seen, inverse = np.unique(pairs, return_index=True, return_inverse=True)
+    pair_counts = _sum(inverse, option_count, len(unique_pairs))
+    order = np.argsort(first_seen, kind="stable")
+
+    distributions: List[Dict[str, float]] = [{} for _ in range(len(totals))]
+    for pair, pair_count in zip(unique_pairs[order].tolist(), pair_counts[order].tolist()):
+        q, option = divmod(pair, n_options)
+        distributions[q][option_names[option]] = pair_count / int(totals[q])
+    return distributions
+
+
+def compute_encoded_stats(encoded: EncodedRecords) -> List[QualityStats]:
+    """计算编码后的记录中所有有作答的题目的质量统计（按题目下标顺序）"""
+    return compute_chunk_stats(
+        encoded.question_ids,
+        encoded.question_idx,
+        encoded.attempts,
+        encoded.correct,
+        encoded.time_spent,
+        encoded.record_groups(),
+        encoded.option_question_idx,
+        encoded.option_idx,
+        encoded.option_count,
+        encoded.option_names
+    )
+
+
+def compute_question_stats(records: Sequence[AnswerRecord]) -> Dict[str, QualityStats]:
+    """
+    计算所有有作答记录的题目的质量统计
+
+    Args:
+        records: 作答记录（按作答顺序）
+
+    Returns:
+        题目ID -> 质量统计（按题目首次被作答的顺序）
+    """
+    if not records:
+        return {}
+    return {s.questionId: s for s in compute_encoded_stats(EncodedRecords(records))}
+
+
+def refresh_question_stats(tracker, question_bank_ref) -> int:
+    """
+    重新计算全部题目的质量统计并写回题库（整批一次保存）
+
+    Args:
+        tracker: AnswerTracker 或 ShardedAnswerTracker（读取 encoded_records）
+        question_bank_ref: 题库
+
+    Returns:
+        更新的题目数（作答记录中题库不存在的题目跳过）
+    """
+    # 只包含当前的记录，计算期间新增的记录不影响本次结果
+    encoded = tracker.encoded_records()[0]
+    return question_bank_ref.update_quality_stats_many(compute_encoded_stats(encoded))
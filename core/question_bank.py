@@ -4,68 +4,879 @@
 """
 import json
 import os
-from typing import List, Optional, Dict
+import shutil
+import threading
+import weakref
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from enum import Enum
+from itertools import islice
+from pathlib import Path
+from sys import intern
+from typing import Any, Iterable, Iterator, List, Optional, Dict, Set, Tuple
 from datetime import datetime
-from schemas import QuestionMetadata, QualityStats, Difficulty, ProblemType
+from schemas import IncompleteQuestion, QuestionMetadata, QualityStats, Difficulty, ProblemType, dump_question, parse_question
+from core.search_index import SEARCH_FIELDS, SearchIndex, question_search_fields
+from core.compact_question import CompactQuestion, dump_records, load_records
+from core.cold_store import ColdStore, open_shared, publish_shared, shared_lock
+from core.snapshot import (
+    decode_column, encode_column, file_signature, gc_paused, read_snapshot, schema_fingerprint, write_snapshot
+)
+
+# 默认题库文件（与工作目录无关）
+DEFAULT_DATA_FILE = str(Path(__file__).parent.parent / "data" / "questions.json")
+
+# 日志模式：变更以单行JSON追加到日志文件，超过阈值后在后台合并为新快照
+JOURNAL_ENABLED = os.getenv('QUESTION_BANK_JOURNAL', '0').lower() in ('1', 'true', 'yes')
+JOURNAL_COMPACT_THRESHOLD = int(os.getenv('QUESTION_BANK_COMPACT_THRESHOLD', '1000'))
+
+# 冷热分离：解析等大字段存放在冷数据文件中，按需通过 mmap 读取
+COLD_STORE_ENABLED = os.getenv('QUESTION_BANK_COLD_STORE', '1').lower() in ('1', 'true', 'yes')
+
+# 共享冷数据：冷数据发布为只读共享文件，多个工作进程映射同一个文件（需开启冷热分离）
+SHARED_COLD_STORE_ENABLED = os.getenv('QUESTION_BANK_SHARED_COLD_STORE', '1').lower() in ('1', 'true', 'yes')
+
+# 冷数据回收：私有冷数据文件中不再被引用的字节数达到该值且超过一半时，复制仍在使用的数据块到新文件
+COLD_RECLAIM_BYTES = int(os.getenv('QUESTION_BANK_COLD_RECLAIM_MB', '16')) * 1024 * 1024
+
+# 启动快照：加载后的紧凑记录与索引另存为快照，questions.json 未变化时启动跳过逐条校验和索引重建
+SNAPSHOT_ENABLED = os.getenv('QUESTION_BANK_SNAPSHOT', '1').lower() in ('1', 'true', 'yes')
+
+# 建立倒排索引的单值字段（status、sourceTaskId 为管理端写入的扩展字段）
+INDEXED_FIELDS = (
+    "topic", "difficulty", "type", "chapter", "section", "isRealExam", "reviewStatus", "paperId",
+    "status", "sourceTaskId",
+)
+
+# 建立倒排索引的多值扩展字段（管理端的章节/知识点标签）
+MULTI_VALUED_FIELDS = ("chapterIds", "knowledgePointIds")
+
+
+def _index_key(value: Any) -> Any:
+    """索引键统一使用枚举的取值，使 Difficulty.L1 与 "L1" 命中同一个键"""
+    return value.value if isinstance(value, Enum) else value
+
+
+# 统计计数的维度：sourceCategory 为统计口径的来源分类（真题/人工/生成）
+FACETS = ("difficulty", "type", "reviewStatus", "source", "sourceCategory")
+
+
+def _facet_values(question: QuestionMetadata) -> Tuple[Tuple[str, Any], ...]:
+    """题目在各统计维度上的取值"""
+    if question.isRealExam:
+        category = "real_exam"
+    elif question.source == "manual":
+        category = "manual"
+    else:
+        category = "generated"
+    return (
+        ("difficulty", _index_key(question.difficulty)),
+        ("type", _index_key(question.type)),
+        ("reviewStatus", _index_key(question.reviewStatus)),
+        ("source", question.source),
+        ("sourceCategory", category),
+    )
+
+
+# 启动快照的结构指纹：模型、紧凑记录的槽位或索引定义变化后旧快照失效
+SNAPSHOT_FINGERPRINT = schema_fingerprint(
+    QuestionMetadata, CompactQuestion.__slots__, INDEXED_FIELDS, MULTI_VALUED_FIELDS, FACETS, SEARCH_FIELDS
+)
+
+
+def _diff_facets(counters: Dict[str, Counter], actual: Dict[str, Counter]) -> List[Dict]:
+    """比较计数器与实际统计，返回不一致的项"""
+    drift = []
+    for facet in FACETS:
+        expected, found = actual.get(facet, Counter()), counters.get(facet, Counter())
+        for value in sorted(set(expected) | set(found), key=str):
+            if expected[value] != found[value]:
+                drift.append({"facet": facet, "value": value, "counter": found[value], "actual": expected[value]})
+    return drift
+
+
+def _hashable(value: Any) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+def _index_keys(question: QuestionMetadata) -> List[Tuple[str, Any]]:
+    """
+    题目在各个索引中登记的 (索引名, 键)
+
+    不完整的记录（IncompleteQuestion）中字段可能是任意取值，无法作为索引键的取值不登记
+    """
+    keys = [(field, _index_key(getattr(question, field, None))) for field in INDEXED_FIELDS]
+    for field in MULTI_VALUED_FIELDS:
+        values = getattr(question, field, None)
+        if isinstance(values, list):
+            keys.extend((field, value) for value in set(v for v in values if isinstance(v, str)))
+    difficulty = _index_key(question.difficulty)
+    review_status = _index_key(question.reviewStatus)
+    knowledge_points = question.knowledgePoints if isinstance(question.knowledgePoints, list) else []
+    for kp in set(kp for kp in knowledge_points if isinstance(kp, str)):
+        keys.append(("knowledgePoints", kp))
+        keys.append(("kp_difficulty_status", (kp, difficulty, review_status)))
+    if isinstance(question, IncompleteQuestion):
+        keys = [(name, key) for name, key in keys if _hashable(key)]
+    return keys
+
+
+def _query_constraints(
+    topic, difficulty, question_type, knowledge_points, chapter, section, is_real_exam,
+    review_status, paper_id, question_types, statuses, chapter_ids, knowledge_point_ids, source_task_ids=None
+) -> List[Tuple[str, List[Any]]]:
+    """
+    把 iter_query 的筛选条件转换为 [(索引名, 键列表)]
+
+    题目需要在每一项的索引中命中键列表里的任一键
+    """
+    constraints: List[Tuple[str, List[Any]]] = []
+
+    for name, keys in (
+        ("type", question_types),
+        ("status", statuses),
+        ("chapterIds", chapter_ids),
+        ("knowledgePointIds", knowledge_point_ids),
+        ("sourceTaskId", source_task_ids),
+    ):
+        if keys:
+            constraints.append((name, [_index_key(key) for key in keys]))
+
+    if topic:
+        constraints.append(("topic", [topic]))
+
+    if question_type:
+        constraints.append(("type", [_index_key(question_type)]))
+
+    if knowledge_points and difficulty and review_status:
+        # 知识点 + 难度 + 审核状态 直接命中组合索引
+        combo = (_index_key(difficulty), _index_key(review_status))
+        constraints.append(("kp_difficulty_status", [(kp,) + combo for kp in knowledge_points]))
+    else:
+        if knowledge_points:
+            constraints.append(("knowledgePoints", list(knowledge_points)))
+        if difficulty:
+            constraints.append(("difficulty", [_index_key(difficulty)]))
+        if review_status:
+            constraints.append(("reviewStatus", [_index_key(review_status)]))
+
+    for name, value in (("chapter", chapter), ("section", section), ("paperId", paper_id)):
+        if value:
+            constraints.append((name, [value]))
+
+    if is_real_exam is not None:
+        constraints.append(("isRealExam", [is_real_exam]))
+
+    return constraints
 
 
 class QuestionBank:
     """题库管理器"""
 
-    def __init__(self, data_file: str = "data/questions.json"):
+    def __init__(
+        self,
+        data_file: str = DEFAULT_DATA_FILE,
+        journal: bool = JOURNAL_ENABLED,
+        compact_threshold: int = JOURNAL_COMPACT_THRESHOLD,
+        cold_store: bool = COLD_STORE_ENABLED,
+        snapshot: bool = SNAPSHOT_ENABLED,
+        shared_cold_store: bool = SHARED_COLD_STORE_ENABLED,
+        cold_reclaim_bytes: int = COLD_RECLAIM_BYTES
+    ):
         self.data_file = data_file
-        self.questions: Dict[str, QuestionMetadata] = {}
+        # 题目以紧凑记录保存（见 core.compact_question），读取时转换为 QuestionMetadata
+        self.questions: Dict[str, CompactQuestion] = {}
+        # 冷热分离：每次加载都新建冷数据存储，记录中只保留引用
+        self.cold_store_enabled = cold_store
+        self.shared_cold_store_enabled = shared_cold_store
+        self._cold_store: Optional[ColdStore] = None
+        self.cold_reclaim_bytes = cold_reclaim_bytes
+        self.snapshot_enabled = snapshot
+        # 题库版本号：每次加载或变更后递增，供缓存判断数据是否变化
+        self.version = 0
+        # 最近一次加载/保存时的文件签名，用于检测外部修改
+        self._file_signature: Optional[Tuple] = None
+
+        # 日志模式
+        self.journal = journal
+        self.compact_threshold = compact_threshold
+        self._journal_entries = 0
+        self._lock = threading.RLock()
+        # _writing() 的嵌套深度：只有最外层获取进程间锁并检查外部修改
+        self._write_depth = 0
+        self._compaction_thread: Optional[threading.Thread] = None
+
+        # 倒排索引：索引名 -> 字段取值 -> 题目ID集合
+        # 除 INDEXED_FIELDS 外，还有 knowledgePoints 以及
+        # (knowledgePoint, difficulty, reviewStatus) 组合索引（推荐器的常用查询）
+        self._indexes: Dict[str, Dict[Any, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        # 每道题登记过的索引键，题目被原地修改后仍能准确移除旧索引
+        self._indexed_keys: Dict[str, List[Tuple[str, Any]]] = {}
+        # 插入序号，保证查询结果与题库字典的遍历顺序一致
+        self._sequence: Dict[str, int] = {}
+        self._next_sequence = 0
+        # 题干/选项/解析的全文检索索引
+        self._search_index = SearchIndex()
+        # 统计计数：维度 -> 取值 -> 题目数，随增删改增量维护
+        self._facets: Dict[str, Counter] = defaultdict(Counter)
+        self._facet_keys: Dict[str, Tuple[Tuple[str, Any], ...]] = {}
+
+        # 多版本读取（见 snapshot）：快照版本号 -> 持有该版本快照的读者数
+        self._readers: Counter = Counter()
+        # 撤销日志：题目ID -> [(修改生效的版本号, 修改前的记录, 修改前的序号)]，
+        # 只在有读者持有更早的快照时记录，读者全部释放后回收
+        self._undo: Dict[str, List[Tuple[int, Optional[CompactQuestion], Optional[int]]]] = {}
+
         self.load()
 
+    @property
+    def journal_file(self) -> str:
+        """变更日志文件（JSON Lines）"""
+        return os.path.splitext(self.data_file)[0] + ".journal.jsonl"
+
+    @property
+    def snapshot_file(self) -> str:
+        """启动快照路径（与 data_file 同目录）"""
+        return os.path.splitext(self.data_file)[0] + ".snapshot.bin"
+
+    @property
+    def shared_cold_prefix(self) -> str:
+        """共享冷数据文件的路径前缀（<prefix>.<版本>.bin 与指针文件 <prefix>.current）"""
+        return os.path.splitext(self.data_file)[0] + ".cold"
+
+    @property
+    def _compacting_file(self) -> str:
+        """正在合并中的日志文件"""
+        return self.journal_file + ".compacting"
+
+    @staticmethod
+    def _stat_file(path: str) -> Optional[Tuple[int, int]]:
+        """读取文件签名 (mtime_ns, size)，文件不存在时返回None"""
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _stat_signature(self) -> Optional[Tuple]:
+        """读取题库文件（日志模式下连同日志文件）的当前签名，题库文件不存在时返回None"""
+        data_signature = self._stat_file(self.data_file)
+        if data_signature is None:
+            return None
+        if not self.journal:
+            return data_signature
+        return (data_signature, self._stat_file(self.journal_file))
+
+    @staticmethod
+    def _parse_question(item: Dict) -> Optional[QuestionMetadata]:
+        """
+        解析单个题目
+
+        未通过校验的记录（如管理端录入的题目）解析为 IncompleteQuestion 照常保留；
+        没有题目ID的记录无法保存，跳过并返回None
+        """
+        if not isinstance(item, dict) or not isinstance(item.get('questionId'), str):
+            print(f"Warning: Skipping question record without questionId: {str(item)[:80]}")
+            return None
+        return parse_question(item)
+
     def load(self):
-        """从文件加载题库"""
+        """从文件加载题库（日志模式下在快照之上重放日志）"""
         if not os.path.exists(self.data_file):
+            # 先写出空题库，再照常加载（建立冷数据存储等）
             os.makedirs(os.path.dirname(self.data_file), exist_ok=True)
             self.save()
+
+        # 加载过程中创建大量对象，暂停循环垃圾回收避免反复扫描
+        with self._lock, gc_paused():
+            signature = self._stat_signature()
+            source_signature = None
+            questions: Optional[Dict[str, QuestionMetadata]] = None
+
+            cached = self._read_startup_snapshot()
+            if cached is None:
+                source_signature = file_signature(self.data_file)
+                with open(self.data_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+
+                questions = {}
+                for item in data:
+                    question = self._parse_question(item)
+                    if question:
+                        questions[question.questionId] = question
+
+            # 整体替换，读者不会看到加载到一半的题库
+            # 旧的冷数据存储仍被旧记录引用，随旧记录一起释放
+            if self.cold_store_enabled and self.shared_cold_store_enabled:
+                with shared_lock(self.shared_cold_prefix):
+                    self._cold_store = ColdStore(os.path.dirname(self.data_file), open_shared(self.shared_cold_prefix))
+                    records, journal_entries = self._build_records(cached, questions, source_signature)
+                    if self._cold_store.size:
+                        # 共享文件不存在或与当前题库不一致：由本进程发布新版本
+                        self._cold_store = self._publish_cold_store(records)
+            else:
+                self._cold_store = ColdStore(os.path.dirname(self.data_file)) if self.cold_store_enabled else None
+                records, journal_entries = self._build_records(cached, questions, source_signature)
+            self.questions = records
+            # 加载后的题库是新一代数据结构；旧快照继续引用上一代（不再被修改）的字典和索引
+            self._undo = {}
+            self._journal_entries = journal_entries
+            self._file_signature = signature
+            self.version += 1
+
+    def _build_records(
+        self, cached: Optional[Tuple], questions: Optional[Dict[str, QuestionMetadata]],
+        source_signature: Optional[List[int]]
+    ) -> Tuple[Dict[str, CompactQuestion], int]:
+        """
+        建立紧凑记录与索引（调用方需持有锁并已建立冷数据存储）
+
+        由启动快照恢复（cached），或者由解析出的题目（questions）建立并写入启动快照；
+        日志模式下随后重放日志
+
+        Returns:
+            (题目ID -> 紧凑记录, 当前日志的条数)
+        """
+        if cached is not None:
+            records = self._restore_startup_snapshot(cached)
+        else:
+            self._rebuild_indexes(questions.values())
+            records = {qid: self._compact(q) for qid, q in questions.items()}
+            self._write_startup_snapshot(source_signature, records)
+
+        journal_entries = 0
+        if self.journal:
+            # 先重放上次未完成合并的日志，再重放当前日志
+            self._replay_journal(records, self._compacting_file)
+            journal_entries = self._replay_journal(records, self.journal_file)
+        return records, journal_entries
+
+    def _publish_cold_store(self, records: Dict[str, CompactQuestion]) -> ColdStore:
+        """把 records 的冷数据发布为新的共享文件，并让记录改为引用共享文件"""
+        try:
+            shared = publish_shared(
+                self.shared_cold_prefix,
+                ((qid, record.cold_store.read(record.cold_ref)) for qid, record in records.items())
+            )
+        except OSError as e:
+            print(f"Warning: Failed to publish shared cold file: {e}")
+            return self._cold_store
+        store = ColdStore(os.path.dirname(self.data_file), shared)
+        for qid, record in records.items():
+            record.cold_store = store
+            record.cold_ref = store.shared_ref(qid)
+        return store
+
+    def _read_startup_snapshot(self) -> Optional[Tuple]:
+        """
+        读取并解码与 data_file 对应的启动快照
+
+        Returns:
+            ([(紧凑记录, 冷字段JSON)], [索引键], [统计维度取值], [检索词频])；
+            快照不可用时返回 None
+        """
+        if not self.snapshot_enabled:
+            return None
+        snapshot = read_snapshot(self.snapshot_file, self.data_file, SNAPSHOT_FINGERPRINT)
+        if snapshot is None:
+            return None
+        try:
+            state = snapshot["state"]
+            loaded = load_records(state["records"])
+            index_keys = decode_column(state["indexKeys"])
+            facet_keys = decode_column(state["facetKeys"])
+            documents = state["search"]
+            if not len(loaded) == len(index_keys) == len(facet_keys) == len(documents) == snapshot["count"]:
+                raise ValueError("snapshot sections have different lengths")
+        except Exception as e:
+            print(f"Warning: Failed to restore snapshot {self.snapshot_file}: {e}")
+            return None
+        return loaded, index_keys, facet_keys, documents
+
+    def _restore_startup_snapshot(self, cached: Tuple) -> Dict[str, CompactQuestion]:
+        """由 _read_startup_snapshot 的结果恢复紧凑记录与全部索引（不经校验，也不重新建立索引）"""
+        loaded, index_keys, facet_keys, documents = cached
+        records: Dict[str, CompactQuestion] = {}
+        for record, cold in loaded:
+            record.attach_cold(cold, self._cold_store)
+            records[record.questionId] = record
+        ids = list(records)
+
+        self._indexes = defaultdict(lambda: defaultdict(set))
+        self._indexed_keys = {}
+        for qid, keys in zip(ids, index_keys):
+            # 组合索引的键在快照中写为列表；索引名驻留，不必每道题各存一份
+            keys = [(intern(name), tuple(key) if type(key) is list else key) for name, key in keys]
+            for name, key in keys:
+                self._indexes[name][key].add(qid)
+            self._indexed_keys[qid] = keys
+        self._sequence = {qid: sequence for sequence, qid in enumerate(ids)}
+        self._next_sequence = len(ids)
+        self._search_index = SearchIndex.from_documents(zip(ids, documents))
+        self._facets = defaultdict(Counter)
+        self._facet_keys = {}
+        for qid, keys in zip(ids, facet_keys):
+            if keys is None:
+                continue
+            keys = tuple((intern(facet), value) for facet, value in keys)
+            for facet, value in keys:
+                self._facets[facet][value] += 1
+            self._facet_keys[qid] = keys
+        return records
+
+    def _write_startup_snapshot(self, source_signature: Optional[List[int]], records: Dict[str, CompactQuestion]):
+        """
+        为 data_file 的当前内容写入启动快照：紧凑记录与各索引（调用方需持有锁）
+
+        records 及当前索引须与 data_file 的内容一致（不含日志中的变更）
+        """
+        if not self.snapshot_enabled or not records:
+            return
+        ids = list(records)
+        try:
+            state = {
+                "records": dump_records(list(records.values())),
+                "indexKeys": encode_column([self._indexed_keys[qid] for qid in ids]),
+                "facetKeys": encode_column([self._facet_keys.get(qid) for qid in ids]),
+                "search": self._search_index.export_documents(ids),
+            }
+        except (TypeError, ValueError) as e:
+            print(f"Warning: Skipping startup snapshot: {e}")
             return
+        write_snapshot(self.snapshot_file, self.data_file, source_signature, SNAPSHOT_FINGERPRINT, len(ids), state)
+
+    def _replay_journal(self, records: Dict[str, CompactQuestion], path: str) -> int:
+        """
+        将日志文件中的变更重放到 records 与索引上（调用方需持有锁）
 
-        with open(self.data_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            for item in data:
-                question = QuestionMetadata(**item)
-                self.questions[question.questionId] = question
+        每条日志都是完整记录的覆盖或删除，重复重放结果不变。
+
+        Returns:
+            重放的日志条数
+        """
+        if not os.path.exists(path):
+            return 0
+
+        count = 0
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程崩溃时可能留下写了一半的最后一行
+                    print(f"Warning: Skipping corrupt journal line {line_no} in {path}")
+                    continue
+
+                count += 1
+                if entry.get("op") == "delete":
+                    question_id = entry.get("questionId")
+                    if question_id in records:
+                        self._release_cold(records.pop(question_id))
+                        self._index_remove(question_id)
+                else:
+                    question = self._parse_question(entry.get("question", {}))
+                    if question:
+                        qid = question.questionId
+                        previous = records.get(qid)
+                        records[qid] = self._compact(question, previous)
+                        self._release_cold(previous, records[qid])
+                        # 覆盖已有题目时保持插入序号，与字典中的位置一致
+                        self._index_remove(qid, keep_sequence=True)
+                        self._index_add(question)
+        return count
+
+    def reload_if_changed(self) -> bool:
+        """
+        题库文件被外部修改（mtime或大小变化）时重新加载
+
+        Returns:
+            是否发生了重新加载
+        """
+        signature = self._stat_signature()
+        if signature is None or signature == self._file_signature:
+            return False
+        self.load()
+        return True
+
+    @contextmanager
+    def _writing(self):
+        """
+        写入题库的临界区
+
+        持有进程内锁与数据文件的进程间锁（与 data_file 同名的 .lock 文件），并先重新加载其他进程
+        或外部工具写入的变更，之后的整体写回/日志追加不会覆盖它们。可以嵌套，
+        只有最外层获取进程间锁并检查外部修改。
+
+        Yields:
+            进入时是否重新加载了题库
+        """
+        with self._lock:
+            if self._write_depth:
+                self._write_depth += 1
+                try:
+                    yield False
+                finally:
+                    self._write_depth -= 1
+                return
+
+            with shared_lock(os.path.splitext(self.data_file)[0]):
+                self._write_depth = 1
+                try:
+                    yield self.reload_if_changed()
+                    self._reclaim_cold_store()
+                finally:
+                    self._write_depth = 0
 
     def save(self):
-        """保存题库到文件"""
-        data = [q.model_dump(mode='json') for q in self.questions.values()]
-        with open(self.data_file, 'w', encoding='utf-8') as f:
+        """保存题库到文件（日志模式下同时合并并清空日志）"""
+        if self.journal:
+            self.compact()
+            return
+
+        with self._writing():
+            os.replace(self._dump_snapshot([r.to_model() for r in self.questions.values()]), self.data_file)
+            self._file_signature = self._stat_signature()
+
+    def _dump_snapshot(self, questions: List[QuestionMetadata]) -> str:
+        """
+        将题库快照写入临时文件，由调用方原子替换到 data_file
+
+        Returns:
+            临时文件路径
+        """
+        data = [dump_question(q) for q in questions]
+        # 多个进程可能同时写快照，临时文件按进程区分
+        tmp_file = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii=False, indent=2)
+        return tmp_file
+
+    def _persist(self, op: str, question_id: str, question: Optional[QuestionMetadata] = None):
+        """持久化一次变更：日志模式下追加一行日志，否则整体保存"""
+        self._persist_many([(op, question_id, question)])
+
+    def _persist_many(self, changes: List[Tuple[str, str, Optional[QuestionMetadata]]]):
+        """持久化一批变更：日志模式下一次追加多行日志，否则只整体保存一次（调用方需在 _writing() 内）"""
+        if not self.journal:
+            self.save()
+            return
+
+        lines = []
+        for op, question_id, question in changes:
+            entry = {"op": op, "questionId": question_id}
+            if question is not None:
+                entry["question"] = dump_question(question)
+            lines.append(json.dumps(entry, ensure_ascii=False) + "\n")
+
+        with self._lock:
+            with open(self.journal_file, 'a', encoding='utf-8') as f:
+                f.writelines(lines)
+            self._journal_entries += len(lines)
+            self._file_signature = self._stat_signature()
+            needs_compaction = self._journal_entries >= self.compact_threshold
+
+        if needs_compaction:
+            self.compact(background=True)
+
+    def compact(self, background: bool = False):
+        """
+        将日志合并为新的题库快照
+
+        当前日志先被改名为 .compacting 文件，之后的变更写入新日志；
+        快照写完后再删除 .compacting 文件。中途崩溃时，load() 会重放两份日志。
+
+        Args:
+            background: 是否在后台线程中写入快照（已有合并在进行时直接返回）
+        """
+        while True:
+            with self._writing():
+                running = self._compaction_thread
+                if running is None or not running.is_alive():
+                    self._rotate_journal()
+                    self._file_signature = self._stat_signature()
+                    snapshot = list(self.questions.values())
+                    self._journal_entries = 0
+                    if background:
+                        self._compaction_thread = threading.Thread(
+                            target=self._finish_compaction,
+                            args=(snapshot,),
+                            daemon=True
+                        )
+                        self._compaction_thread.start()
+                        return
+                    break
+                if background:
+                    return
+            running.join()
+
+        self._finish_compaction(snapshot)
+
+    def _rotate_journal(self):
+        """将当前日志移入 .compacting 文件（调用方需持有锁）"""
+        if not os.path.exists(self.journal_file):
+            return
+        if os.path.exists(self._compacting_file):
+            # 上次合并未完成，追加到其后，保证重放顺序
+            with open(self._compacting_file, 'a', encoding='utf-8') as dst, \
+                    open(self.journal_file, 'r', encoding='utf-8') as src:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.journal_file)
+        else:
+            os.replace(self.journal_file, self._compacting_file)
+
+    def _finish_compaction(self, snapshot: List[CompactQuestion]):
+        """写入快照并删除已合并的日志，没有新的变更时同时更新启动快照"""
+        questions = [record.to_model() for record in snapshot]
+        tmp_file = self._dump_snapshot(questions)
+
+        # 替换快照与删除日志需在锁内完成，避免 load() 读到新快照却缺少日志
+        with self._writing() as reloaded:
+            if reloaded:
+                # 合并期间其他进程修改了题库：重新加载的内容已包含两份日志，改为写出它
+                os.remove(tmp_file)
+                questions = [record.to_model() for record in self.questions.values()]
+                tmp_file = self._dump_snapshot(questions)
+            os.replace(tmp_file, self.data_file)
+            if os.path.exists(self._compacting_file):
+                os.remove(self._compacting_file)
+            self._file_signature = self._stat_signature()
+            if not self._journal_entries:
+                # 合并期间没有新的变更：当前的记录与索引正是新文件的内容
+                self._write_startup_snapshot(file_signature(self.data_file), self.questions)
+
+    def _rebuild_indexes(self, questions: Iterable[QuestionMetadata]):
+        """根据给定的全部题目重建索引"""
+        self._indexes = defaultdict(lambda: defaultdict(set))
+        self._indexed_keys = {}
+        self._sequence = {}
+        self._next_sequence = 0
+        self._search_index = SearchIndex()
+        self._facets = defaultdict(Counter)
+        self._facet_keys = {}
+        for question in questions:
+            self._index_add(question)
 
-    def get(self, question_id: str) -> Optional[QuestionMetadata]:
-        """获取单个题目"""
-        return self.questions.get(question_id)
+    def _index_add(self, question: QuestionMetadata):
+        """将题目登记到各个索引"""
+        qid = question.questionId
+        if qid not in self._sequence:
+            self._sequence[qid] = self._next_sequence
+            self._next_sequence += 1
+
+        keys = _index_keys(question)
+        for name, key in keys:
+            self._indexes[name][key].add(qid)
+        self._indexed_keys[qid] = keys
+        self._search_index.add(qid, question_search_fields(question))
+
+        # 统计计数只包含面向学生的（完整的）题目
+        if isinstance(question, IncompleteQuestion):
+            return
+        facet_keys = _facet_values(question)
+        for facet, value in facet_keys:
+            self._facets[facet][value] += 1
+        self._facet_keys[qid] = facet_keys
+
+    def _index_remove(self, question_id: str, keep_sequence: bool = False):
+        """从各个索引中移除题目"""
+        for name, key in self._indexed_keys.pop(question_id, []):
+            ids = self._indexes[name].get(key)
+            if ids is None:
+                continue
+            ids.discard(question_id)
+            if not ids:
+                del self._indexes[name][key]
+        self._search_index.remove(question_id)
+        for facet, value in self._facet_keys.pop(question_id, ()):
+            counter = self._facets[facet]
+            counter[value] -= 1
+            if counter[value] <= 0:
+                del counter[value]
+        if not keep_sequence:
+            self._sequence.pop(question_id, None)
+
+    def _compact(self, question: QuestionMetadata, previous: Optional[CompactQuestion] = None) -> CompactQuestion:
+        """转换为紧凑记录（启用冷热分离时冷字段写入冷数据文件；与 previous 的冷字段相同时沿用其数据块）"""
+        previous_ref = None
+        if previous is not None and previous.cold_store is not None and previous.cold_store is self._cold_store:
+            previous_ref = previous.cold_ref
+        return CompactQuestion.from_model(question, self._cold_store, previous_ref)
+
+    def _put_record(self, question: QuestionMetadata):
+        """写入题目的紧凑记录，原记录不再引用的冷数据计入垃圾（调用方需持有锁）"""
+        previous = self.questions.get(question.questionId)
+        record = self._compact(question, previous)
+        self.questions[question.questionId] = record
+        self._release_cold(previous, record)
+
+    def _release_cold(self, old: Optional[CompactQuestion], new: Optional[CompactQuestion] = None):
+        """被替换或删除的记录的冷数据块不再被题库引用时登记为垃圾（调用方需持有锁）"""
+        if old is None or old.cold_store is None or old.cold_store is not self._cold_store:
+            return
+        if new is None or new.cold_ref != old.cold_ref:
+            old.cold_store.release(old.cold_ref)
+
+    def _reclaim_cold_store(self):
+        """
+        回收私有冷数据文件（调用方需持有锁）
+
+        垃圾达到 cold_reclaim_bytes 且超过私有文件的一半时，把仍在使用的数据块复制到新的冷数据存储，
+        记录整体替换为引用新存储的副本；正在读取旧记录的调用方不受影响，旧文件随旧记录一起释放。
+        有读者持有快照时推迟到之后的写入（快照仍在读取当前这一代的记录字典）
+        """
+        store = self._cold_store
+        if store is None or self._readers:
+            return
+        if store.garbage < self.cold_reclaim_bytes or store.garbage * 2 < store.size:
+            return
+        fresh = ColdStore(os.path.dirname(self.data_file), store.shared)
+        self.questions = {qid: record.relocate(fresh) for qid, record in self.questions.items()}
+        self._cold_store = fresh
+
+    def get(
+        self, question_id: str, include_cold: bool = True, include_incomplete: bool = False
+    ) -> Optional[QuestionMetadata]:
+        """
+        获取单个题目
+
+        Args:
+            include_cold: 为 False 时不读取解析、选项分布等冷字段（只用于筛选，不要写回题库）
+            include_incomplete: 为 True 时也返回不完整的记录（IncompleteQuestion，供管理端使用）
+        """
+        record = self.questions.get(question_id)
+        if record is None or (record.incomplete and not include_incomplete):
+            return None
+        return record.to_model(include_cold)
 
     def add(self, question: QuestionMetadata) -> QuestionMetadata:
         """添加题目"""
-        if question.questionId in self.questions:
-            raise ValueError(f"题目ID {question.questionId} 已存在")
+        with self._writing():
+            if question.questionId in self.questions:
+                raise ValueError(f"题目ID {question.questionId} 已存在")
 
-        self.questions[question.questionId] = question
-        self.save()
+            self._remember(question.questionId)
+            self._put_record(question)
+            self._index_add(question)
+            self.version += 1
+            self._persist("put", question.questionId, question)
         return question
 
     def update(self, question: QuestionMetadata) -> QuestionMetadata:
         """更新题目"""
-        if question.questionId not in self.questions:
-            raise ValueError(f"题目ID {question.questionId} 不存在")
+        with self._writing():
+            if question.questionId not in self.questions:
+                raise ValueError(f"题目ID {question.questionId} 不存在")
 
-        question.updatedAt = datetime.now()
-        self.questions[question.questionId] = question
-        self.save()
+            question.updatedAt = datetime.now()
+            self._remember(question.questionId)
+            self._put_record(question)
+            # 字典中原有键的位置不变，插入序号也保持不变
+            self._index_remove(question.questionId, keep_sequence=True)
+            self._index_add(question)
+            self.version += 1
+            self._persist("put", question.questionId, question)
         return question
 
+    def add_many(self, questions: List[QuestionMetadata]) -> Dict[str, List]:
+        """
+        批量添加题目，整批只持久化一次
+
+        题目ID已存在或在本批中重复时记为冲突并跳过，其余题目照常添加
+
+        Returns:
+            {"added": [题目ID], "updated": [], "conflicts": [{"questionId", "reason"}]}
+        """
+        return self._put_many(questions, overwrite=False)
+
+    def upsert_many(self, questions: List[QuestionMetadata]) -> Dict[str, List]:
+        """
+        批量添加或更新题目，整批只持久化一次
+
+        仅本批中重复的题目ID记为冲突（保留第一次出现的题目）
+
+        Returns:
+            {"added": [题目ID], "updated": [题目ID], "conflicts": [{"questionId", "reason"}]}
+        """
+        return self._put_many(questions, overwrite=True)
+
+    def _put_many(self, questions: List[QuestionMetadata], overwrite: bool) -> Dict[str, List]:
+        """批量写入题目"""
+        result = {"added": [], "updated": [], "conflicts": []}
+        changes = []
+        seen: Set[str] = set()
+        now = datetime.now()
+
+        # 整批在锁内完成，快照要么看到整批变更，要么一条也看不到
+        with self._writing():
+            for question in questions:
+                qid = question.questionId
+                if qid in seen:
+                    result["conflicts"].append({"questionId": qid, "reason": "批量数据中题目ID重复"})
+                    continue
+                seen.add(qid)
+
+                if qid in self.questions:
+                    if not overwrite:
+                        result["conflicts"].append({"questionId": qid, "reason": f"题目ID {qid} 已存在"})
+                        continue
+                    question.updatedAt = now
+                    self._remember(qid)
+                    self._put_record(question)
+                    self._index_remove(qid, keep_sequence=True)
+                    self._index_add(question)
+                    result["updated"].append(qid)
+                else:
+                    self._remember(qid)
+                    self._put_record(question)
+                    self._index_add(question)
+                    result["added"].append(qid)
+                changes.append(("put", qid, question))
+
+            if changes:
+                self.version += 1
+                self._persist_many(changes)
+        return result
+
     def delete(self, question_id: str) -> bool:
         """删除题目"""
-        if question_id in self.questions:
-            del self.questions[question_id]
-            self.save()
-            return True
-        return False
+        with self._writing():
+            if question_id not in self.questions:
+                return False
+            self._remember(question_id)
+            self._release_cold(self.questions.pop(question_id))
+            self._index_remove(question_id)
+            self.version += 1
+            self._persist("delete", question_id)
+        return True
+
+    def delete_many(self, question_ids: Iterable[str]) -> int:
+        """
+        批量删除题目，整批只持久化一次
+
+        Returns:
+            删除的题目数（不存在的题目ID跳过）
+        """
+        changes = []
+        with self._writing():
+            for question_id in question_ids:
+                if question_id not in self.questions:
+                    continue
+                self._remember(question_id)
+                self._release_cold(self.questions.pop(question_id))
+                self._index_remove(question_id)
+                changes.append(("delete", question_id, None))
+            if changes:
+                self.version += 1
+                self._persist_many(changes)
+        return len(changes)
 
     def query(
         self,
@@ -77,116 +888,479 @@ class QuestionBank:
         section: Optional[str] = None,
         is_real_exam: Optional[bool] = None,
         review_status: Optional[str] = None,
-        limit: Optional[int] = None
+        paper_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
     ) -> List[QuestionMetadata]:
-        """查询题目"""
-        results = list(self.questions.values())
+        """
+        查询题目
 
-        # 筛选条件
-        if topic:
-            results = [q for q in results if q.topic == topic]
+        每个筛选条件对应一个索引中的ID集合，按集合大小从小到大求交集；
+        结果顺序与题库的遍历顺序一致。
+        include_cold、include_incomplete 的含义见 get。
+        """
+        matches = self.iter_query(
+            topic=topic,
+            difficulty=difficulty,
+            question_type=question_type,
+            knowledge_points=knowledge_points,
+            chapter=chapter,
+            section=section,
+            is_real_exam=is_real_exam,
+            review_status=review_status,
+            paper_id=paper_id,
+            include_cold=include_cold,
+            include_incomplete=include_incomplete,
+        )
+        return [q for _, q in islice(matches, limit or None)]
 
-        if difficulty:
-            results = [q for q in results if q.difficulty == difficulty]
+    def iter_query(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        question_types: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        chapter_ids: Optional[List[str]] = None,
+        knowledge_point_ids: Optional[List[str]] = None,
+        source_task_ids: Optional[List[str]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        after: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
+    ) -> Iterator[Tuple[int, QuestionMetadata]]:
+        """
+        按顺序逐条产出符合条件的 (序号, 题目)
 
-        if question_type:
-            results = [q for q in results if q.type == question_type]
+        序号即题目加入题库的顺序，更新题目不会改变序号，可作为分页游标；
+        after 不为空时只产出序号大于 after 的题目。
 
-        if knowledge_points:
-            results = [
-                q for q in results
-                if any(kp in q.knowledgePoints for kp in knowledge_points)
-            ]
+        列表形式的条件（question_types、statuses、chapter_ids、knowledge_point_ids、source_task_ids）
+        命中其中任一取值即可；创建时间范围为 [created_from, created_to)，
+        在索引求交之后逐条判断，没有 createdAt 的题目不会命中。
+        不完整的记录只在 include_incomplete 为 True 时产出（见 get）。
 
-        if chapter:
-            results = [q for q in results if q.chapter == chapter]
+        整个迭代过程读取同一个快照（见 snapshot），迭代期间的修改不会出现在结果中。
+        """
+        view = self.snapshot()
+        try:
+            yield from view.iter_query(
+                topic=topic,
+                difficulty=difficulty,
+                question_type=question_type,
+                knowledge_points=knowledge_points,
+                chapter=chapter,
+                section=section,
+                is_real_exam=is_real_exam,
+                review_status=review_status,
+                paper_id=paper_id,
+                question_types=question_types,
+                statuses=statuses,
+                chapter_ids=chapter_ids,
+                knowledge_point_ids=knowledge_point_ids,
+                source_task_ids=source_task_ids,
+                created_from=created_from,
+                created_to=created_to,
+                after=after,
+                include_cold=include_cold,
+                include_incomplete=include_incomplete,
+            )
+        finally:
+            view.release()
 
-        if section:
-            results = [q for q in results if q.section == section]
+    def iter_query_ids(self, **filters) -> Iterator[Tuple[int, str]]:
+        """
+        按顺序逐条产出符合条件的 (序号, 题目ID)（筛选参数同 iter_query，include_cold 除外）
 
-        if is_real_exam is not None:
-            results = [q for q in results if q.isRealExam == is_real_exam]
+        不构造题目对象，适合只需要计数和分页的场景
+        """
+        view = self.snapshot()
+        try:
+            yield from view.iter_query_ids(**filters)
+        finally:
+            view.release()
 
-        if review_status:
-            results = [q for q in results if q.reviewStatus == review_status]
+    def snapshot(self) -> "QuestionBankSnapshot":
+        """
+        获取当前版本的只读快照
+
+        快照上的 get/query/iter_query 在释放之前始终看到同一个版本的题库；
+        写入方不等待读者，而是在撤销日志中保留被修改题目的旧记录，
+        所有更早的快照释放后旧记录随即回收。用完后调用 release()，或使用 with 语句。
+        """
+        with self._lock:
+            view = QuestionBankSnapshot(self)
+            self._readers[view.version] += 1
+        # 读者忘记释放时，快照被回收的同时释放
+        view._finalizer = weakref.finalize(view, self._release_version, view.version)
+        return view
+
+    def _release_version(self, version: int):
+        """一个读者释放了 version 版本的快照，回收不再需要的旧记录"""
+        with self._lock:
+            self._readers[version] -= 1
+            if self._readers[version] <= 0:
+                del self._readers[version]
+            if not self._readers:
+                self._undo = {}
+                return
+            oldest = min(self._readers)
+            for qid, entries in list(self._undo.items()):
+                # 版本号不超过 oldest 的修改对所有剩余读者都可见，旧记录不再需要；
+                # 替换而不是原地修改列表，读者可能正在遍历
+                kept = [entry for entry in entries if entry[0] > oldest]
+                if not kept:
+                    del self._undo[qid]
+                elif len(kept) != len(entries):
+                    self._undo[qid] = kept
+
+    def _remember(self, question_id: str):
+        """修改题目前调用：有读者持有快照时，记下修改前的记录（调用方需持有锁）"""
+        if self._readers:
+            self._undo.setdefault(question_id, []).append(
+                (self.version + 1, self.questions.get(question_id), self._sequence.get(question_id))
+            )
 
-        # 限制数量
-        if limit:
-            results = results[:limit]
+    def search(
+        self, keyword: str, mode: str = "and", limit: Optional[int] = None, include_incomplete: bool = False
+    ) -> List[QuestionMetadata]:
+        """
+        全文检索题干、选项和解析
+
+        Args:
+            keyword: 查询语句，空白分隔的关键词，支持 OR（见 core.search_index.parse_query）
+            mode: "and" 要求所有关键词命中，"or" 命中任一关键词即可
+            limit: 最多返回的题目数
+            include_incomplete: 是否包含不完整的记录（见 get）
+
+        Returns:
+            按相关度从高到低排列的题目
+        """
+        questions = (self.get(qid, include_incomplete=include_incomplete)
+                     for qid in self.search_ids(keyword, mode, limit, include_incomplete))
+        return [q for q in questions if q is not None]
 
-        return results
+    def search_ids(
+        self, keyword: str, mode: str = "and", limit: Optional[int] = None, include_incomplete: bool = False
+    ) -> List[str]:
+        """
+        全文检索，只返回按相关度排列的题目ID（参数同 search）
+
+        不读取冷数据也不构造模型，适合先与其他筛选条件求交集、分页后再读取当页的题目
+        """
+        with self._lock:
+            hits = self._search_index.search(keyword, mode, limit if include_incomplete else None)
+            if include_incomplete:
+                return [qid for qid, _ in hits]
+            ids = []
+            for qid, _ in hits:
+                record = self.questions.get(qid)
+                if record is not None and not record.incomplete:
+                    ids.append(qid)
+        return ids[:limit or None]
 
     def update_quality_stats(self, question_id: str, stats: QualityStats):
         """更新题目质量统计"""
-        question = self.get(question_id)
-        if not question:
-            raise ValueError(f"题目ID {question_id} 不存在")
+        # 读取与写回在同一临界区内，期间的其他修改不会被旧记录覆盖
+        with self._writing():
+            question = self.get(question_id)
+            if not question:
+                raise ValueError(f"题目ID {question_id} 不存在")
+
+            question.totalAttempts = stats.totalAttempts
+            question.correctCount = stats.correctCount
+            question.correctRate = stats.correctRate
+            question.avgTimeSeconds = stats.avgTimeSeconds
+            question.discriminationIndex = stats.discriminationIndex
+            question.optionDistribution = stats.optionDistribution
+
+            self.update(question)
 
-        question.totalAttempts = stats.totalAttempts
-        question.correctCount = stats.correctCount
-        question.correctRate = stats.correctRate
-        question.avgTimeSeconds = stats.avgTimeSeconds
-        question.discriminationIndex = stats.discriminationIndex
-        question.optionDistribution = stats.optionDistribution
+    def update_quality_stats_many(self, stats_list: Iterable[QualityStats]) -> int:
+        """
+        批量更新题目质量统计，整批只持久化一次
 
-        self.update(question)
+        题库中不存在的题目跳过
+
+        Returns:
+            更新的题目数
+        """
+        stats_list = list(stats_list)
+        with self._writing():
+            questions = []
+            for stats in stats_list:
+                question = self.get(stats.questionId)
+                if not question:
+                    continue
+                question.totalAttempts = stats.totalAttempts
+                question.correctCount = stats.correctCount
+                question.correctRate = stats.correctRate
+                question.avgTimeSeconds = stats.avgTimeSeconds
+                question.discriminationIndex = stats.discriminationIndex
+                question.optionDistribution = stats.optionDistribution
+                questions.append(question)
+
+            if questions:
+                self.upsert_many(questions)
+        return len(questions)
+
+    def facet_counts(self) -> Dict[str, Dict[Any, int]]:
+        """各统计维度的计数（增量维护，不扫描题库）"""
+        with self._lock:
+            return {facet: dict(self._facets[facet]) for facet in FACETS}
+
+    def check_statistics(self, repair: bool = False) -> Dict:
+        """
+        一致性检查：重新扫描题库统计，与增量计数器比较
+
+        Args:
+            repair: 发现不一致时用重新统计的结果替换计数器
+
+        Returns:
+            {"consistent": bool, "drift": [{"facet", "value", "counter", "actual"}], "repaired": bool}
+        """
+        with self._lock:
+            actual: Dict[str, Counter] = defaultdict(Counter)
+            for record in self.questions.values():
+                if record.incomplete:
+                    continue
+                for facet, value in _facet_values(record.to_model()):
+                    actual[facet][value] += 1
+            drift = _diff_facets(self._facets, actual)
+            repaired = bool(drift) and repair
+            if repaired:
+                self._facets = actual
+        if drift:
+            print(f"Warning: Question statistics drifted from counters: {drift}")
+        return {"consistent": not drift, "drift": drift, "repaired": repaired}
 
     def get_statistics(self) -> Dict:
-        """获取题库统计信息"""
-        total = len(self.questions)
-
-        # 按难度统计
-        difficulty_stats = {
-            "L1": 0,
-            "L2": 0,
-            "L3": 0
-        }
+        """获取题库统计信息（由增量计数器生成）"""
+        counts = self.facet_counts()
 
-        # 按题型统计
-        type_stats = {
-            "choice": 0,
-            "fill": 0,
-            "solution": 0
-        }
+        def with_defaults(facet: str, keys: List[str]) -> Dict[str, int]:
+            stats = {key: 0 for key in keys}
+            stats.update(counts[facet])
+            return stats
 
-        # 按审核状态统计
-        review_stats = {
-            "pending": 0,
-            "approved": 0,
-            "rejected": 0,
-            "revision": 0
+        return {
+            "total": sum(counts["sourceCategory"].values()),
+            "difficultyStats": with_defaults("difficulty", ["L1", "L2", "L3"]),
+            "typeStats": with_defaults("type", ["choice", "fill", "solution"]),
+            "reviewStats": with_defaults("reviewStatus", ["pending", "approved", "rejected", "revision"]),
+            "sourceStats": with_defaults("sourceCategory", ["real_exam", "generated", "manual"])
         }
 
-        # 按来源统计
-        source_stats = {
-            "real_exam": 0,
-            "generated": 0,
-            "manual": 0
-        }
 
-        for q in self.questions.values():
-            difficulty_stats[q.difficulty.value] += 1
-            type_stats[q.type.value] += 1
-            review_stats[q.reviewStatus.value] += 1
+class QuestionBankSnapshot:
+    """
+    题库的只读快照（由 QuestionBank.snapshot 创建）
+
+    创建时记下版本号和当前这一代的题目字典、序号、索引与撤销日志。
+    读取题目时先读当前记录，再查撤销日志：快照之后被修改过的题目
+    （撤销日志中有版本号大于快照版本的修改）返回第一次修改前的记录。
+    写入方先写撤销日志再修改记录，因此按这个顺序读取不会漏掉并发的修改。
+    """
+
+    def __init__(self, bank: QuestionBank):
+        self._bank = bank
+        self.version = bank.version
+        self._lock = bank._lock
+        self._questions = bank.questions
+        self._sequence = bank._sequence
+        self._indexes = bank._indexes
+        self._undo = bank._undo
+        self._finalizer: Optional[weakref.finalize] = None
+
+    def release(self):
+        """释放快照（可重复调用）"""
+        if self._finalizer is not None:
+            self._finalizer()
 
-            if q.isRealExam:
-                source_stats["real_exam"] += 1
-            elif q.source == "manual":
-                source_stats["manual"] += 1
+    def __enter__(self) -> "QuestionBankSnapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def _record(self, question_id: str) -> Tuple[Optional[CompactQuestion], Optional[int]]:
+        """快照版本中的 (记录, 序号)；题目当时不存在时记录为 None"""
+        record = self._questions.get(question_id)
+        sequence = self._sequence.get(question_id)
+        for changed_at, old_record, old_sequence in self._undo.get(question_id, ()):
+            if changed_at > self.version:
+                return old_record, old_sequence
+        return record, sequence
+
+    def _changed(self) -> Set[str]:
+        """快照之后被修改过的题目ID"""
+        return {qid for qid, entries in list(self._undo.items()) if entries[-1][0] > self.version}
+
+    def get(
+        self, question_id: str, include_cold: bool = True, include_incomplete: bool = False
+    ) -> Optional[QuestionMetadata]:
+        """获取快照版本中的题目（参数同 QuestionBank.get）"""
+        record, _ = self._record(question_id)
+        if record is None or (record.incomplete and not include_incomplete):
+            return None
+        return record.to_model(include_cold)
+
+    # 与 QuestionBank.query 相同：只依赖 iter_query
+    query = QuestionBank.query
+
+    def iter_query(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        question_types: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        chapter_ids: Optional[List[str]] = None,
+        knowledge_point_ids: Optional[List[str]] = None,
+        source_task_ids: Optional[List[str]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        after: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
+    ) -> Iterator[Tuple[int, QuestionMetadata]]:
+        """按顺序逐条产出快照版本中符合条件的 (序号, 题目)（参数同 QuestionBank.iter_query）"""
+        for sequence, record in self._iter_records(
+            topic, difficulty, question_type, knowledge_points, chapter, section, is_real_exam,
+            review_status, paper_id, question_types, statuses, chapter_ids, knowledge_point_ids,
+            source_task_ids, created_from, created_to, after, include_incomplete
+        ):
+            yield sequence, record.to_model(include_cold)
+
+    def iter_query_ids(self, **filters) -> Iterator[Tuple[int, str]]:
+        """按顺序逐条产出快照版本中符合条件的 (序号, 题目ID)（参数同 QuestionBank.iter_query_ids）"""
+        for sequence, record in self._iter_records(**filters):
+            yield sequence, record.questionId
+
+    def _iter_records(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        question_types: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        chapter_ids: Optional[List[str]] = None,
+        knowledge_point_ids: Optional[List[str]] = None,
+        source_task_ids: Optional[List[str]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        after: Optional[int] = None,
+        include_incomplete: bool = False
+    ) -> Iterator[Tuple[int, CompactQuestion]]:
+        """
+        按顺序逐条产出快照版本中符合条件的 (序号, 紧凑记录)
+
+        每个筛选条件对应一个索引中的ID集合，按集合大小从小到大求交集。
+        索引反映的是最新版本：快照之后没有修改过的题目在索引中的登记与快照时相同，
+        修改过的题目从结果中去掉，再按快照版本的记录逐条判断筛选条件。
+        """
+        constraints = _query_constraints(
+            topic, difficulty, question_type, knowledge_points, chapter, section, is_real_exam,
+            review_status, paper_id, question_types, statuses, chapter_ids, knowledge_point_ids, source_task_ids
+        )
+
+        # 求交与读取撤销日志在同一次加锁中完成，两者对应同一个最新版本
+        with self._lock:
+            if not constraints:
+                # 题库的遍历顺序即序号顺序
+                ids = list(self._questions)
             else:
-                source_stats["generated"] += 1
+                candidate_sets = []
+                for name, keys in constraints:
+                    index = self._indexes.get(name, {})
+                    if len(keys) == 1:
+                        candidate_sets.append(index.get(keys[0], set()))
+                    else:
+                        candidate_sets.append(set().union(*(index.get(key, ()) for key in keys)))
+                candidate_sets.sort(key=len)
+                smallest, others = candidate_sets[0], candidate_sets[1:]
+                ids = [qid for qid in smallest if all(qid in s for s in others)]
+                ids.sort(key=self._sequence.__getitem__)
+            changed = self._changed()
+            if changed:
+                ids = [qid for qid in ids if qid not in changed]
+                sequence_of = {qid: self._sequence[qid] for qid in ids}
+            elif after is not None:
+                ids = ids[bisect_right(ids, after, key=self._sequence.__getitem__):]
 
-        return {
-            "total": total,
-            "difficultyStats": difficulty_stats,
-            "typeStats": type_stats,
-            "reviewStats": review_stats,
-            "sourceStats": source_stats
-        }
+        if changed:
+            # 快照之后修改过的题目按快照版本的记录判断，再按序号并入结果
+            for qid in changed:
+                record, sequence = self._record(qid)
+                if record is not None and _record_matches(record, constraints):
+                    ids.append(qid)
+                    sequence_of[qid] = sequence
+            ids.sort(key=sequence_of.__getitem__)
+            if after is not None:
+                ids = ids[bisect_right(ids, after, key=sequence_of.__getitem__):]
+
+        for qid in ids:
+            record, sequence = self._record(qid)
+            if record is None or (record.incomplete and not include_incomplete):
+                continue
+            if created_from is not None or created_to is not None:
+                created_at = record.createdAt
+                # 不完整的记录中 createdAt 可能是无法解析的原始值
+                if not isinstance(created_at, datetime):
+                    continue
+                if created_from is not None and created_at < created_from:
+                    continue
+                if created_to is not None and created_at >= created_to:
+                    continue
+            yield sequence, record
+
+
+def _record_matches(record: CompactQuestion, constraints: List[Tuple[str, List[Any]]]) -> bool:
+    """逐条判断记录是否满足 _query_constraints 生成的条件"""
+    if not constraints:
+        return True
+    keys = set(_index_keys(record.to_model(include_cold=False)))
+    return all(any((name, key) in keys for key in wanted) for name, wanted in constraints)
+
+
+def create_question_bank():
+    """
+    按配置创建题库
+
+    QUESTION_BANK_BACKEND=json（默认）使用 questions.json，
+    QUESTION_BANK_BACKEND=sqlite 使用 QUESTION_BANK_SQLITE_FILE 指定的数据库
+    """
+    backend = os.getenv('QUESTION_BANK_BACKEND', 'json').lower()
+    if backend == 'sqlite':
+        from core.question_bank_sqlite import SQLiteQuestionBank, DEFAULT_DB_FILE
+        return SQLiteQuestionBank(os.getenv('QUESTION_BANK_SQLITE_FILE', DEFAULT_DB_FILE))
+    if backend != 'json':
+        raise ValueError(f"未知的题库存储后端: {backend}")
+    return QuestionBank()
 
 
 # 全局单例
-question_bank = QuestionBank()
+question_bank = create_question_bank()
 
 
 
@@ -0,0 +1,836 @@
+"""
+题库SQLite存储
+与 QuestionBank 提供相同的接口，适用于十万级以上的题库：
+筛选字段建有索引，知识点使用关联表，查询直接由SQL完成
+"""
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Dict, Tuple
+from datetime import datetime
+from schemas import IncompleteQuestion, QuestionMetadata, QualityStats, Difficulty, ProblemType, parse_question
+from core.search_index import SearchIndex, question_search_fields
+
+# 默认数据库文件
+DEFAULT_DB_FILE = str(Path(__file__).parent.parent / "data" / "questions.db")
+
+# iter_query 每次从数据库读取的行数
+ITER_BATCH_SIZE = 200
+
+# 表结构版本（PRAGMA user_version），低于该版本的数据库在打开时升级
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    question_id TEXT NOT NULL UNIQUE,
+    topic TEXT,
+    difficulty TEXT,
+    type TEXT,
+    chapter TEXT,
+    section TEXT,
+    is_real_exam INTEGER NOT NULL DEFAULT 0,
+    review_status TEXT,
+    paper_id TEXT,
+    source TEXT,
+    data TEXT NOT NULL,
+    complete INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_questions_topic ON questions(topic);
+CREATE INDEX IF NOT EXISTS idx_questions_difficulty ON questions(difficulty);
+CREATE INDEX IF NOT EXISTS idx_questions_type ON questions(type);
+CREATE INDEX IF NOT EXISTS idx_questions_chapter ON questions(chapter);
+CREATE INDEX IF NOT EXISTS idx_questions_section ON questions(section);
+CREATE INDEX IF NOT EXISTS idx_questions_review_status ON questions(review_status, difficulty);
+CREATE INDEX IF NOT EXISTS idx_questions_paper_id ON questions(paper_id);
+
+CREATE TABLE IF NOT EXISTS question_knowledge_points (
+    knowledge_point TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    PRIMARY KEY (knowledge_point, question_id)
+);
+CREATE INDEX IF NOT EXISTS idx_qkp_question_id ON question_knowledge_points(question_id);
+
+CREATE TABLE IF NOT EXISTS question_facets (
+    facet TEXT NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (facet, value)
+);
+"""
+
+# 统计维度 -> 取值表达式（与 QuestionBank 的 FACETS 一致；NULL 记为空字符串）
+FACET_EXPRESSIONS = {
+    "difficulty": "COALESCE({row}.difficulty, '')",
+    "type": "COALESCE({row}.type, '')",
+    "reviewStatus": "COALESCE({row}.review_status, '')",
+    "source": "COALESCE({row}.source, '')",
+    "sourceCategory": (
+        "CASE WHEN {row}.is_real_exam THEN 'real_exam' "
+        "WHEN {row}.source = 'manual' THEN 'manual' ELSE 'generated' END"
+    ),
+}
+
+
+# 触发器名称（包括旧版本数据库中的，升级时全部删除后重建）
+FACET_TRIGGERS = (
+    "questions_facets_insert", "questions_facets_delete", "questions_facets_update",
+    "questions_facets_update_old", "questions_facets_update_new",
+)
+
+
+def _facet_trigger_sql() -> str:
+    """生成维护 question_facets 计数的触发器（只统计完整的题目，与 QuestionBank 一致）"""
+    def bump(row: str, delta: int) -> str:
+        return "".join(
+            f"INSERT INTO question_facets (facet, value, count) "
+            f"VALUES ('{facet}', {expr.format(row=row)}, {delta}) "
+            f"ON CONFLICT (facet, value) DO UPDATE SET count = count + ({delta});\n"
+            for facet, expr in FACET_EXPRESSIONS.items()
+        )
+
+    cleanup = "DELETE FROM question_facets WHERE count <= 0;\n"
+    return (
+        f"CREATE TRIGGER IF NOT EXISTS questions_facets_insert AFTER INSERT ON questions "
+        f"WHEN NEW.complete BEGIN\n{bump('NEW', 1)}END;\n"
+        f"CREATE TRIGGER IF NOT EXISTS questions_facets_delete AFTER DELETE ON questions "
+        f"WHEN OLD.complete BEGIN\n{bump('OLD', -1)}{cleanup}END;\n"
+        f"CREATE TRIGGER IF NOT EXISTS questions_facets_update_old AFTER UPDATE ON questions "
+        f"WHEN OLD.complete BEGIN\n{bump('OLD', -1)}{cleanup}END;\n"
+        f"CREATE TRIGGER IF NOT EXISTS questions_facets_update_new AFTER UPDATE ON questions "
+        f"WHEN NEW.complete BEGIN\n{bump('NEW', 1)}END;\n"
+    )
+
+
+def _enum_value(value):
+    """枚举取值（兼容直接传入字符串）"""
+    return getattr(value, "value", value)
+
+
+def _column_value(value):
+    """索引列的取值：不完整的记录中字段可能是任意值，非标量的取值不写入索引列"""
+    value = _enum_value(value)
+    return value if value is None or isinstance(value, (str, int, float)) else None
+
+
+def _load_row(data: str, complete: int) -> QuestionMetadata:
+    """由 data 列还原题目（不完整的记录不经校验还原为 IncompleteQuestion）"""
+    if complete:
+        return QuestionMetadata.model_validate_json(data)
+    return IncompleteQuestion.from_record(json.loads(data))
+
+
+class SQLiteQuestionBank:
+    """基于SQLite的题库管理器"""
+
+    def __init__(self, db_file: str = DEFAULT_DB_FILE):
+        self.db_file = db_file
+        os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
+        # 连接在FastAPI的线程池中共享，所有操作由锁串行化
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        self._lock = threading.Lock()
+        # 本连接的写入次数，与 data_version（其他连接的提交）共同构成题库版本
+        self._writes = 0
+        # 全文检索索引在第一次检索时建立，之后随本连接的写入增量更新；
+        # 发现其他连接提交过（data_version 变化）时整体重建
+        self._search_index: Optional[SearchIndex] = None
+        self._search_data_version = None
+        self.load()
+
+    def load(self):
+        """初始化表结构；旧数据库第一次打开时升级表结构并重新统计计数"""
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._upgrade()
+            self._conn.executescript(_facet_trigger_sql())
+            has_rows = self._conn.execute("SELECT 1 FROM questions LIMIT 1").fetchone()
+            has_facets = self._conn.execute("SELECT 1 FROM question_facets LIMIT 1").fetchone()
+            if has_rows and not has_facets:
+                self._rebuild_facets()
+            self._conn.commit()
+
+    def _upgrade(self):
+        """
+        升级旧版本的数据库（调用方需持有锁并负责提交）
+
+        版本 1：增加 complete 列（不完整的记录为 0），统计触发器只统计完整的题目
+        """
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(questions)")}
+        if "complete" not in columns:
+            self._conn.execute("ALTER TABLE questions ADD COLUMN complete INTEGER NOT NULL DEFAULT 1")
+        for trigger in FACET_TRIGGERS:
+            self._conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        self._conn.execute("DELETE FROM question_facets")
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _recount_facets(self) -> Dict[str, Dict[str, int]]:
+        """扫描题目表重新统计各维度（调用方需持有锁）"""
+        counts: Dict[str, Dict[str, int]] = {}
+        for facet, expr in FACET_EXPRESSIONS.items():
+            column = expr.format(row="questions")
+            rows = self._conn.execute(
+                f"SELECT {column}, COUNT(*) FROM questions WHERE complete GROUP BY 1"
+            ).fetchall()
+            counts[facet] = dict(rows)
+        return counts
+
+    def _rebuild_facets(self):
+        """用重新统计的结果覆盖计数表（调用方需持有锁并负责提交）"""
+        self._conn.execute("DELETE FROM question_facets")
+        self._conn.executemany(
+            "INSERT INTO question_facets (facet, value, count) VALUES (?, ?, ?)",
+            [(facet, value, count)
+             for facet, values in self._recount_facets().items()
+             for value, count in values.items()]
+        )
+
+    @property
+    def version(self) -> tuple:
+        """题库版本：任何一次提交（包括其他进程的提交）后都会变化"""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return (self._writes, data_version)
+
+    def save(self):
+        """每次变更都已在事务中提交，这里无需额外操作"""
+
+    def reload_if_changed(self) -> bool:
+        """数据直接从数据库读取，始终是最新的"""
+        return False
+
+    @staticmethod
+    def _row_values(question: QuestionMetadata) -> tuple:
+        """题目对应的索引列取值、完整JSON与是否完整"""
+        incomplete = isinstance(question, IncompleteQuestion)
+        return (
+            _column_value(question.topic),
+            _column_value(question.difficulty),
+            _column_value(question.type),
+            _column_value(question.chapter),
+            _column_value(question.section),
+            int(question.isRealExam is True),
+            _column_value(question.reviewStatus),
+            _column_value(question.paperId),
+            _column_value(question.source),
+            question.model_dump_json(exclude_unset=True, warnings=not incomplete),
+            int(not incomplete),
+        )
+
+    def _write_knowledge_points(self, question: QuestionMetadata):
+        """重写题目的知识点关联（调用方需持有锁并负责提交）"""
+        self._conn.execute(
+            "DELETE FROM question_knowledge_points WHERE question_id = ?",
+            (question.questionId,)
+        )
+        knowledge_points = question.knowledgePoints if isinstance(question.knowledgePoints, list) else []
+        self._conn.executemany(
+            "INSERT INTO question_knowledge_points (knowledge_point, question_id) VALUES (?, ?)",
+            [(kp, question.questionId) for kp in set(kp for kp in knowledge_points if isinstance(kp, str))]
+        )
+
+    def _insert(self, question: QuestionMetadata):
+        """插入题目（调用方需持有锁并负责提交）"""
+        self._conn.execute(
+            """
+            INSERT INTO questions (
+                question_id, topic, difficulty, type, chapter, section,
+                is_real_exam, review_status, paper_id, source, data, complete
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (question.questionId,) + self._row_values(question)
+        )
+        self._write_knowledge_points(question)
+        if self._search_index is not None:
+            self._search_index.add(question.questionId, question_search_fields(question))
+
+    def get(
+        self, question_id: str, include_cold: bool = True, include_incomplete: bool = False
+    ) -> Optional[QuestionMetadata]:
+        """获取单个题目（参数同 QuestionBank.get；整行存储，include_cold 仅为与 QuestionBank 接口一致）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, complete FROM questions WHERE question_id = ?", (question_id,)
+            ).fetchone()
+        if row is None or not (row[1] or include_incomplete):
+            return None
+        return _load_row(*row)
+
+    def add(self, question: QuestionMetadata) -> QuestionMetadata:
+        """添加题目"""
+        with self._lock:
+            try:
+                self._insert(question)
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                raise ValueError(f"题目ID {question.questionId} 已存在")
+            self._conn.commit()
+            self._writes += 1
+        return question
+
+    def _update_row(self, question: QuestionMetadata) -> bool:
+        """更新题目所在行（调用方需持有锁并负责提交）"""
+        cursor = self._conn.execute(
+            """
+            UPDATE questions SET
+                topic = ?, difficulty = ?, type = ?, chapter = ?, section = ?,
+                is_real_exam = ?, review_status = ?, paper_id = ?, source = ?, data = ?, complete = ?
+            WHERE question_id = ?
+            """,
+            self._row_values(question) + (question.questionId,)
+        )
+        if cursor.rowcount == 0:
+            return False
+        self._write_knowledge_points(question)
+        if self._search_index is not None:
+            self._search_index.add(question.questionId, question_search_fields(question))
+        return True
+
+    def update(self, question: QuestionMetadata) -> QuestionMetadata:
+        """更新题目"""
+        question.updatedAt = datetime.now()
+        with self._lock:
+            if not self._update_row(question):
+                self._conn.rollback()
+                raise ValueError(f"题目ID {question.questionId} 不存在")
+            self._conn.commit()
+            self._writes += 1
+        return question
+
+    def add_many(self, questions: List[QuestionMetadata]) -> Dict[str, List]:
+        """
+        批量添加题目，整批在一个事务中提交
+
+        Returns:
+            {"added": [题目ID], "updated": [], "conflicts": [{"questionId", "reason"}]}
+        """
+        return self._put_many(questions, overwrite=False)
+
+    def upsert_many(self, questions: List[QuestionMetadata]) -> Dict[str, List]:
+        """
+        批量添加或更新题目，整批在一个事务中提交
+
+        Returns:
+            {"added": [题目ID], "updated": [题目ID], "conflicts": [{"questionId", "reason"}]}
+        """
+        return self._put_many(questions, overwrite=True)
+
+    def _put_many(self, questions: List[QuestionMetadata], overwrite: bool) -> Dict[str, List]:
+        """批量写入题目"""
+        result = {"added": [], "updated": [], "conflicts": []}
+        seen = set()
+        now = datetime.now()
+
+        with self._lock:
+            for question in questions:
+                qid = question.questionId
+                if qid in seen:
+                    result["conflicts"].append({"questionId": qid, "reason": "批量数据中题目ID重复"})
+                    continue
+                seen.add(qid)
+
+                exists = self._conn.execute(
+                    "SELECT 1 FROM questions WHERE question_id = ?", (qid,)
+                ).fetchone()
+                if exists:
+                    if not overwrite:
+                        result["conflicts"].append({"questionId": qid, "reason": f"题目ID {qid} 已存在"})
+                        continue
+                    question.updatedAt = now
+                    self._update_row(question)
+                    result["updated"].append(qid)
+                else:
+                    self._insert(question)
+                    result["added"].append(qid)
+            self._conn.commit()
+            self._writes += 1
+
+        return result
+
+    def delete(self, question_id: str) -> bool:
+        """删除题目"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM questions WHERE question_id = ?", (question_id,)
+            )
+            self._conn.execute(
+                "DELETE FROM question_knowledge_points WHERE question_id = ?", (question_id,)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._search_index is not None:
+                self._search_index.remove(question_id)
+        return cursor.rowcount > 0
+
+    def delete_many(self, question_ids: Iterable[str]) -> int:
+        """批量删除题目（一个事务），返回删除的题目数"""
+        deleted = 0
+        with self._lock:
+            for question_id in question_ids:
+                cursor = self._conn.execute(
+                    "DELETE FROM questions WHERE question_id = ?", (question_id,)
+                )
+                if not cursor.rowcount:
+                    continue
+                self._conn.execute(
+                    "DELETE FROM question_knowledge_points WHERE question_id = ?", (question_id,)
+                )
+                deleted += 1
+                if self._search_index is not None:
+                    self._search_index.remove(question_id)
+            self._conn.commit()
+            self._writes += 1
+        return deleted
+
+    def query(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
+    ) -> List[QuestionMetadata]:
+        """查询题目（结果按插入顺序排列，与 QuestionBank.query 一致；整行存储，忽略 include_cold）"""
+        sql, params = self._query_sql(
+            topic, difficulty, question_type, knowledge_points,
+            chapter, section, is_real_exam, review_status, paper_id, limit, include_incomplete
+        )
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_load_row(*row) for row in rows]
+
+    def _query_sql(
+        self, topic, difficulty, question_type, knowledge_points,
+        chapter, section, is_real_exam, review_status, paper_id, limit, include_incomplete
+    ) -> Tuple[str, list]:
+        """query 的SQL和参数"""
+        clauses, params = self._filter_clauses(
+            topic, difficulty, question_type, knowledge_points,
+            chapter, section, is_real_exam, review_status, paper_id, include_incomplete
+        )
+
+        sql = "SELECT data, complete FROM questions"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY seq"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def iter_query(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        question_types: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        chapter_ids: Optional[List[str]] = None,
+        knowledge_point_ids: Optional[List[str]] = None,
+        source_task_ids: Optional[List[str]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        after: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
+    ) -> Iterator[Tuple[int, QuestionMetadata]]:
+        """
+        按顺序逐条产出符合条件的 (seq, 题目)
+
+        按 seq 分批读取（每批 ITER_BATCH_SIZE 行），所有批次在同一个快照（见 snapshot）上读取，
+        迭代期间不持有题库的锁，迭代期间的提交也不会出现在结果中；
+        after 不为空时只产出 seq 大于 after 的题目。
+        管理端扩展字段（status、sourceTaskId、chapterIds、knowledgePointIds、createdAt）
+        没有独立的列，通过 JSON 函数在 data 列上判断。
+        """
+        with self.snapshot() as view:
+            yield from view.iter_query(
+                topic=topic,
+                difficulty=difficulty,
+                question_type=question_type,
+                knowledge_points=knowledge_points,
+                chapter=chapter,
+                section=section,
+                is_real_exam=is_real_exam,
+                review_status=review_status,
+                paper_id=paper_id,
+                question_types=question_types,
+                statuses=statuses,
+                chapter_ids=chapter_ids,
+                knowledge_point_ids=knowledge_point_ids,
+                source_task_ids=source_task_ids,
+                created_from=created_from,
+                created_to=created_to,
+                after=after,
+                include_cold=include_cold,
+                include_incomplete=include_incomplete,
+            )
+
+    def iter_query_ids(self, **filters) -> Iterator[Tuple[int, str]]:
+        """按顺序逐条产出符合条件的 (seq, 题目ID)（参数同 QuestionBank.iter_query_ids，不读取 data 列）"""
+        with self.snapshot() as view:
+            yield from view.iter_query_ids(**filters)
+
+    def _iter_query_sql(
+        self, topic=None, difficulty=None, question_type=None, knowledge_points=None, chapter=None,
+        section=None, is_real_exam=None, review_status=None, paper_id=None, question_types=None,
+        statuses=None, chapter_ids=None, knowledge_point_ids=None, source_task_ids=None,
+        created_from=None, created_to=None, include_incomplete=False, columns="seq, data, complete"
+    ) -> Tuple[str, list]:
+        """iter_query 的SQL和参数（最后两个参数 seq > ? 与 LIMIT ? 由调用方追加）"""
+        clauses, params = self._filter_clauses(
+            topic, difficulty, question_type, knowledge_points,
+            chapter, section, is_real_exam, review_status, paper_id, include_incomplete
+        )
+
+        if question_types:
+            clauses.append(f"type IN ({', '.join('?' for _ in question_types)})")
+            params.extend(_enum_value(t) for t in question_types)
+        if statuses:
+            clauses.append(f"json_extract(data, '$.status') IN ({', '.join('?' for _ in statuses)})")
+            params.extend(statuses)
+        if source_task_ids:
+            clauses.append(f"json_extract(data, '$.sourceTaskId') IN ({', '.join('?' for _ in source_task_ids)})")
+            params.extend(source_task_ids)
+        for field, values in (("chapterIds", chapter_ids), ("knowledgePointIds", knowledge_point_ids)):
+            if values:
+                clauses.append(
+                    f"EXISTS (SELECT 1 FROM json_each(data, '$.{field}') "
+                    f"WHERE value IN ({', '.join('?' for _ in values)}))"
+                )
+                params.extend(values)
+        if created_from is not None:
+            clauses.append("json_extract(data, '$.createdAt') >= ?")
+            params.append(created_from.isoformat())
+        if created_to is not None:
+            clauses.append("json_extract(data, '$.createdAt') < ?")
+            params.append(created_to.isoformat())
+        sql = f"SELECT {columns} FROM questions WHERE " + " AND ".join(clauses + ["seq > ?"])
+        sql += " ORDER BY seq LIMIT ?"
+        return sql, params
+
+    def snapshot(self) -> "SQLiteQuestionBankSnapshot":
+        """
+        获取当前已提交数据的只读快照（接口同 QuestionBank.snapshot）
+
+        快照使用独立的连接并保持一个读事务；WAL 模式下读事务始终看到开始时的数据，
+        不阻塞写入，旧版本页面在所有读事务结束后由检查点回收。
+        """
+        return SQLiteQuestionBankSnapshot(self)
+
+    def _filter_clauses(
+        self, topic, difficulty, question_type, knowledge_points,
+        chapter, section, is_real_exam, review_status, paper_id, include_incomplete
+    ) -> Tuple[List[str], list]:
+        """把筛选条件转换为 WHERE 子句和参数"""
+        clauses = [] if include_incomplete else ["complete = 1"]
+        params: list = []
+
+        for column, value in (
+            ("topic", topic),
+            ("difficulty", _enum_value(difficulty)),
+            ("type", _enum_value(question_type)),
+            ("chapter", chapter),
+            ("section", section),
+            ("review_status", _enum_value(review_status)),
+            ("paper_id", paper_id),
+        ):
+            if value:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+
+        if is_real_exam is not None:
+            clauses.append("is_real_exam = ?")
+            params.append(int(is_real_exam))
+
+        if knowledge_points:
+            placeholders = ", ".join("?" for _ in knowledge_points)
+            clauses.append(
+                "question_id IN (SELECT question_id FROM question_knowledge_points "
+                f"WHERE knowledge_point IN ({placeholders}))"
+            )
+            params.extend(knowledge_points)
+
+        return clauses, params
+
+    def search(
+        self, keyword: str, mode: str = "and", limit: Optional[int] = None, include_incomplete: bool = False
+    ) -> List[QuestionMetadata]:
+        """全文检索题干、选项和解析（参数与 QuestionBank.search 相同）"""
+        questions = (self.get(qid, include_incomplete=include_incomplete)
+                     for qid in self.search_ids(keyword, mode, limit, include_incomplete))
+        return [q for q in questions if q is not None]
+
+    def search_ids(
+        self, keyword: str, mode: str = "and", limit: Optional[int] = None, include_incomplete: bool = False
+    ) -> List[str]:
+        """全文检索，只返回按相关度排列的题目ID（同 QuestionBank.search_ids）"""
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._search_index is None or data_version != self._search_data_version:
+                self._search_index = SearchIndex()
+                for qid, data, complete in self._conn.execute("SELECT question_id, data, complete FROM questions"):
+                    self._search_index.add(qid, question_search_fields(_load_row(data, complete)))
+                self._search_data_version = data_version
+            hits = self._search_index.search(keyword, mode, limit if include_incomplete else None)
+            if include_incomplete:
+                return [qid for qid, _ in hits]
+            incomplete = {qid for qid, in self._conn.execute("SELECT question_id FROM questions WHERE complete = 0")}
+        return [qid for qid, _ in hits if qid not in incomplete][:limit or None]
+
+    def update_quality_stats(self, question_id: str, stats: QualityStats):
+        """更新题目质量统计"""
+        question = self.get(question_id)
+        if not question:
+            raise ValueError(f"题目ID {question_id} 不存在")
+
+        question.totalAttempts = stats.totalAttempts
+        question.correctCount = stats.correctCount
+        question.correctRate = stats.correctRate
+        question.avgTimeSeconds = stats.avgTimeSeconds
+        question.discriminationIndex = stats.discriminationIndex
+        question.optionDistribution = stats.optionDistribution
+
+        self.update(question)
+
+    def update_quality_stats_many(self, stats_list: Iterable[QualityStats]) -> int:
+        """
+        批量更新题目质量统计，整批在一个事务中提交
+
+        题库中不存在的题目跳过
+
+        Returns:
+            更新的题目数
+        """
+        questions = []
+        for stats in stats_list:
+            question = self.get(stats.questionId)
+            if not question:
+                continue
+            question.totalAttempts = stats.totalAttempts
+            question.correctCount = stats.correctCount
+            question.correctRate = stats.correctRate
+            question.avgTimeSeconds = stats.avgTimeSeconds
+            question.discriminationIndex = stats.discriminationIndex
+            question.optionDistribution = stats.optionDistribution
+            questions.append(question)
+
+        if questions:
+            self.upsert_many(questions)
+        return len(questions)
+
+    def facet_counts(self) -> Dict[str, Dict[Optional[str], int]]:
+        """各统计维度的计数（读取触发器维护的计数表）"""
+        counts: Dict[str, Dict[Optional[str], int]] = {facet: {} for facet in FACET_EXPRESSIONS}
+        with self._lock:
+            rows = self._conn.execute("SELECT facet, value, count FROM question_facets").fetchall()
+        for facet, value, count in rows:
+            counts.setdefault(facet, {})[value or None] = count
+        return counts
+
+    def check_statistics(self, repair: bool = False) -> Dict:
+        """一致性检查：重新统计并与计数表比较（参数与返回值同 QuestionBank.check_statistics）"""
+        with self._lock:
+            actual = self._recount_facets()
+            rows = self._conn.execute("SELECT facet, value, count FROM question_facets").fetchall()
+            stored: Dict[str, Dict[str, int]] = {}
+            for facet, value, count in rows:
+                stored.setdefault(facet, {})[value] = count
+
+            drift = []
+            for facet in FACET_EXPRESSIONS:
+                expected, found = actual.get(facet, {}), stored.get(facet, {})
+                for value in sorted(set(expected) | set(found)):
+                    if expected.get(value, 0) != found.get(value, 0):
+                        drift.append({
+                            "facet": facet, "value": value or None,
+                            "counter": found.get(value, 0), "actual": expected.get(value, 0)
+                        })
+
+            repaired = bool(drift) and repair
+            if repaired:
+                self._rebuild_facets()
+                self._conn.commit()
+        if drift:
+            print(f"Warning: Question statistics drifted from counters: {drift}")
+        return {"consistent": not drift, "drift": drift, "repaired": repaired}
+
+    def get_statistics(self) -> Dict:
+        """获取题库统计信息（由计数表生成）"""
+        counts = self.facet_counts()
+
+        def with_defaults(facet: str, keys: List[str]) -> Dict[str, int]:
+            stats = {key: 0 for key in keys}
+            stats.update(counts[facet])
+            return stats
+
+        return {
+            "total": sum(counts["sourceCategory"].values()),
+            "difficultyStats": with_defaults("difficulty", ["L1", "L2", "L3"]),
+            "typeStats": with_defaults("type", ["choice", "fill", "solution"]),
+            "reviewStats": with_defaults("reviewStatus", ["pending", "approved", "rejected", "revision"]),
+            "sourceStats": with_defaults("sourceCategory", ["real_exam", "generated", "manual"])
+        }
+
+    def import_from_json(self, json_file: str) -> int:
+        """
+        从 questions.json 一次性导入题目（已存在的题目ID会被覆盖）
+
+        Returns:
+            导入的题目数量
+        """
+        with open(json_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        # 同一ID出现多次时以最后一条为准，与 QuestionBank.load 一致；
+        # 未通过校验的记录作为不完整的记录导入（见 IncompleteQuestion）
+        questions: Dict[str, QuestionMetadata] = {}
+        for item in data:
+            if not isinstance(item, dict) or not isinstance(item.get('questionId'), str):
+                print(f"Warning: Skipping question record without questionId: {str(item)[:80]}")
+                continue
+            question = parse_question(item)
+            questions[question.questionId] = question
+
+        with self._lock:
+            for question in questions.values():
+                self._conn.execute(
+                    "DELETE FROM questions WHERE question_id = ?", (question.questionId,)
+                )
+                self._insert(question)
+            self._conn.commit()
+            self._writes += 1
+
+        return len(questions)
+
+
+class SQLiteQuestionBankSnapshot:
+    """SQLite 题库的只读快照（由 SQLiteQuestionBank.snapshot 创建）"""
+
+    def __init__(self, bank: SQLiteQuestionBank):
+        self._bank = bank
+        self.version = bank.version
+        # 自动提交模式，由这里显式开始和结束读事务
+        self._conn = sqlite3.connect(bank.db_file, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("BEGIN")
+        # 读事务在第一次读取时才真正固定数据版本
+        self._conn.execute("SELECT 1 FROM questions LIMIT 1").fetchone()
+
+    def release(self):
+        """结束读事务并关闭连接（可重复调用）"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self) -> "SQLiteQuestionBankSnapshot":
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __del__(self):
+        try:
+            self.release()
+        except Exception:
+            pass
+
+    def _fetch(self, sql: str, params) -> list:
+        with self._lock:
+            if self._conn is None:
+                raise ValueError("快照已释放")
+            return self._conn.execute(sql, params).fetchall()
+
+    def get(
+        self, question_id: str, include_cold: bool = True, include_incomplete: bool = False
+    ) -> Optional[QuestionMetadata]:
+        """获取快照中的题目（参数同 SQLiteQuestionBank.get）"""
+        rows = self._fetch("SELECT data, complete FROM questions WHERE question_id = ?", (question_id,))
+        if not rows or not (rows[0][1] or include_incomplete):
+            return None
+        return _load_row(*rows[0])
+
+    def query(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
+    ) -> List[QuestionMetadata]:
+        """在快照上查询题目（参数同 SQLiteQuestionBank.query）"""
+        sql, params = self._bank._query_sql(
+            topic, difficulty, question_type, knowledge_points,
+            chapter, section, is_real_exam, review_status, paper_id, limit, include_incomplete
+        )
+        return [_load_row(*row) for row in self._fetch(sql, params)]
+
+    def iter_query(
+        self,
+        topic: Optional[str] = None,
+        difficulty: Optional[Difficulty] = None,
+        question_type: Optional[ProblemType] = None,
+        knowledge_points: Optional[List[str]] = None,
+        chapter: Optional[str] = None,
+        section: Optional[str] = None,
+        is_real_exam: Optional[bool] = None,
+        review_status: Optional[str] = None,
+        paper_id: Optional[str] = None,
+        question_types: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        chapter_ids: Optional[List[str]] = None,
+        knowledge_point_ids: Optional[List[str]] = None,
+        source_task_ids: Optional[List[str]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        after: Optional[int] = None,
+        include_cold: bool = True,
+        include_incomplete: bool = False
+    ) -> Iterator[Tuple[int, QuestionMetadata]]:
+        """在快照上按 seq 分批读取符合条件的 (seq, 题目)（参数同 SQLiteQuestionBank.iter_query）"""
+        sql, params = self._bank._iter_query_sql(
+            topic, difficulty, question_type, knowledge_points, chapter, section, is_real_exam,
+            review_status, paper_id, question_types, statuses, chapter_ids, knowledge_point_ids,
+            source_task_ids, created_from, created_to, include_incomplete
+        )
+        for seq, data, complete in self._iter_rows(sql, params, after):
+            yield seq, _load_row(data, complete)
+
+    def iter_query_ids(self, after: Optional[int] = None, **filters) -> Iterator[Tuple[int, str]]:
+        """在快照上按 seq 分批读取符合条件的 (seq, 题目ID)（参数同 SQLiteQuestionBank.iter_query_ids）"""
+        sql, params = self._bank._iter_query_sql(columns="seq, question_id", **filters)
+        yield from self._iter_rows(sql, params, after)
+
+    def _iter_rows(self, sql: str, params: list, after: Optional[int]) -> Iterator[tuple]:
+        """按 seq 分批执行 _iter_query_sql 生成的查询"""
+        last = after if after is not None else 0
+        while True:
+            rows = self._fetch(sql, params + [last, ITER_BATCH_SIZE])
+            yield from rows
+            if len(rows) < ITER_BATCH_SIZE:
+                return
+            last = rows[-1][0]
@@ -2,18 +2,50 @@
 个性化推荐模块
 基于学生能力画像推荐题目
 """
+import copy
+import functools
 import random
 from typing import List
 from schemas import QuestionMetadata, StudentProfile, Difficulty, ProblemType
 
 
+def _on_snapshot(method):
+    """
+    推荐方法装饰器：整个推荐过程（画像计算、多次筛选、补全内容）读取同一个题库快照，
+    不会看到推荐进行到一半时的修改
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._pinned:
+            return method(self, *args, **kwargs)
+        with self.question_bank.snapshot() as view:
+            # 浅拷贝一个绑定到快照的推荐器，共享实例不受影响
+            pinned = copy.copy(self)
+            pinned.question_bank = view
+            pinned._pinned = True
+            return method(pinned, *args, **kwargs)
+    return wrapper
+
+
 class ProblemRecommender:
     """题目推荐器"""
 
     def __init__(self, question_bank_ref, answer_tracker_ref):
         self.question_bank = question_bank_ref
         self.answer_tracker = answer_tracker_ref
+        # 是否已绑定到题库快照（见 _on_snapshot）
+        self._pinned = False
+
+    def _query(self, **filters) -> List[QuestionMetadata]:
+        """筛选候选题目（只读取热字段，选中的题目再由 _with_content 补全）"""
+        return self.question_bank.query(include_cold=False, **filters)
+
+    def _with_content(self, problems: List[QuestionMetadata]) -> List[QuestionMetadata]:
+        """重新读取选中题目的完整内容"""
+        full = (self.question_bank.get(q.questionId) for q in problems)
+        return [q for q in full if q is not None]
 
+    @_on_snapshot
     def recommend_for_weak_points(
         self,
         student_id: str,
@@ -50,7 +82,7 @@ class ProblemRecommender:
                 per_kp_count = weak_count // len(profile.weakPoints)
 
                 # 先取L1题（基础）
-                l1_questions = self.question_bank.query(
+                l1_questions = self._query(
                     knowledge_points=[kp],
                     difficulty=Difficulty.L1,
                     review_status="approved"
@@ -58,7 +90,7 @@ class ProblemRecommender:
                 l1_questions = [q for q in l1_questions if q.questionId not in done_question_ids]
 
                 # 再取L2题（提升）
-                l2_questions = self.question_bank.query(
+                l2_questions = self._query(
                     knowledge_points=[kp],
                     difficulty=Difficulty.L2,
                     review_status="approved"
@@ -85,12 +117,12 @@ class ProblemRecommender:
             reason_parts.append(f"巩固强项：{random_strong}")
 
             l2_l3_questions = (
-                self.question_bank.query(
+                self._query(
                     knowledge_points=[random_strong],
                     difficulty=Difficulty.L2,
                     review_status="approved"
                 ) +
-                self.question_bank.query(
+                self._query(
                     knowledge_points=[random_strong],
                     difficulty=Difficulty.L3,
                     review_status="approved"
@@ -102,7 +134,7 @@ class ProblemRecommender:
         # 10%：随机新题（拓展）
         new_count = count - len(problems)
         if new_count > 0:
-            all_approved = self.question_bank.query(review_status="approved")
+            all_approved = self._query(review_status="approved")
             unseen = [q for q in all_approved if q.questionId not in done_question_ids]
 
             if unseen:
@@ -118,8 +150,9 @@ class ProblemRecommender:
         else:
             reason = f"基于您的学习数据：{' | '.join(reason_parts)}"
 
-        return problems, reason
+        return self._with_content(problems), reason
 
+    @_on_snapshot
     def recommend_comprehensive(
         self,
         student_id: str,
@@ -145,7 +178,7 @@ class ProblemRecommender:
 
         # L1: 50%
         l1_count = int(count * 0.5)
-        l1_questions = self.question_bank.query(
+        l1_questions = self._query(
             difficulty=Difficulty.L1,
             review_status="approved"
         )
@@ -154,7 +187,7 @@ class ProblemRecommender:
 
         # L2: 35%
         l2_count = int(count * 0.35)
-        l2_questions = self.question_bank.query(
+        l2_questions = self._query(
             difficulty=Difficulty.L2,
             review_status="approved"
         )
@@ -163,7 +196,7 @@ class ProblemRecommender:
 
         # L3: 15%
         l3_count = count - len(problems)
-        l3_questions = self.question_bank.query(
+        l3_questions = self._query(
             difficulty=Difficulty.L3,
             review_status="approved"
         )
@@ -174,8 +207,9 @@ class ProblemRecommender:
         random.shuffle(problems)
 
         reason = "综合训练模式：按考试难度分布推荐（L1:50%, L2:35%, L3:15%）"
-        return problems, reason
+        return self._with_content(problems), reason
 
+    @_on_snapshot
     def recommend_exam_prep(
         self,
         student_id: str,
@@ -203,7 +237,7 @@ class ProblemRecommender:
             for kp in profile.weakPoints:
                 per_kp_count = weak_count // len(profile.weakPoints)
 
-                l2_questions = self.question_bank.query(
+                l2_questions = self._query(
                     knowledge_points=[kp],
                     difficulty=Difficulty.L2,
                     review_status="approved"
@@ -220,15 +254,16 @@ class ProblemRecommender:
             random.shuffle(error_question_ids)
 
             for qid in error_question_ids[:error_count]:
-                question = self.question_bank.get(qid)
+                question = self.question_bank.get(qid, include_cold=False)
                 if question:
                     problems.append(question)
 
         problems = problems[:count]
 
         reason = f"考前冲刺：针对薄弱知识点（{', '.join(profile.weakPoints[:3])}）+ 高频错题"
-        return problems, reason
+        return self._with_content(problems), reason
 
+    @_on_snapshot
     def recommend(
         self,
         student_id: str,
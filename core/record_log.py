@@ -0,0 +1,221 @@
+"""
+分段追加日志模块
+记录以单行JSON追加到日志段文件（<prefix>.000001.jsonl、<prefix>.000002.jsonl ...），
+当前段超过大小上限后封存并切换到下一段；写入的持久化时机由 fsync 策略决定
+
+fsync 策略：
+    always    每次追加后 fsync
+    interval  后台线程每隔 interval_ms 毫秒 fsync 一次（有未同步的数据时）
+    batch     每追加 batch 条记录 fsync 一次
+    off       只写入操作系统缓存，由操作系统决定何时落盘
+封存的段在切换前总会 fsync。进程崩溃可能在最后一段末尾留下写了一半的行，
+打开日志时截掉这部分，之后的追加从完整的行之后开始。
+"""
+import glob
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Iterator, List, Optional
+
+FSYNC_POLICIES = ("always", "interval", "batch", "off")
+
+_SEGMENT_RE = re.compile(r"\.(\d{6})\.jsonl$")
+
+
+class RecordLog:
+    """分段的 JSON Lines 追加日志"""
+
+    def __init__(
+        self,
+        prefix: str,
+        fsync: str = "interval",
+        interval_ms: int = 100,
+        batch: int = 100,
+        segment_bytes: int = 64 * 1024 * 1024
+    ):
+        """
+        Args:
+            prefix: 段文件路径前缀（如 data/answer_records）
+            fsync: fsync 策略（见 FSYNC_POLICIES）
+            interval_ms: interval 策略的同步间隔（毫秒）
+            batch: batch 策略每多少条记录同步一次
+            segment_bytes: 单个段文件的大小上限
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"未知的 fsync 策略: {fsync}")
+        self.prefix = prefix
+        self.fsync = fsync
+        self.interval = interval_ms / 1000
+        self.batch = max(1, batch)
+        self.segment_bytes = segment_bytes
+
+        self._lock = threading.Lock()
+        self._file = None
+        self._segment = 0
+        self._size = 0
+        # 已写入但尚未 fsync 的记录数
+        self._unsynced = 0
+        self._sync_thread: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+        os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+        segments = self.segments()
+        if segments:
+            self._recover_tail(segments[-1])
+            self._segment = self._segment_number(segments[-1])
+
+    def segment_path(self, number: int) -> str:
+        return f"{self.prefix}.{number:06d}.jsonl"
+
+    @staticmethod
+    def _segment_number(path: str) -> int:
+        return int(_SEGMENT_RE.search(path).group(1))
+
+    def segments(self) -> List[str]:
+        """按顺序列出现有的段文件"""
+        paths = [p for p in glob.glob(glob.escape(self.prefix) + ".*.jsonl") if _SEGMENT_RE.search(p)]
+        return sorted(paths, key=self._segment_number)
+
+    def _recover_tail(self, path: str):
+        """截掉最后一段末尾不完整或无法解析的行（崩溃时写了一半的记录）"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        end = len(data)
+        while end > 0:
+            if data[end - 1:end] != b"\n":
+                # 没有换行结尾：最后一行没有写完
+                start = data.rfind(b"\n", 0, end) + 1
+            else:
+                start = data.rfind(b"\n", 0, end - 1) + 1
+                line = data[start:end].strip()
+                try:
+                    if line:
+                        json.loads(line)
+                    break
+                except ValueError:
+                    pass
+            end = start
+        if end < len(data):
+            print(f"Warning: Truncating {len(data) - end} bytes of incomplete records at the end of {path}")
+            with open(path, 'r+b') as f:
+                f.truncate(end)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def replay(self, start_segment: int = 0) -> Iterator[Dict[str, Any]]:
+        """按顺序读出段号不小于 start_segment 的段中的记录（中间损坏的行跳过）"""
+        for path in self.segments():
+            if self._segment_number(path) < start_segment:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"Warning: Skipping corrupt record line {line_no} in {path}")
+
+    def append(self, entries: List[Dict[str, Any]]):
+        """追加一批记录（一次写入；按 fsync 策略决定是否立即同步）"""
+        if not entries:
+            return
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode('utf-8')
+        with self._lock:
+            if self._file is None or self._size >= self.segment_bytes:
+                self._open_next_segment()
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            self._unsynced += len(entries)
+
+            if self.fsync == "always" or (self.fsync == "batch" and self._unsynced >= self.batch):
+                self._sync_locked()
+            elif self.fsync == "interval":
+                self._ensure_sync_thread()
+
+    def _open_next_segment(self):
+        """封存当前段并打开下一段（调用方需持有锁）"""
+        if self._file is not None:
+            self._sync_locked()
+            self._file.close()
+            self._segment += 1
+        else:
+            # 首次写入：接着最后一段写，最后一段已满时开始新段
+            if self._segment == 0:
+                self._segment = 1
+            elif os.path.getsize(self.segment_path(self._segment)) >= self.segment_bytes:
+                self._segment += 1
+        path = self.segment_path(self._segment)
+        self._file = open(path, 'ab')
+        self._size = self._file.tell()
+
+    def _sync_locked(self):
+        """fsync 当前段（调用方需持有锁）"""
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self):
+        """立即 fsync"""
+        with self._lock:
+            self._sync_locked()
+
+    def _ensure_sync_thread(self):
+        """启动 interval 策略的后台同步线程（调用方需持有锁）"""
+        if self._sync_thread is None or not self._sync_thread.is_alive():
+            self._sync_thread = threading.Thread(target=self._sync_loop, daemon=True)
+            self._sync_thread.start()
+
+    def _sync_loop(self):
+        while not self._closed.wait(self.interval):
+            with self._lock:
+                if self._unsynced:
+                    self._sync_locked()
+
+    def rotate(self) -> int:
+        """
+        封存当前段，之后的追加写入新段
+
+        Returns:
+            新段的段号（此前写入的记录都在更小段号的段中）
+        """
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
+            self._segment += 1
+            self._size = 0
+            # 先创建空段，重启后接着写这一段而不是写回已封存的段
+            open(self.segment_path(self._segment), 'ab').close()
+            return self._segment
+
+    def remove_before(self, segment: int):
+        """删除段号小于 segment 的段（其中的记录已保存到别处）"""
+        for path in self.segments():
+            if self._segment_number(path) < segment:
+                os.remove(path)
+
+    def clear(self):
+        """删除所有段（记录已合并到别处之后调用），之后的追加从新的第一段开始"""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            for path in self.segments():
+                os.remove(path)
+            self._segment = 0
+            self._size = 0
+            self._unsynced = 0
+
+    def close(self):
+        """同步并关闭当前段"""
+        self._closed.set()
+        with self._lock:
+            if self._file is not None:
+                self._sync_locked()
+                self._file.close()
+                self._file = None
@@ -0,0 +1,219 @@
+"""
+全文检索模块
+题干、选项、解析的内存倒排索引：中文按相邻两字（bigram）切分，
+英文单词、数字和 LaTeX 命令（去掉反斜杠）按整词切分
+"""
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# 题目参与检索的字段及权重（stemMarkdown、solutionMarkdown 为管理端字段）
+SEARCH_FIELDS = (
+    ("stemMarkdown", 3),
+    ("question", 3),
+    ("options", 2),
+    ("solutionMarkdown", 1),
+    ("solution", 1),
+    ("shortSolution", 1),
+    ("detailedSolution", 1),
+)
+
+# 中文字符（含扩展A区和兼容区）连续片段，或 LaTeX 命令，或英文/数字串
+_TOKEN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|\\[A-Za-z]+|[A-Za-z0-9]+")
+
+
+def _is_cjk(term: str) -> bool:
+    """判断索引词是否为中文（索引词只会是中文片段或 ASCII 词）"""
+    return term[0] >= "\u3400"
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    将文本切分为索引词
+
+    中文片段产出相邻两字组合，只有一个字的片段产出该字本身；
+    其余词统一转为小写，LaTeX 命令去掉反斜杠（\\frac -> frac）。
+    """
+    terms = []
+    for match in _TOKEN_RE.finditer(text or ""):
+        token = match.group()
+        if _is_cjk(token):
+            if len(token) == 1:
+                terms.append(token)
+            else:
+                terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            terms.append(token.lstrip("\\").lower())
+    return terms
+
+
+def question_search_fields(question) -> Iterator[Tuple[str, int]]:
+    """产出题目中参与检索的 (文本, 权重)"""
+    for field, weight in SEARCH_FIELDS:
+        value = getattr(question, field, None)
+        if isinstance(value, str):
+            yield value, weight
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, str):
+                    yield item, weight
+
+
+def parse_query(query: str, mode: str = "and") -> List[List[str]]:
+    """
+    解析查询语句，返回"或"连接的若干组，每组内的词需同时命中
+
+    以空白分隔关键词；AND 模式下关键词都要命中，关键词之间写 OR 表示任一组命中即可
+    （如 "函数 单调 OR 导数"）；OR 模式下任一关键词命中即可。
+    同一关键词切出的多个词（如"单调递增"的各个两字组合）总是需要同时命中。
+    """
+    groups: List[List[str]] = [[]]
+    for word in query.split():
+        if word == "OR":
+            groups.append([])
+            continue
+        terms = tokenize(word)
+        if not terms:
+            continue
+        if mode == "or":
+            groups.append(terms)
+        else:
+            groups[-1].extend(terms)
+    return [group for group in groups if group]
+
+
+class SearchIndex:
+    """
+    倒排索引：词 -> {文档ID: 加权词频}
+
+    文档由若干 (文本, 权重) 字段组成，同一个词在不同字段出现时权重累加；
+    检索结果按 Σ 加权词频 × idf 排序。
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._doc_terms: Dict[str, List[str]] = {}
+        # 单个汉字 -> 包含它的两字组合，用于单字查询
+        self._char_terms: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def add(self, doc_id: str, fields: Iterable[Tuple[str, int]]):
+        """索引（或重新索引）一个文档"""
+        self.remove(doc_id)
+        weights: Dict[str, int] = defaultdict(int)
+        for text, weight in fields:
+            for term in tokenize(text):
+                weights[term] += weight
+
+        for term, weight in weights.items():
+            self._postings[term][doc_id] = weight
+            if len(term) == 2 and _is_cjk(term):
+                self._char_terms[term[0]].add(term)
+                self._char_terms[term[1]].add(term)
+        self._doc_terms[doc_id] = list(weights)
+
+    def export_documents(self, doc_ids: Iterable[str]) -> List[Dict[str, int]]:
+        """导出各文档的 {词: 加权词频}（供启动快照使用，由 from_documents 恢复）"""
+        return [{term: self._postings[term][doc_id] for term in self._doc_terms.get(doc_id, ())}
+                for doc_id in doc_ids]
+
+    @classmethod
+    def from_documents(cls, documents: Iterable[Tuple[str, Dict[str, int]]]) -> "SearchIndex":
+        """由 (文档ID, {词: 加权词频}) 直接建立索引（不再分词）"""
+        index = cls()
+        postings = index._postings
+        for doc_id, weights in documents:
+            for term, weight in weights.items():
+                postings[term][doc_id] = weight
+            index._doc_terms[doc_id] = list(weights)
+        for term in postings:
+            if len(term) == 2 and _is_cjk(term):
+                index._char_terms[term[0]].add(term)
+                index._char_terms[term[1]].add(term)
+        return index
+
+    def remove(self, doc_id: str):
+        """从索引中移除文档"""
+        for term in self._doc_terms.pop(doc_id, []):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            posting.pop(doc_id, None)
+            if not posting:
+                del self._postings[term]
+                if len(term) == 2 and _is_cjk(term):
+                    for char in term:
+                        self._char_terms[char].discard(term)
+                        if not self._char_terms[char]:
+                            del self._char_terms[char]
+
+    def _expand(self, term: str) -> List[str]:
+        """查询词对应的索引词；单个汉字同时对应包含它的两字组合"""
+        if len(term) == 1 and _is_cjk(term):
+            return [term, *self._char_terms.get(term, ())]
+        return [term]
+
+    def _matching(self, term: str) -> Set[str]:
+        """命中某个查询词的文档ID"""
+        docs: Set[str] = set()
+        for t in self._expand(term):
+            docs.update(self._postings.get(t, ()))
+        return docs
+
+    def _score(self, docs: Set[str], query_terms: Set[str]) -> Dict[str, float]:
+        """按查询词逐个累加文档得分：Σ 加权词频 × idf"""
+        total = len(self._doc_terms) or 1
+        scores = dict.fromkeys(docs, 0.0)
+        for term in query_terms:
+            for t in self._expand(term):
+                posting = self._postings.get(t)
+                if not posting:
+                    continue
+                idf = math.log(1 + total / len(posting))
+                # 遍历两者中较小的一方
+                if len(posting) < len(scores):
+                    for doc_id, weight in posting.items():
+                        if doc_id in scores:
+                            scores[doc_id] += weight * idf
+                else:
+                    for doc_id in scores:
+                        weight = posting.get(doc_id)
+                        if weight:
+                            scores[doc_id] += weight * idf
+        return scores
+
+    def search(self, query: str, mode: str = "and", limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        检索文档
+
+        Args:
+            query: 查询语句（语法见 parse_query）
+            mode: "and" 或 "or"
+            limit: 最多返回的结果数
+
+        Returns:
+            按得分从高到低排列的 (文档ID, 得分)
+        """
+        matched: Set[str] = set()
+        query_terms: Set[str] = set()
+        for group in parse_query(query, mode):
+            query_terms.update(group)
+            # 按命中文档数从少到多求交集
+            sets = sorted((self._matching(term) for term in set(group)), key=len)
+            docs = sets[0]
+            for other in sets[1:]:
+                if not docs:
+                    break
+                docs = docs & other
+            matched |= docs
+
+        scored = self._score(matched, query_terms).items()
+        # 得分相同时按文档ID排序，保证结果稳定
+        rank = lambda item: (-item[1], item[0])
+        if limit:
+            return heapq.nsmallest(limit, scored, key=rank)
+        return sorted(scored, key=rank)
@@ -0,0 +1,204 @@
+"""
+启动快照模块
+把加载完成后的内存数据结构（如题库的紧凑记录与索引）保存为快照文件，
+下次启动时直接恢复，跳过逐条校验和索引重建；源文件或数据结构定义发生变化时快照失效
+
+文件格式：
+    MAGIC(8字节) | 格式版本(uint16) | 头部长度(uint32) | 头部JSON | 数据JSON
+头部记录源文件签名、结构指纹、记录数以及数据的 blake2b 校验和（只用于发现截断或损坏的文件）；
+数据为调用方给出的可JSON序列化的状态，按列存储的字段值见 encode_column
+"""
+import gc
+import hashlib
+import json
+import os
+import struct
+from contextlib import contextmanager
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+MAGIC = b"MSKSNAP\x00"
+FORMAT_VERSION = 3
+_PREFIX = struct.Struct("<8sHI")
+
+# 原样存储的取值类型
+_PLAIN_TYPES = (type(None), bool, int, float, str)
+
+
+@contextmanager
+def gc_paused():
+    """批量创建大量对象期间暂停循环垃圾回收（这些对象不会形成需要回收的环）"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _is_plain(value: Any) -> bool:
+    """value 是否可以原样写入JSON（元组写为列表，字典的键都是字符串）"""
+    if type(value) in _PLAIN_TYPES:
+        return True
+    if type(value) in (tuple, list):
+        return all(_is_plain(item) for item in value)
+    if type(value) is dict:
+        return all(type(key) is str and _is_plain(item) for key, item in value.items())
+    return False
+
+
+def _tag(value: Any, enums: Dict[str, Type[Enum]]) -> Any:
+    """编码非JSON原生的取值：字典、datetime、枚举写为单键的标记对象"""
+    if type(value) in _PLAIN_TYPES:
+        return value
+    if type(value) in (tuple, list):
+        return [_tag(item, enums) for item in value]
+    if type(value) is dict:
+        if not all(type(key) is str for key in value):
+            raise TypeError("dict keys must be str")
+        return {"$d": {key: _tag(item, enums) for key, item in value.items()}}
+    if type(value) is datetime:
+        return {"$dt": value.isoformat()}
+    if isinstance(value, Enum) and enums.get(type(value).__name__) is type(value):
+        return {"$e": [type(value).__name__, value.value]}
+    raise TypeError(f"unsupported value in snapshot: {type(value).__name__}")
+
+
+def _untag(value: Any, enums: Dict[str, Type[Enum]]) -> Any:
+    if type(value) is list:
+        return [_untag(item, enums) for item in value]
+    if type(value) is dict:
+        (tag, data), = value.items()
+        if tag == "$d":
+            return {key: _untag(item, enums) for key, item in data.items()}
+        if tag == "$dt":
+            return datetime.fromisoformat(data)
+        if tag == "$e":
+            return enums[data[0]](data[1])
+        raise ValueError(f"unknown tag in snapshot: {tag}")
+    return value
+
+
+def encode_column(values: list, enums: Optional[Dict[str, Type[Enum]]] = None) -> list:
+    """
+    编码一列取值，返回 [编码方式, 数据]
+
+    全部为JSON原生取值的列原样存储（"plain"），否则逐个编码（"tagged"，支持 datetime 与 enums 中的枚举）。
+    元组与列表都写为列表，解码后由调用方按需转换
+
+    Raises:
+        TypeError: 列中有无法编码的取值
+    """
+    if all(_is_plain(value) for value in values):
+        return ["plain", values]
+    return ["tagged", [_tag(value, enums or {}) for value in values]]
+
+
+def decode_column(column: list, enums: Optional[Dict[str, Type[Enum]]] = None) -> list:
+    """encode_column 的逆操作"""
+    codec, values = column
+    if codec == "plain":
+        return values
+    if codec == "tagged":
+        return [_untag(value, enums or {}) for value in values]
+    raise ValueError(f"unknown column codec: {codec}")
+
+
+def schema_fingerprint(model_cls: Type[BaseModel], *parts: Any) -> str:
+    """
+    结构指纹：模型的字段、类型或默认值变化后，旧快照不再可用
+
+    Args:
+        parts: 同样影响快照内容的其他结构（如紧凑记录的槽位），转换为字符串后计入指纹
+    """
+    schema = json.dumps([model_cls.model_json_schema(), [str(part) for part in parts]],
+                        sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(schema.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def file_signature(path: str) -> Optional[List[int]]:
+    """源文件签名 (mtime_ns, size)；文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+def write_snapshot(path: str, source_file: str, source_signature: Optional[List[int]],
+                   fingerprint: str, count: int, state: Dict[str, Any]):
+    """
+    写入快照（先写临时文件再原子替换）
+
+    Args:
+        path: 快照文件路径
+        source_file: 快照对应的源文件
+        source_signature: 读取源文件之前取得的签名；为 None 时不写入
+        fingerprint: 结构指纹（见 schema_fingerprint）
+        count: 记录数
+        state: 可JSON序列化的状态
+    """
+    if source_signature is None:
+        return
+    payload = json.dumps(state, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    header = json.dumps({
+        "source": os.path.basename(source_file),
+        "sourceSignature": source_signature,
+        "schema": fingerprint,
+        "count": count,
+        "checksum": hashlib.blake2b(payload, digest_size=16).hexdigest(),
+    }).encode('utf-8')
+
+    # 多个进程可能同时写入，各自使用独立的临时文件
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)))
+            f.write(header)
+            f.write(payload)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Failed to write snapshot {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_snapshot(path: str, source_file: str, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    读取快照
+
+    Returns:
+        {"count": 记录数, "state": 写入时的状态}；
+        快照不存在、已过期（源文件或结构变化）或损坏时返回 None
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+
+    try:
+        magic, version, header_len = _PREFIX.unpack_from(data)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            return None
+        header_end = _PREFIX.size + header_len
+        header = json.loads(data[_PREFIX.size:header_end])
+        if header.get("sourceSignature") != file_signature(source_file):
+            return None
+        if header.get("schema") != fingerprint:
+            return None
+
+        payload = data[header_end:]
+        if hashlib.blake2b(payload, digest_size=16).hexdigest() != header.get("checksum"):
+            print(f"Warning: Snapshot {path} failed checksum, ignoring")
+            return None
+        with gc_paused():
+            state = json.loads(payload)
+    except Exception as e:
+        print(f"Warning: Failed to read snapshot {path}: {e}")
+        return None
+    return {"count": header.get("count"), "state": state}
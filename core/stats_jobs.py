@@ -0,0 +1,180 @@
+"""
+题目统计刷新任务模块
+后台线程执行统计刷新：作答记录编码一次后按题目拆分成若干组，交给进程池并行计算质量统计，
+全部完成后整批写回题库；任务进度通过 get 查询
+
+增量刷新只重新计算上次任务之后有新作答记录的题目。学生分组（区分度的高分组/低分组）
+总是按全部记录重新排名，未重新计算的题目保留上次的区分度，需要时用全量刷新校正。
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from schemas import QualityStats
+from core.quality_stats import EncodedRecords, compute_chunk_stats
+
+# 进程池大小（默认为 CPU 核数）
+STATS_WORKERS = int(os.getenv('QUALITY_STATS_WORKERS', '0')) or os.cpu_count() or 1
+# 待计算题目少于该值时在当前进程内计算（启动进程池的开销大于计算本身）
+PARALLEL_MIN_QUESTIONS = int(os.getenv('QUALITY_STATS_PARALLEL_MIN_QUESTIONS', '2000'))
+# 每个工作进程分到的题目组数（组越多进度越细，数组拷贝也越多）
+CHUNKS_PER_WORKER = 4
+# 保留的历史任务数
+MAX_JOBS = 20
+
+
+class StatsJobManager:
+    """题目统计刷新任务（同一时间只运行一个）"""
+
+    def __init__(
+        self,
+        tracker,
+        question_bank_ref,
+        workers: int = STATS_WORKERS,
+        parallel_min_questions: int = PARALLEL_MIN_QUESTIONS
+    ):
+        self.tracker = tracker
+        self.question_bank = question_bank_ref
+        self.workers = max(1, workers)
+        self.parallel_min_questions = parallel_min_questions
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._running: Optional[str] = None
+        # 上次完成的任务统计到的位置（tracker.encoded_records 返回）：之后追加的记录即为新作答
+        self._watermark: Optional[tuple] = None
+
+    def start(self, full: bool = False) -> Dict:
+        """
+        启动刷新任务
+
+        Args:
+            full: 是否全量刷新（否则只刷新上次任务之后有新作答的题目；首次运行总是全量）
+
+        Returns:
+            任务状态；已有任务在运行时返回该任务的状态
+        """
+        with self._lock:
+            if self._running is not None:
+                return dict(self._jobs[self._running])
+
+            job = {
+                "jobId": uuid.uuid4().hex[:8],
+                "status": "running",
+                "mode": "full" if full or self._watermark is None else "incremental",
+                "totalQuestions": 0,
+                "processedQuestions": 0,
+                "updatedQuestions": 0,
+                "startedAt": datetime.now().isoformat(),
+                "finishedAt": None,
+                "error": None,
+            }
+            self._jobs[job["jobId"]] = job
+            while len(self._jobs) > MAX_JOBS:
+                self._jobs.popitem(last=False)
+            self._running = job["jobId"]
+
+        threading.Thread(target=self._run, args=(job,), daemon=True).start()
+        return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """查询任务状态，任务不存在时返回None"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict]:
+        """等待任务结束（或超时）并返回其状态（供脚本调用）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] != "running":
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(0.05)
+
+    def _update(self, job: Dict, **fields):
+        with self._lock:
+            job.update(fields)
+
+    def _run(self, job: Dict):
+        """执行刷新任务（后台线程）"""
+        try:
+            # 视图只包含当前的记录，计算期间新增的记录留给下次任务
+            with self._lock:
+                watermark = self._watermark
+            encoded, position, new_codes = self.tracker.encoded_records(
+                watermark if job["mode"] == "incremental" else None
+            )
+
+            if new_codes is not None:
+                codes = new_codes
+            else:
+                # 记录被整体替换或压缩过（换了版本目录），无法判断哪些是新记录
+                self._update(job, mode="full")
+                codes = np.unique(encoded.question_idx)
+            self._update(job, totalQuestions=len(codes))
+
+            stats = self._compute(job, encoded, codes)
+            updated = self.question_bank.update_quality_stats_many(stats)
+
+            with self._lock:
+                self._watermark = position
+            self._update(job, status="completed", updatedQuestions=updated,
+                         finishedAt=datetime.now().isoformat())
+        except Exception as e:
+            print(f"Warning: Question stats refresh job {job['jobId']} failed: {e}")
+            self._update(job, status="failed", error=str(e), finishedAt=datetime.now().isoformat())
+        finally:
+            with self._lock:
+                self._running = None
+
+    def _compute(self, job: Dict, encoded: EncodedRecords, codes: np.ndarray) -> List[QualityStats]:
+        """按题目分组计算，题目足够多时交给进程池并行执行"""
+        if len(codes) == 0:
+            return []
+        record_group = encoded.record_groups()
+        parallel = self.workers > 1 and len(codes) >= self.parallel_min_questions
+        chunk_count = self.workers * CHUNKS_PER_WORKER if parallel else 1
+        chunks = [c for c in np.array_split(codes, chunk_count) if len(c)]
+        tasks = [encoded.chunk_args(chunk, record_group) for chunk in chunks]
+
+        stats: List[QualityStats] = []
+        if not parallel:
+            for args in tasks:
+                stats.extend(compute_chunk_stats(*args))
+                self._update(job, processedQuestions=job["processedQuestions"] + len(args[0]))
+            return stats
+
+        # spawn：不从带多个线程的服务进程 fork。子进程会以 __mp_main__ 重新执行启动脚本
+        # （python main.py 时见 main.SERVING，不创建单例），计算本身只需导入 core.quality_stats
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            futures = {pool.submit(compute_chunk_stats, *args): len(args[0]) for args in tasks}
+            for future in as_completed(futures):
+                stats.extend(future.result())
+                self._update(job, processedQuestions=job["processedQuestions"] + futures[future])
+        return stats
+
+
+_singleton_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    """全局单例 stats_jobs 在首次访问时创建（同时创建题库与作答记录的单例）"""
+    if name != "stats_jobs":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _singleton_lock:
+        if name not in globals():
+            from core.answer_tracker import answer_tracker
+            from core.question_bank import question_bank
+            globals()[name] = StatsJobManager(answer_tracker, question_bank)
+    return globals()[name]
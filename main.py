@@ -1,15 +1,41 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Depends, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from fastapi.exception_handlers import request_validation_exception_handler
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, TypeAdapter
+from typing import List, Optional, Dict, Tuple, Union
+import asyncio
 import json
+import base64
+import hashlib
+import math
+from datetime import datetime
+from itertools import islice
 from pathlib import Path
 import uuid
+import random
+import queue
 import shutil
 import subprocess
 import sys
+from core.answer_checker import check_answer
+from core.json_writer import get_json_writer
+from schemas import AnswerRecord, QuestionMetadata as QuestionRecord, parse_question
+
+# python main.py 时本文件以 __main__ 运行，只负责启动 uvicorn（uvicorn 按 "main:app" 重新导入本模块）；
+# 以 spawn 方式启动的子进程（统计任务的进程池、uvicorn 的 reload/workers）会以 __mp_main__ 重新执行本文件。
+# 这两种情况下都不导入题库、作答记录等单例，避免再加载一份题库、打开并截断作答日志
+SERVING = __name__ not in ("__main__", "__mp_main__")
+if SERVING:
+    from core.question_bank import question_bank
+    from core.answer_tracker import answer_tracker
+    from core.answer_ingest import answer_ingest
+    from core.stats_jobs import stats_jobs
 try:
-    from admin_api import router as admin_router
+    admin_router = None
+    if SERVING:
+        from admin_api import router as admin_router
     from auth import create_access_token, MOCK_USERS, get_current_user
     from fastapi.security import HTTPBasic, HTTPBasicCredentials
     ADMIN_API_AVAILABLE = True
@@ -31,14 +57,39 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request, exc: RequestValidationError):
+    """请求校验失败返回 422；错误详情回显的 NaN/Infinity 无法编码为 JSON，改为字符串"""
+    errors = [
+        {**error, "input": str(error["input"])}
+        if isinstance(error.get("input"), float) and not math.isfinite(error["input"]) else error
+        for error in exc.errors()
+    ]
+    return await request_validation_exception_handler(request, RequestValidationError(errors))
+
 # 数据文件路径
 DATA_DIR = Path(__file__).parent / "data"
 QUESTIONS_FILE = DATA_DIR / "questions.json"
 TUTORIALS_FILE = DATA_DIR / "tutorials.json"
 THEME_CONFIG_FILE = DATA_DIR / "theme_configs.json"
 
+# 进程内共享题库（core.question_bank 单例）：导入时加载一次，
+# 之后文件发生变化（mtime/大小）时自动重新加载
+
+def get_question_store():
+    """获取共享题库（必要时先从文件重新加载）"""
+    question_bank.reload_if_changed()
+    return question_bank
+
+
+def question_to_dict(question) -> dict:
+    """将题库中的题目转换为接口返回的字典（只包含文件中实际存在的字段）"""
+    return question.model_dump(mode='json', exclude_unset=True)
+
 # PDF处理临时目录
 PDF_TEMP_DIR = Path(__file__).parent / "tools" / "pdf_processor" / "temp"
 PDF_TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -75,6 +126,10 @@ class QuestionMetadata(BaseModel):
         # 允许额外字段，避免验证失败
         extra = 'allow'
 
+class BulkQuestionsRequest(BaseModel):
+    questions: List[dict]
+    upsert: bool = False  # 为True时覆盖已存在的题目，否则记为冲突
+
 class ProblemResponse(BaseModel):
     questionId: str
     question: str
@@ -85,7 +140,8 @@ class AnswerSubmission(BaseModel):
     studentId: str
     questionId: str
     userAnswer: str
-    timeSpent: float
+    # 用时（秒）：有限的非负数，NaN/Infinity 等取值由校验返回 422
+    timeSpent: float = Field(ge=0, allow_inf_nan=False)
 
 class StudentProfile(BaseModel):
     studentId: str
@@ -124,140 +180,260 @@ async def root():
 
 @app.post("/api/problem", response_model=ProblemResponse)
 async def get_random_problem(difficulty: Optional[str] = None):
-    """随机获取一道题目（兼容旧版）"""
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
-    import random
-    question = random.choice(questions)
-    return ProblemResponse(**question)
+    """随机获取一道题目（兼容旧版）；只在索引中抽取题目ID，再读取抽中的一道题"""
+    store = get_question_store()
+    question_ids = [qid for _, qid in store.iter_query_ids(difficulty=difficulty)]
+    question = store.get(random.choice(question_ids)) if question_ids else None
+    if question is None:
+        raise HTTPException(status_code=404, detail="题库为空" if not difficulty else "没有符合条件的题目")
+
+    return ProblemResponse(
+        questionId=question.questionId,
+        question=question.question,
+        options=question.options,
+        answer=question.answer
+    )
 
 @app.get("/api/questions/stats")
-async def get_question_stats():
-    """获取题目统计"""
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
+async def get_question_stats(verify: bool = False):
+    """
+    获取题目统计
+
+    统计来自题库增量维护的计数器；verify=true 时额外重新扫描题库，
+    在 consistency 中报告计数器与实际统计的差异
+    """
+    store = get_question_store()
+    counts = store.facet_counts()
 
-    # 统计
     stats = {
-        "total": len(questions),
-        "difficultyStats": {},
-        "typeStats": {},
-        "reviewStats": {},
-        "sourceStats": {}
+        "total": sum(counts["sourceCategory"].values()),
+        "difficultyStats": counts["difficulty"],
+        "typeStats": counts["type"],
+        "reviewStats": counts["reviewStatus"],
+        "sourceStats": counts["source"]
     }
+    if verify:
+        stats["consistency"] = store.check_statistics()
 
-    for q in questions:
-        # 难度统计
-        diff = q.get('difficulty', 'L1')
-        stats['difficultyStats'][diff] = stats['difficultyStats'].get(diff, 0) + 1
+    return stats
 
-        # 类型统计
-        qtype = q.get('type', 'choice')
-        stats['typeStats'][qtype] = stats['typeStats'].get(qtype, 0) + 1
+# /api/questions 响应缓存：(paperId, topic, difficulty, 游标, limit) -> (JSON字节, ETag, 下一页游标)
+# 缓存只对 _questions_cache_version 对应的题库版本有效，版本变化时整体清空
+QUESTIONS_CACHE_MAX_ENTRIES = 256
+_questions_cache: Dict[tuple, Tuple[bytes, str, Optional[str]]] = {}
+_questions_cache_version = None
+_question_adapter = TypeAdapter(QuestionMetadata)
 
-        # 审核状态
-        review = q.get('reviewStatus', 'pending')
-        stats['reviewStats'][review] = stats['reviewStats'].get(review, 0) + 1
+# 只传 cursor 不传 limit 时的每页数量；两者都不传时返回全部题目
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
 
-        # 来源
-        source = q.get('source', 'generated')
-        stats['sourceStats'][source] = stats['sourceStats'].get(source, 0) + 1
 
-    return stats
+def _render_question(question) -> bytes:
+    """按 response_model 的方式校验并序列化单个题目（与 FastAPI 默认输出一致）"""
+    item = _question_adapter.validate_python(question_to_dict(question))
+    content = _question_adapter.dump_python(item, mode='json')
+    return json.dumps(
+        content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def _render_questions(questions) -> bytes:
+    """序列化题目列表"""
+    return b"[" + b",".join(_render_question(q) for q in questions) + b"]"
+
+
+def _filters_digest(filters: tuple) -> str:
+    """过滤条件摘要，写入游标以防止游标被用于其他查询"""
+    return hashlib.sha256(json.dumps(filters, ensure_ascii=False).encode("utf-8")).hexdigest()[:8]
+
+
+def _encode_cursor(sequence: int, filters: tuple) -> str:
+    """生成不透明的分页游标：上一页最后一道题的序号 + 过滤条件摘要"""
+    raw = f"{sequence}:{_filters_digest(filters)}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, filters: tuple) -> int:
+    """解析分页游标，返回上一页最后一道题的序号"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        sequence, digest = raw.split(":")
+        sequence = int(sequence)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+    if digest != _filters_digest(filters):
+        raise HTTPException(status_code=400, detail="分页游标与查询条件不匹配")
+    return sequence
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """判断 If-None-Match 是否命中当前 ETag（弱比较）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
 
 @app.get("/api/questions", response_model=List[QuestionMetadata])
-async def get_questions(paperId: Optional[str] = None, topic: Optional[str] = None, difficulty: Optional[str] = None):
-    """获取题目列表，支持按 paperId、topic、difficulty 过滤"""
+async def get_questions(
+    paperId: Optional[str] = None,
+    topic: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=MAX_PAGE_SIZE),
+    if_none_match: Optional[str] = Header(default=None),
+):
+    """
+    获取题目列表，支持按 paperId、topic、difficulty 过滤
+
+    传入 limit 或 cursor 时分页返回：题目按加入题库的顺序排列，
+    还有下一页时响应头 X-Next-Cursor 给出下一页的游标；都不传时返回全部题目。
+
+    序列化后的响应按过滤条件缓存，并带强 ETag；
+    客户端携带 If-None-Match 且内容未变时返回 304
+    """
+    global _questions_cache_version
     print(f"API Request: paperId={paperId}, topic={topic}, difficulty={difficulty}")
 
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
-    print(f"Total questions in file: {len(questions)}")
-
-    # 过滤条件
-    filtered = questions
-    if paperId:
-        filtered = [q for q in filtered if q.get('paperId') == paperId]
-        print(f"After paperId filter ({paperId}): {len(filtered)} questions")
-    if topic:
-        filtered = [q for q in filtered if q.get('topic') == topic]
-        print(f"After topic filter ({topic}): {len(filtered)} questions")
-    if difficulty:
-        filtered = [q for q in filtered if q.get('difficulty') == difficulty]
-        print(f"After difficulty filter ({difficulty}): {len(filtered)} questions")
-
-    # 验证并转换数据
-    result = []
-    for q in filtered:
-        try:
-            result.append(QuestionMetadata(**q))
-        except Exception as e:
-            # 如果某个题目格式不正确，跳过它并记录错误
-            print(f"Warning: Failed to parse question {q.get('questionId', 'unknown')}: {e}")
-            continue
+    filters = (paperId, topic, difficulty)
+    after = _decode_cursor(cursor, filters) if cursor else None
+    paged = cursor is not None or limit is not None
+    if paged and limit is None:
+        limit = DEFAULT_PAGE_SIZE
+
+    store = get_question_store()
+    version = store.version
+    if version != _questions_cache_version:
+        _questions_cache.clear()
+        _questions_cache_version = version
+
+    key = filters + (after, limit)
+    cached = _questions_cache.get(key)
+    if cached is None:
+        # 过滤条件（格式不正确的题目在加载题库时已被跳过）
+        matches = store.iter_query(
+            paper_id=paperId,
+            topic=topic,
+            difficulty=difficulty,
+            after=after
+        )
+        next_cursor = None
+        if paged:
+            # 多取一条用于判断是否还有下一页
+            page = list(islice(matches, limit + 1))
+            if len(page) > limit:
+                page = page[:limit]
+                next_cursor = _encode_cursor(page[-1][0], filters)
+        else:
+            page = list(matches)
+
+        body = _render_questions(q for _, q in page)
+        etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        if len(_questions_cache) >= QUESTIONS_CACHE_MAX_ENTRIES:
+            _questions_cache.clear()
+        cached = _questions_cache[key] = (body, etag, next_cursor)
+        print(f"Returning {len(page)} questions")
+
+    body, etag, next_cursor = cached
+    headers = {"ETag": etag}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    if _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/questions/stream")
+async def stream_questions(paperId: Optional[str] = None, topic: Optional[str] = None, difficulty: Optional[str] = None):
+    """以 NDJSON 流式返回题目列表（每行一道题，逐条序列化，不在内存中拼出完整列表）"""
+    matches = get_question_store().iter_query(
+        paper_id=paperId,
+        topic=topic,
+        difficulty=difficulty
+    )
 
-    print(f"Returning {len(result)} questions")
-    return result
+    def generate():
+        for _, question in matches:
+            yield _render_question(question) + b"\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
 
 @app.get("/api/questions/{question_id}", response_model=QuestionMetadata)
 async def get_question(question_id: str):
     """获取单个题目详情"""
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
-    for q in questions:
-        if q.get('questionId') == question_id:
-            return QuestionMetadata(**q)
+    question = get_question_store().get(question_id)
+    if not question:
+        raise HTTPException(status_code=404, detail="题目未找到")
 
-    raise HTTPException(status_code=404, detail="题目未找到")
+    return question_to_dict(question)
 
 @app.post("/api/questions", response_model=QuestionMetadata)
 async def create_question(question: QuestionMetadata):
     """创建新题目"""
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
     # 生成ID（如果没有）
     if not question.questionId:
         question.questionId = f"q_{uuid.uuid4().hex[:8]}"
 
-    questions.append(question.dict())
-
-    with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
+    # 不写入空值字段，未设置的字段由题库按默认值补齐；经配置的题库存储写入
+    item = question.model_dump(exclude_none=True)
+    try:
+        await asyncio.to_thread(get_question_store().add, parse_question(item))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     return question
 
+async def write_questions(questions: List[QuestionRecord], upsert: bool = False) -> Dict[str, List]:
+    """
+    整批写入题目，只持久化一次（见 QuestionBank.add_many / upsert_many）
+
+    题库在写入前自行加锁并同步文件；写入在工作线程中执行，不阻塞事件循环
+    """
+    def write():
+        store = get_question_store()
+        return store.upsert_many(questions) if upsert else store.add_many(questions)
+
+    return await asyncio.to_thread(write)
+
+@app.post("/api/questions/bulk")
+async def bulk_create_questions(request: BulkQuestionsRequest):
+    """批量导入题目：逐条校验并报告冲突，整批只写入一次"""
+    valid = []
+    invalid = []
+    for index, item in enumerate(request.questions):
+        item = {k: v for k, v in item.items() if v is not None}
+        if not item.get('questionId'):
+            item['questionId'] = f"q_{uuid.uuid4().hex[:8]}"
+        try:
+            valid.append(QuestionRecord(**item))
+        except ValidationError as e:
+            error = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            invalid.append({"index": index, "questionId": item['questionId'], "error": error})
+
+    result = await write_questions(valid, upsert=request.upsert)
+    result["invalid"] = invalid
+    return result
+
 @app.put("/api/questions/{question_id}", response_model=QuestionMetadata)
 async def update_question(question_id: str, question: QuestionMetadata):
     """更新题目"""
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
-    for i, q in enumerate(questions):
-        if q.get('questionId') == question_id:
-            questions[i] = question.dict()
-            break
-    else:
+    item = question.model_dump(exclude_none=True)
+    item['questionId'] = question_id
+    try:
+        await asyncio.to_thread(get_question_store().update, parse_question(item))
+    except ValueError:
         raise HTTPException(status_code=404, detail="题目未找到")
 
-    with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
-
     return question
 
 @app.delete("/api/questions/{question_id}")
 async def delete_question(question_id: str):
     """删除题目"""
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
-    questions = [q for q in questions if q.get('questionId') != question_id]
-
-    with open(QUESTIONS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(questions, f, ensure_ascii=False, indent=2)
+    await asyncio.to_thread(get_question_store().delete, question_id)
 
     return {"message": "删除成功"}
 
@@ -451,53 +627,87 @@ async def get_pdf_questions(task_id: str):
     }
 
 @app.post("/api/pdf/verify")
-async def verify_and_save_question(question: QuestionMetadata):
+async def verify_and_save_question(questions: Union[QuestionMetadata, List[QuestionMetadata]]):
     """
     校验后保存题目到题库
+
+    可以提交单个题目或一批题目，整批只写入一次（与 /api/questions/bulk 相同）。
+    单个题目返回保存的题目，题目ID已存在时返回 400；
+    一批题目返回 {"added": [题目ID], "updated": [], "conflicts": [{"questionId", "reason"}]}
     """
-    # 调用现有的创建题目API
-    return await create_question(question)
+    batch = questions if isinstance(questions, list) else [questions]
+    for question in batch:
+        if not question.questionId:
+            question.questionId = f"q_{uuid.uuid4().hex[:8]}"
+
+    result = await write_questions([parse_question(q.model_dump(exclude_none=True)) for q in batch])
+    if isinstance(questions, list):
+        return result
+    if result["conflicts"]:
+        raise HTTPException(status_code=400, detail=result["conflicts"][0]["reason"])
+    return questions
 
 # ========== 答题相关API ==========
 
 @app.post("/api/answers/submit")
 async def submit_answer(submission: AnswerSubmission):
-    """提交答案"""
-    # 简化版：返回是否正确
-    with open(QUESTIONS_FILE, 'r', encoding='utf-8') as f:
-        questions = json.load(f)
-
-    for q in questions:
-        if q.get('questionId') == submission.questionId:
-            correct = submission.userAnswer.upper() == q.get('answer', '').upper()
-            return {
-                "isCorrect": correct,
-                "correctAnswer": q.get('answer'),
-                "explanation": q.get('solution', '')
-            }
+    """
+    提交答案：按 core.answer_checker 判题（支持数值与符号表达式的等价形式），
+    作答记录放入写入队列后立即返回，由后台线程写入；队列已满时返回 503
+    """
+    question = get_question_store().get(submission.questionId)
+    if not question:
+        raise HTTPException(status_code=404, detail="题目未找到")
 
-    raise HTTPException(status_code=404, detail="题目未找到")
+    user_answer = submission.userAnswer
+    # 选择题的选项字母不区分大小写
+    checked_answer = user_answer.strip().upper() if question.options else user_answer
+    # 符号化简可能较慢，放到线程中执行，避免阻塞事件循环
+    correct = await asyncio.to_thread(check_answer, checked_answer, question.answer)
+
+    record = AnswerRecord(
+        recordId=str(uuid.uuid4()),
+        studentId=submission.studentId,
+        questionId=submission.questionId,
+        userAnswer=user_answer,
+        isCorrect=correct,
+        timeSpent=round(submission.timeSpent),
+        answeredAt=datetime.now()
+    )
+    try:
+        answer_ingest.submit(record)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="提交过于频繁，请稍后重试")
+
+    return {
+        "success": True,
+        "recordId": record.recordId,
+        "isCorrect": correct,
+        "correctAnswer": question.answer,
+        "explanation": question.solution
+    }
 
 @app.get("/api/answers/student/{student_id}")
 async def get_student_answers(student_id: str):
-    """获取学生答题记录"""
-    # 模拟数据
-    return []
+    """获取学生答题记录（保留期内的原始记录，按作答顺序；刚提交、仍在写入队列中的记录稍后可见）"""
+    records = answer_tracker.get_student_records(student_id)
+    return [record.model_dump(mode='json') for record in records]
 
 # ========== 学生画像API ==========
 
 @app.get("/api/student/{student_id}/profile", response_model=StudentProfile)
 async def get_student_profile(student_id: str):
-    """获取学生画像"""
-    # 模拟数据
+    """获取学生画像（读取 AnswerTracker 的累计统计；尚未统计专题偏好，preferredTopics 为空）"""
+    profile = answer_tracker.calculate_student_profile(student_id, get_question_store())
+    total = profile.totalProblems
     return StudentProfile(
         studentId=student_id,
-        totalAnswered=0,
-        correctCount=0,
-        overallAccuracy=0.0,
-        avgTimeSeconds=0.0,
-        knowledgeMastery={},
-        weakPoints=[],
+        totalAnswered=total,
+        correctCount=profile.correctCount,
+        overallAccuracy=profile.correctCount / total if total else 0.0,
+        avgTimeSeconds=profile.avgTimePerProblem or 0.0,
+        knowledgeMastery=profile.knowledgeMastery,
+        weakPoints=profile.weakPoints,
         preferredTopics=[]
     )
 
@@ -512,9 +722,40 @@ async def get_recommendations(request: RecommendationRequest):
 # ========== 管理员API ==========
 
 @app.post("/api/admin/question/update-stats")
-async def update_question_stats():
-    """更新题目统计信息"""
-    return {"message": "统计更新成功"}
+async def update_question_stats(full: bool = False):
+    """
+    启动题目统计刷新任务（后台执行），返回任务状态
+    默认只刷新上次任务之后有新作答的题目，full=true 时全量刷新；已有任务在运行时返回该任务
+    """
+    get_question_store()
+    return stats_jobs.start(full=full)
+
+@app.get("/api/admin/question/update-stats/{job_id}")
+async def get_update_stats_job(job_id: str):
+    """查询题目统计刷新任务的进度"""
+    job = stats_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务未找到")
+    return job
+
+@app.post("/api/admin/student/rebuild-profiles")
+async def rebuild_student_profiles():
+    """题目的知识点、题型或难度修改后，按当前题库重建学生画像的累计统计"""
+    get_question_store()
+    await asyncio.to_thread(answer_tracker.rebuild_profiles)
+    return {"message": "画像统计已重建"}
+
+@app.post("/api/admin/answers/compact")
+async def compact_answer_records(retention_days: Optional[int] = Query(default=None, ge=0)):
+    """
+    压缩早于保留期的作答记录（汇总为计数，画像与题目统计结果不变）
+    retention_days 默认取 ANSWER_TRACKER_RETENTION_DAYS
+    """
+    get_question_store()
+    try:
+        return await asyncio.to_thread(answer_tracker.compact, retention_days)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
 @app.get("/api/admin/question/{question_id}/stats")
 async def get_question_stats(question_id: str):
@@ -603,21 +844,14 @@ FEEDBACK_FILE = DATA_DIR / "feedbacks.json"
 async def submit_feedback(feedback: dict):
     """接收题目纠错反馈"""
     try:
-        # 读取现有反馈
-        feedbacks = []
-        if FEEDBACK_FILE.exists():
-            with open(FEEDBACK_FILE, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                feedbacks = data.get('feedbacks', [])
-
         # 添加新反馈
         feedback['id'] = str(uuid.uuid4())
         feedback['status'] = 'pending'  # pending, resolved, ignored
-        feedbacks.append(feedback)
 
         # 保存到文件
-        with open(FEEDBACK_FILE, 'w', encoding='utf-8') as f:
-            json.dump({'feedbacks': feedbacks}, f, ensure_ascii=False, indent=2)
+        await get_json_writer(FEEDBACK_FILE, lambda: {'feedbacks': []}).submit(
+            lambda data: data.setdefault('feedbacks', []).append(feedback)
+        )
 
         print(f"✅ 收到新反馈：{feedback.get('questionId')} - {feedback.get('description')}")
 
@@ -688,4 +922,4 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+from typing import Any, List, Optional, Dict
 from datetime import datetime
 from enum import Enum
 
@@ -70,6 +70,9 @@ class ProblemResponse(BaseModel):
 
 class QuestionMetadata(BaseModel):
     """题目元信息"""
+    # 保留未声明的字段（如管理端写入的 stemMarkdown），避免读写题库时丢失
+    model_config = ConfigDict(extra='allow')
+
     questionId: str
     topic: str
     difficulty: Difficulty
@@ -80,6 +83,8 @@ class QuestionMetadata(BaseModel):
     answer: str
     solution: str
     options: Optional[List[str]] = None
+    shortSolution: Optional[str] = None
+    detailedSolution: Optional[str] = None
 
     # 答案相关
     answerType: Optional[AnswerType] = None
@@ -98,6 +103,8 @@ class QuestionMetadata(BaseModel):
     source: str = "generated"         # "real_exam_2023" / "generated" / "manual"
     isRealExam: bool = False
     templateId: Optional[str] = None  # 题型模板ID
+    paperId: Optional[str] = None     # 真题试卷ID
+    year: Optional[int] = None        # 真题年份
 
     # 质量统计（由系统自动更新）
     totalAttempts: int = 0            # 总作答次数
@@ -117,6 +124,58 @@ class QuestionMetadata(BaseModel):
     updatedAt: Optional[datetime] = None
 
 
+class IncompleteQuestion(QuestionMetadata):
+    """
+    未通过 QuestionMetadata 校验的题目记录
+
+    如管理端录入的题目：题干和解析在 stemMarkdown、solutionMarkdown 中，没有 topic/question/solution。
+    不经校验构造，字段原样保留（能按声明的类型解析的字段照常解析），缺少的必填字段为 None；
+    题库照常保存、索引、检索和导出这些记录，面向学生的查询、推荐和统计不包含它们
+    """
+
+    @classmethod
+    def from_record(cls, item: Dict[str, Any]) -> "IncompleteQuestion":
+        """由题库文件中的一条记录构造（不校验）"""
+        values: Dict[str, Any] = dict.fromkeys(_REQUIRED_FIELDS)
+        for key, value in item.items():
+            adapter = _field_adapters().get(key)
+            if adapter is not None:
+                try:
+                    value = adapter.validate_python(value)
+                except ValidationError:
+                    pass
+            values[key] = value
+        return cls.model_construct(_fields_set=set(item), **values)
+
+
+_REQUIRED_FIELDS = [name for name, field in QuestionMetadata.model_fields.items() if field.is_required()]
+_FIELD_ADAPTERS: Dict[str, TypeAdapter] = {}
+
+
+def _field_adapters() -> Dict[str, TypeAdapter]:
+    """QuestionMetadata 各字段的校验器（首次使用时创建）"""
+    if not _FIELD_ADAPTERS:
+        _FIELD_ADAPTERS.update(
+            (name, TypeAdapter(field.annotation)) for name, field in QuestionMetadata.model_fields.items()
+        )
+    return _FIELD_ADAPTERS
+
+
+def parse_question(item: Dict[str, Any]) -> QuestionMetadata:
+    """解析题库中的一条记录：通过校验时返回 QuestionMetadata，否则返回 IncompleteQuestion"""
+    try:
+        return QuestionMetadata(**item)
+    except ValidationError:
+        return IncompleteQuestion.from_record(item)
+
+
+def dump_question(question: QuestionMetadata) -> Dict[str, Any]:
+    """题目写回题库文件的JSON对象（不完整的记录只写出原有的字段）"""
+    if isinstance(question, IncompleteQuestion):
+        return question.model_dump(mode='json', exclude_unset=True, warnings=False)
+    return question.model_dump(mode='json')
+
+
 # ========== 作答记录 ==========
 
 class AnswerRecord(BaseModel):
@@ -0,0 +1,46 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+@pytest.fixture
+def make_question():
+    """构造一道完整的题目（可覆盖任意字段）"""
+    from schemas import QuestionMetadata
+
+    def make(question_id: str, **fields) -> QuestionMetadata:
+        values = {
+            "questionId": question_id,
+            "topic": "导数",
+            "difficulty": "L1",
+            "type": "choice",
+            "question": f"题目 {question_id}：求函数的导数",
+            "answer": "A",
+            "solution": "按定义求导",
+            "options": ["A", "B", "C", "D"],
+            "knowledgePoints": ["导数"],
+        }
+        values.update(fields)
+        return QuestionMetadata(**values)
+
+    return make
+
+
+@pytest.fixture
+def admin_record():
+    """管理端录入的题目：题干和解析在 stemMarkdown/solutionMarkdown 中，不满足 QuestionMetadata"""
+    return {
+        "questionId": "q_admin",
+        "id": "q_admin",
+        "type": "choice",
+        "status": "approved",
+        "stemMarkdown": "已知抛物线的焦点，求准线方程",
+        "solutionMarkdown": "由定义可得",
+        "answer": "B",
+        "chapterIds": ["ch1"],
+        "knowledgePointIds": ["kp1"],
+        "sourceTaskId": "task1",
+    }
@@ -0,0 +1,186 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import admin_api
+from auth import create_access_token
+from core.json_writer import get_json_writer
+from core.question_bank import QuestionBank
+from core.question_bank_sqlite import SQLiteQuestionBank
+
+
+def open_bank(backend: str, directory):
+    if backend == "sqlite":
+        bank = SQLiteQuestionBank(str(directory / "questions.db"))
+        bank.load()
+        return bank
+    return QuestionBank(str(directory / "questions.json"), snapshot=False, shared_cold_store=False)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def bank(request, tmp_path, monkeypatch):
+    """管理端接口使用的题库（两种存储后端各运行一次）"""
+    bank = open_bank(request.param, tmp_path)
+    monkeypatch.setattr(admin_api, "question_bank", bank)
+    return bank
+
+
+@pytest.fixture
+def client(bank):
+    app = FastAPI()
+    app.include_router(admin_api.router)
+    token = create_access_token({"sub": "admin"})
+    return TestClient(app, headers={"Authorization": f"Bearer {token}"})
+
+
+def test_question_crud_goes_through_store(client, bank, admin_record, tmp_path):
+    response = client.post("/api/admin/questions", json=admin_record)
+    assert response.status_code == 200
+    assert bank.get("q_admin", include_incomplete=True).stemMarkdown == admin_record["stemMarkdown"]
+
+    response = client.put("/api/admin/questions/q_admin", json={"stemMarkdown": "新题干"})
+    assert response.status_code == 200
+    assert response.json()["stemMarkdown"] == "新题干"
+    assert response.json()["solutionMarkdown"] == admin_record["solutionMarkdown"]
+    assert client.get("/api/admin/questions/q_admin").json()["stemMarkdown"] == "新题干"
+
+    assert client.post("/api/admin/questions/batch-update",
+                       json={"questionIds": ["q_admin", "q_missing"], "updates": {"status": "pending"}}
+                       ).json() == {"updated": 1}
+    assert bank.get("q_admin", include_incomplete=True).status == "pending"
+
+    assert client.delete("/api/admin/questions/q_admin").status_code == 200
+    assert client.get("/api/admin/questions/q_admin").status_code == 404
+    assert client.delete("/api/admin/questions/q_admin").status_code == 404
+
+    if isinstance(bank, SQLiteQuestionBank):
+        # SQLite 后端不应再写 questions.json
+        assert not (tmp_path / "questions.json").exists()
+
+
+def test_duplicate_create_is_rejected(client, admin_record):
+    assert client.post("/api/admin/questions", json=dict(admin_record)).status_code == 200
+    assert client.post("/api/admin/questions", json=dict(admin_record)).status_code == 400
+
+
+def test_incomplete_records_are_hidden_from_student_queries(bank, admin_record, make_question):
+    from schemas import parse_question
+
+    bank.add(parse_question(admin_record))
+    bank.add(make_question("q1"))
+
+    assert bank.get("q_admin") is None
+    assert [q.questionId for q in bank.query()] == ["q1"]
+    assert bank.get_statistics()["total"] == 1
+    assert sorted(q.questionId for q in bank.query(include_incomplete=True)) == ["q1", "q_admin"]
+
+
+def test_incomplete_records_survive_reload(bank, admin_record, tmp_path):
+    from schemas import parse_question
+
+    bank.add(parse_question(admin_record))
+    reopened = open_bank("sqlite" if isinstance(bank, SQLiteQuestionBank) else "json", tmp_path)
+    question = reopened.get("q_admin", include_incomplete=True)
+    assert question.model_dump(mode="json", exclude_unset=True, warnings=False) == admin_record
+    if not isinstance(bank, SQLiteQuestionBank):
+        with open(tmp_path / "questions.json", encoding="utf-8") as f:
+            assert json.load(f) == [admin_record]
+
+
+def test_export_includes_admin_created_questions(client, bank, admin_record, make_question):
+    bank.add(make_question("q1", status="approved"))
+    assert client.post("/api/admin/questions", json=admin_record).status_code == 200
+
+    exported = client.post("/api/admin/export/questions-json", json={}).json()
+    assert [q["questionId"] for q in exported] == ["q1", "q_admin"]
+    assert exported[1]["stemMarkdown"] == admin_record["stemMarkdown"]
+
+    filtered = client.post("/api/admin/export/questions-json",
+                           json={"status": ["approved"], "chapterIds": ["ch1"]}).json()
+    assert [q["questionId"] for q in filtered] == ["q_admin"]
+
+    lines = client.post("/api/admin/export/sft-jsonl", json={}).text.splitlines()
+    assert len(lines) == 2
+    assert admin_record["stemMarkdown"] in json.loads(lines[1])["prompt"]
+
+
+def test_question_list_is_served_from_store(client, bank, admin_record, make_question):
+    bank.add(make_question("q1", status="approved", question="函数的单调性"))
+    bank.add(make_question("q2", type="fill", question="数列求和"))
+    assert client.post("/api/admin/questions", json=admin_record).status_code == 200
+
+    def listed(**params):
+        body = client.get("/api/admin/questions", params=params).json()
+        return [q["questionId"] for q in body["questions"]], body["total"]
+
+    assert listed() == (["q1", "q2", "q_admin"], 3)
+    assert listed(page=2, pageSize=2) == (["q_admin"], 3)
+    assert listed(status="approved") == (["q1", "q_admin"], 2)
+    assert listed(type="fill") == (["q2"], 1)
+    assert listed(taskId="task1") == (["q_admin"], 1)
+
+    # 关键词命中管理端录入的 stemMarkdown
+    assert listed(keyword="抛物线") == (["q_admin"], 1)
+    assert listed(keyword="抛物线 OR 单调", status="approved")[1] == 2
+    assert listed(keyword="抛物线", type="fill") == ([], 0)
+
+    page = client.get("/api/admin/questions", params={"taskId": "task1"}).json()["questions"]
+    assert page == [client.get("/api/admin/questions/q_admin").json()]
+
+
+def test_tag_usage_and_task_filter_use_store_indexes(client, bank, admin_record, tmp_path, monkeypatch):
+    tags_file = tmp_path / "tags.json"
+    monkeypatch.setattr(admin_api, "TAGS_FILE", tags_file)
+    monkeypatch.setattr(admin_api, "tags_writer", get_json_writer(tags_file, lambda: {"tags": []}))
+
+    assert client.post("/api/admin/questions", json=admin_record).status_code == 200
+    other = dict(admin_record, questionId="q_other", id="q_other", chapterIds=[], knowledgePointIds=["ch1"],
+                 sourceTaskId="task2")
+    assert client.post("/api/admin/questions", json=other).status_code == 200
+
+    client.post("/api/admin/tags", json={"name": "第一章", "type": "chapter"})
+    assert client.delete("/api/admin/tags/ch1").json()["affectedQuestions"] == 2
+
+    assert bank.get("q_other", include_incomplete=True) is not None
+    assert [qid for _, qid in bank.iter_query_ids(source_task_ids=["task2"], include_incomplete=True)] == ["q_other"]
+
+
+def test_deleting_import_task_removes_its_questions_in_one_write(client, bank, admin_record, tmp_path, monkeypatch):
+    tasks_file = tmp_path / "import_tasks.json"
+    tasks_file.write_text(json.dumps({"tasks": [{"id": "task1"}]}), encoding="utf-8")
+    monkeypatch.setattr(admin_api, "IMPORT_TASKS_FILE", tasks_file)
+    monkeypatch.setattr(admin_api, "import_tasks_writer", get_json_writer(tasks_file, lambda: {"tasks": []}))
+
+    for i in range(3):
+        record = dict(admin_record, questionId=f"q_task{i}", id=f"q_task{i}")
+        assert client.post("/api/admin/questions", json=record).status_code == 200
+    other = dict(admin_record, questionId="q_other", id="q_other", sourceTaskId="task2")
+    assert client.post("/api/admin/questions", json=other).status_code == 200
+
+    batches = []
+    delete_many = bank.delete_many
+    monkeypatch.setattr(bank, "delete", lambda question_id: pytest.fail("questions should be deleted in one batch"))
+    monkeypatch.setattr(bank, "delete_many", lambda ids: batches.append(list(ids)) or delete_many(batches[-1]))
+
+    response = client.delete("/api/admin/import-tasks/task1", params={"deleteQuestions": True})
+    assert response.status_code == 200
+    assert batches == [["q_task0", "q_task1", "q_task2"]]
+    assert [qid for _, qid in bank.iter_query_ids(include_incomplete=True)] == ["q_other"]
+    assert json.loads(tasks_file.read_text(encoding="utf-8"))["tasks"] == []
+
+
+def test_keyword_listing_reads_only_the_page(client, bank, make_question, monkeypatch):
+    bank.upsert_many([make_question(f"q{i}", question=f"函数的单调性 {i}") for i in range(10)])
+    assert [q.questionId for q in bank.search("单调", limit=3)] == bank.search_ids("单调", limit=3)
+
+    read = []
+    get = bank.get
+    monkeypatch.setattr(bank, "search", lambda *args, **kwargs: pytest.fail("listing should search ids only"))
+    monkeypatch.setattr(bank, "get", lambda qid, **kwargs: read.append(qid) or get(qid, **kwargs))
+
+    body = client.get("/api/admin/questions", params={"keyword": "单调", "page": 2, "pageSize": 4}).json()
+    assert body["total"] == 10
+    assert [q["questionId"] for q in body["questions"]] == read
+    assert len(read) == 4
@@ -0,0 +1,262 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from core.answer_ingest import AnswerIngestQueue
+from core.answer_shards import ShardedAnswerTracker
+from core.answer_tracker import AnswerTracker
+from core.question_bank import QuestionBank
+from schemas import AnswerRecord
+
+STUDENTS = [f"s{i}" for i in range(7)]
+QUESTIONS = [f"q{i}" for i in range(5)]
+
+
+def make_record(i: int, answered_at: datetime = None) -> AnswerRecord:
+    return AnswerRecord(
+        recordId=f"r{i}",
+        studentId=STUDENTS[i % len(STUDENTS)],
+        questionId=QUESTIONS[i % len(QUESTIONS)],
+        userAnswer="ABCD"[i % 4],
+        isCorrect=i % 3 != 0,
+        timeSpent=20 + i % 50,
+        answeredAt=answered_at or datetime(2025, 1, 1) + timedelta(minutes=i),
+    )
+
+
+def open_tracker(path, **options) -> AnswerTracker:
+    options.setdefault("log", True)
+    options.setdefault("log_fsync", "off")
+    return AnswerTracker(str(path), **options)
+
+
+def dumped(tracker) -> list:
+    return [record.model_dump() for record in tracker.records]
+
+
+@pytest.fixture
+def bank(tmp_path, make_question):
+    """画像按知识点/题型/难度统计所用的题库"""
+    bank = QuestionBank(str(tmp_path / "questions.json"), snapshot=False, shared_cold_store=False)
+    bank.upsert_many([
+        make_question(qid, knowledgePoints=[f"kp{i % 2}", "导数"], difficulty=f"L{i % 3 + 1}",
+                      type="choice" if i % 2 else "fill")
+        for i, qid in enumerate(QUESTIONS)
+    ])
+    return bank
+
+
+def profiles(tracker, bank) -> dict:
+    return {sid: tracker.calculate_student_profile(sid, bank).model_dump(exclude={"updatedAt"})
+            for sid in STUDENTS}
+
+
+def question_stats(tracker) -> dict:
+    return {qid: tracker.calculate_question_stats(qid).model_dump() for qid in QUESTIONS}
+
+
+def test_log_replay_truncates_incomplete_tail(tmp_path):
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path)
+    records = [make_record(i) for i in range(20)]
+    tracker.add_records(records[:10])
+    tracker.add_record(records[10])
+
+    # 进程在写最后一条记录时崩溃：段末尾留下写了一半的行
+    segment = tracker._log.segments()[-1]
+    with open(segment, "ab") as f:
+        f.write(b'{"recordId": "r_partial", "studentId": "s')
+
+    reopened = open_tracker(path)
+    assert dumped(reopened) == [r.model_dump() for r in records[:11]]
+
+    # 之后的追加从完整的行之后开始，再次重放不丢记录
+    reopened.add_records(records[11:])
+    assert dumped(open_tracker(path)) == [r.model_dump() for r in records]
+
+
+def test_checkpoint_and_reopen(tmp_path, bank):
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path, question_bank_ref=bank)
+    tracker.add_records([make_record(i) for i in range(30)])
+    tracker.save()
+    # 检查点之前的日志段已删除，记录只在列存储中
+    assert all(segment.stat().st_size == 0 for segment in tmp_path.glob("answer_records.log.*.jsonl"))
+
+    tracker.add_records([make_record(i) for i in range(30, 45)])
+    reopened = open_tracker(path, question_bank_ref=bank)
+    assert dumped(reopened) == dumped(tracker)
+    assert len(reopened.records) == 45
+    assert reopened.get_student_records("s3") == tracker.get_student_records("s3")
+    assert profiles(reopened, bank) == profiles(tracker, bank)
+    assert question_stats(reopened) == question_stats(tracker)
+
+
+def test_compact_keeps_profiles_and_stats(tmp_path, bank):
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path, question_bank_ref=bank)
+    recent = datetime.now() - timedelta(hours=1)
+    tracker.add_records([make_record(i) for i in range(60)])
+    tracker.add_records([make_record(i, recent + timedelta(seconds=i)) for i in range(60, 90)])
+    before = (profiles(tracker, bank), question_stats(tracker))
+
+    result = tracker.compact(retention_days=30)
+    assert result["compactedRecords"] == 60
+    assert result["remainingRecords"] == 30
+    assert [r["recordId"] for r in dumped(tracker)] == [f"r{i}" for i in range(60, 90)]
+    assert (profiles(tracker, bank), question_stats(tracker)) == before
+
+    reopened = open_tracker(path, question_bank_ref=bank)
+    assert (profiles(reopened, bank), question_stats(reopened)) == before
+
+
+def test_ingest_queue_drains_on_close(tmp_path, monkeypatch):
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path)
+    add_records = tracker.add_records
+
+    def slow_add_records(records):
+        # 写入比提交慢，关闭时队列中仍有积压
+        time.sleep(0.01)
+        add_records(records)
+
+    monkeypatch.setattr(tracker, "add_records", slow_add_records)
+    queue = AnswerIngestQueue(tracker, maxsize=1000, batch=7)
+    records = [make_record(i) for i in range(100)]
+    for record in records:
+        queue.submit(record)
+    assert queue.pending > 0
+
+    queue.close()
+    assert queue.pending == 0
+    assert (queue.written, queue.failed) == (100, 0)
+    assert dumped(open_tracker(path)) == [r.model_dump() for r in records]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_resharding_keeps_every_record(tmp_path, compact):
+    path = str(tmp_path / "answer_records.json")
+    recent = datetime.now() - timedelta(hours=1)
+    records = [make_record(i) for i in range(50)] + [make_record(i, recent) for i in range(50, 80)]
+
+    # 从未分片的存储迁移到 2 个分片，再调整为 3 个分片
+    unsharded = open_tracker(path)
+    unsharded.add_records(records[:40])
+    unsharded.save()
+    sharded = ShardedAnswerTracker(2, path, log=True, log_fsync="off")
+    sharded.add_records(records[40:])
+    if compact:
+        sharded.compact(retention_days=30)
+    stats = question_stats(sharded)
+    kept = sorted(r["recordId"] for r in dumped(sharded))
+
+    resharded = ShardedAnswerTracker(3, path, log=True, log_fsync="off")
+    assert sorted(r["recordId"] for r in dumped(resharded)) == kept
+    assert question_stats(resharded) == stats
+    for student in STUDENTS:
+        expected = [r.model_dump() for r in records if r.studentId == student and r.recordId in kept]
+        assert [r.model_dump() for r in resharded.get_student_records(student)] == expected
+        assert resharded.calculate_student_profile(student).totalProblems == \
+            sum(1 for r in records if r.studentId == student)
+    # 旧分片的文件已删除
+    assert not list(tmp_path.glob("answer_records.shard*of2.*"))
+
+    if not compact:
+        assert kept == sorted(r.recordId for r in records)
+
+
+def test_profile_rebuild_keeps_answers_ingested_meanwhile(tmp_path, bank, monkeypatch):
+    import threading
+    import core.answer_tracker as answer_tracker_module
+
+    tracker = open_tracker(tmp_path / "answer_records.json", question_bank_ref=bank)
+    tracker.add_records([make_record(i) for i in range(20)])
+    late = [make_record(i) for i in range(20, 30)]
+
+    from_columns = answer_tracker_module.EncodedRecords.from_columns
+
+    def ingest_during_rebuild(view):
+        # 重建读取视图之后，另一个线程写入新的作答
+        writer = threading.Thread(target=tracker.add_records, args=(late,))
+        writer.start()
+        writer.join(timeout=5)
+        return from_columns(view)
+
+    monkeypatch.setattr(answer_tracker_module.EncodedRecords, "from_columns", ingest_during_rebuild)
+    tracker.rebuild_profiles()
+    monkeypatch.undo()
+
+    assert len(tracker.records) == 30
+    rebuilt = profiles(tracker, bank)
+    tracker.rebuild_profiles()
+    assert rebuilt == profiles(tracker, bank)
+    assert sum(p["totalProblems"] for p in rebuilt.values()) == 30
+
+
+def test_second_process_cannot_open_records_for_writing(tmp_path):
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path)
+    tracker.add_records([make_record(i) for i in range(5)])
+    # 同一进程重新打开不受影响
+    assert len(open_tracker(path).records) == 5
+
+    script = (
+        "import sys\n"
+        "from core.answer_tracker import AnswerTracker\n"
+        "try:\n"
+        "    AnswerTracker(sys.argv[1], log=True, log_fsync='off')\n"
+        "except RuntimeError:\n"
+        "    sys.exit(3)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script, str(path)], capture_output=True, text=True,
+                            cwd=Path(__file__).parent.parent, timeout=60)
+    assert result.returncode == 3, result.stderr
+    # 另一个进程没有截断或改动日志
+    assert dumped(open_tracker(path)) == [make_record(i).model_dump() for i in range(5)]
+
+
+def test_checkpoints_without_log_append_new_dictionary_values(tmp_path):
+    import json
+
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path, log=False)
+    for i in range(20):
+        tracker.add_record(make_record(i))
+
+    meta_file = tmp_path / tracker.columns.directory / "meta.json"
+    meta = json.loads(meta_file.read_text(encoding="utf-8"))
+    assert "students" not in meta
+    assert meta["dictionaries"]["students"][0] == len(STUDENTS)
+    students = (tmp_path / tracker.columns.directory / "students.jsonl").read_text(encoding="utf-8")
+    assert [json.loads(line) for line in students.splitlines()] == STUDENTS
+
+    reopened = open_tracker(path, log=False)
+    assert dumped(reopened) == [make_record(i).model_dump() for i in range(20)]
+
+
+def test_record_indexes_match_a_linear_scan(tmp_path):
+    path = tmp_path / "answer_records.json"
+    tracker = open_tracker(path)
+    recent = datetime.now() - timedelta(hours=1)
+    tracker.add_records([make_record(i) for i in range(40)])
+    tracker.add_records([make_record(i, recent + timedelta(seconds=i)) for i in range(40, 70)])
+
+    def check(tracker):
+        records = list(tracker.records)
+        for student in STUDENTS:
+            assert tracker.get_student_records(student) == [r for r in records if r.studentId == student]
+        for question in QUESTIONS:
+            assert tracker.get_question_records(question) == [r for r in records if r.questionId == question]
+
+    check(tracker)
+    tracker.compact(retention_days=30)
+    assert len(tracker.records) == 30
+    check(tracker)
+    tracker.add_record(make_record(70, recent))
+    check(tracker)
+    check(open_tracker(path))
@@ -0,0 +1,173 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from core.question_bank import QuestionBank
+
+
+@pytest.fixture
+def bank(tmp_path, monkeypatch):
+    bank = QuestionBank(str(tmp_path / "questions.json"), snapshot=False, shared_cold_store=False)
+    monkeypatch.setattr(main, "question_bank", bank)
+    return bank
+
+
+@pytest.fixture
+def client(bank):
+    return TestClient(main.app)
+
+
+def question_payload(question_id: str, **fields) -> dict:
+    payload = {
+        "questionId": question_id, "topic": "导数", "difficulty": "L1", "type": "fill",
+        "question": "求 x^2 的导数", "answer": "2x", "solution": "幂函数求导",
+    }
+    payload.update(fields)
+    return payload
+
+
+def test_bulk_create_writes_off_the_event_loop(client, bank, monkeypatch):
+    threads = []
+    add_many = bank.add_many
+
+    def recording_add_many(questions):
+        # 在工作线程中执行时没有正在运行的事件循环
+        try:
+            asyncio.get_running_loop()
+            threads.append("event loop")
+        except RuntimeError:
+            threads.append("worker")
+        return add_many(questions)
+
+    monkeypatch.setattr(bank, "add_many", recording_add_many)
+    response = client.post("/api/questions/bulk", json={"questions": [
+        question_payload("q1"), question_payload("q2"), {"questionId": "bad", "topic": "导数"},
+    ]})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["added"] == ["q1", "q2"]
+    assert [item["questionId"] for item in body["invalid"]] == ["bad"]
+    assert threads == ["worker"]
+    assert bank.get("q2") is not None
+
+
+def test_question_routes_write_through_store(client, bank):
+    assert client.post("/api/questions", json=question_payload("q1")).status_code == 200
+    assert client.post("/api/questions", json=question_payload("q1")).status_code == 400
+    assert bank.get("q1").answer == "2x"
+
+    assert client.put("/api/questions/q1", json=question_payload("q1", answer="2*x")).status_code == 200
+    assert bank.get("q1").answer == "2*x"
+    assert client.put("/api/questions/q_missing", json=question_payload("q_missing")).status_code == 404
+
+    assert client.delete("/api/questions/q1").status_code == 200
+    assert bank.get("q1") is None
+
+
+def test_random_problem_reads_one_question(client, bank, make_question, monkeypatch):
+    bank.upsert_many([make_question("q1", difficulty="L1"), make_question("q2", difficulty="L2")])
+
+    def no_full_query(*args, **kwargs):
+        raise AssertionError("random problem should not materialize the whole bank")
+    monkeypatch.setattr(bank, "query", no_full_query)
+
+    for _ in range(5):
+        assert client.post("/api/problem", params={"difficulty": "L2"}).json()["questionId"] == "q2"
+    assert client.post("/api/problem").json()["questionId"] in ("q1", "q2")
+    assert client.post("/api/problem", params={"difficulty": "L3"}).status_code == 404
+
+
+def test_pdf_verify_saves_a_batch_with_one_write(client, bank, monkeypatch):
+    writes = []
+    add_many = bank.add_many
+    monkeypatch.setattr(bank, "add_many", lambda questions: writes.append(len(questions)) or add_many(questions))
+
+    body = client.post("/api/pdf/verify", json=[question_payload("q1"), question_payload("q2")]).json()
+    assert body["added"] == ["q1", "q2"]
+    assert writes == [2]
+
+    assert client.post("/api/pdf/verify", json=question_payload("q3")).json()["questionId"] == "q3"
+    assert client.post("/api/pdf/verify", json=question_payload("q3")).status_code == 400
+    assert writes == [2, 1, 1]
+    assert [q.questionId for q in bank.query()] == ["q1", "q2", "q3"]
+
+
+def test_spawned_worker_does_not_load_server_singletons():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    # spawn 子进程以 __mp_main__ 重新执行 python main.py 启动的脚本
+    script = (
+        "import runpy, sys\n"
+        "runpy.run_path('main.py', run_name='__mp_main__')\n"
+        "from core.quality_stats import compute_chunk_stats\n"
+        "loaded = {'core.question_bank', 'core.answer_tracker', 'core.stats_jobs', 'admin_api'} & set(sys.modules)\n"
+        "print(sorted(loaded))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=Path(main.__file__).parent,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+
+
+@pytest.mark.parametrize("time_spent", ["NaN", "Infinity", "-Infinity", "-1"])
+def test_submit_answer_rejects_invalid_time_spent(client, bank, make_question, time_spent):
+    bank.add(make_question("q1"))
+    body = f'{{"studentId": "s1", "questionId": "q1", "userAnswer": "2x", "timeSpent": {time_spent}}}'
+    response = client.post("/api/answers/submit", content=body, headers={"Content-Type": "application/json"})
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "timeSpent"]
+
+
+def test_question_list_returns_304_for_matching_etag(client, bank, make_question, monkeypatch):
+    monkeypatch.setattr(main, "_questions_cache", {})
+    bank.add_many([make_question("q1"), make_question("q2")])
+
+    first = client.get("/api/questions")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200 and [q["questionId"] for q in first.json()] == ["q1", "q2"]
+
+    cached = client.get("/api/questions", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b"" and cached.headers["ETag"] == etag
+
+    # 题库变化后 ETag 随内容变化，旧 ETag 不再命中
+    bank.add(make_question("q3"))
+    changed = client.get("/api/questions", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag and len(changed.json()) == 3
+
+
+def test_cursor_paging_is_stable_across_writes(client, bank, make_question, monkeypatch):
+    monkeypatch.setattr(main, "_questions_cache", {})
+    bank.add_many([make_question(f"q{i}") for i in range(5)])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2} if cursor is None else {"limit": 2, "cursor": cursor}
+        response = client.get("/api/questions", params=params)
+        assert response.status_code == 200
+        seen += [q["questionId"] for q in response.json()]
+        if len(seen) == 2:
+            # 翻页途中删除已返回的题目、新增题目：后续页不重复、不遗漏
+            bank.delete("q0")
+            bank.add(make_question("q5"))
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+    assert seen == ["q0", "q1", "q2", "q3", "q4", "q5"]
+
+
+def test_invalid_cursor_is_rejected(client, bank, make_question, monkeypatch):
+    monkeypatch.setattr(main, "_questions_cache", {})
+    bank.add_many([make_question(f"q{i}") for i in range(3)])
+    assert client.get("/api/questions", params={"cursor": "not-a-cursor"}).status_code == 400
+
+    # 游标只能用于生成它的查询条件
+    cursor = client.get("/api/questions", params={"limit": 1}).headers["X-Next-Cursor"]
+    response = client.get("/api/questions", params={"cursor": cursor, "difficulty": "L1"})
+    assert response.status_code == 400
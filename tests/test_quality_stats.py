@@ -0,0 +1,113 @@
+import random
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from core.answer_tracker import AnswerTracker
+from core.quality_stats import compute_question_stats
+from schemas import AnswerRecord, QualityStats
+
+
+def reference_stats(records, question_id: str) -> QualityStats:
+    """逐条计算的质量统计（向量化之前 AnswerTracker.calculate_question_stats 的算法）"""
+    question_records = [r for r in records if r.questionId == question_id]
+    if not question_records:
+        return QualityStats(questionId=question_id, totalAttempts=0, correctCount=0,
+                            correctRate=0.0, avgTimeSeconds=0.0)
+    total = len(question_records)
+    correct = sum(1 for r in question_records if r.isCorrect)
+
+    scores = defaultdict(lambda: [0, 0])
+    for r in records:
+        scores[r.studentId][0] += r.isCorrect
+        scores[r.studentId][1] += 1
+    rates = {sid: c / t for sid, (c, t) in scores.items()}
+    discrimination = None
+    if len(rates) >= 10:
+        ranked = sorted(rates.items(), key=lambda x: x[1], reverse=True)
+        k = int(len(ranked) * 0.27)
+        top = {sid for sid, _ in ranked[:k]}
+        low = {sid for sid, _ in ranked[-k:]}
+
+        def rate(group):
+            rows = [r for r in question_records if r.studentId in group]
+            return sum(1 for r in rows if r.isCorrect) / len(rows) if rows else 0
+
+        discrimination = rate(top) - rate(low)
+
+    options = defaultdict(int)
+    for r in question_records:
+        options[r.userAnswer] += 1
+    return QualityStats(
+        questionId=question_id, totalAttempts=total, correctCount=correct, correctRate=correct / total,
+        avgTimeSeconds=sum(r.timeSpent for r in question_records) / total,
+        discriminationIndex=discrimination,
+        optionDistribution={option: count / total for option, count in options.items()},
+    )
+
+
+def saved_stats(bank, question_id: str) -> QualityStats:
+    """题库中写回的质量统计字段"""
+    question = bank.get(question_id)
+    return QualityStats(questionId=question_id, **{
+        field: getattr(question, field) for field in (
+            "totalAttempts", "correctCount", "correctRate", "avgTimeSeconds",
+            "discriminationIndex", "optionDistribution",
+        )
+    })
+
+
+def make_records(first: int, count: int, start: datetime) -> list:
+    """23 个学生、6 道题的作答（学生数不少于计算区分度所需的 10 人）"""
+    rng = random.Random(first)
+    return [
+        AnswerRecord(
+            recordId=f"r{first + i}", studentId=f"s{rng.randrange(23)}", questionId=f"q{rng.randrange(6)}",
+            userAnswer=rng.choice("ABCD"), isCorrect=rng.random() < 0.6, timeSpent=rng.randrange(5, 120),
+            answeredAt=start + timedelta(minutes=i),
+        )
+        for i in range(count)
+    ]
+
+
+def test_vectorized_stats_match_per_record_calculation(tmp_path):
+    recent = datetime.now() - timedelta(days=1)
+    records = make_records(0, 300, datetime(2025, 1, 1)) + make_records(300, 100, recent)
+    question_ids = [f"q{i}" for i in range(6)] + ["missing"]
+    expected = {qid: reference_stats(records, qid) for qid in question_ids}
+
+    vectorized = compute_question_stats(records)
+    assert vectorized == {qid: stats for qid, stats in expected.items() if stats.totalAttempts}
+
+    tracker = AnswerTracker(str(tmp_path / "answer_records.json"), log=True, log_fsync="off")
+    tracker.add_records(records)
+    assert {qid: tracker.calculate_question_stats(qid) for qid in question_ids} == expected
+
+    # 压缩后汇总与剩余原始记录一起计算，结果不变
+    assert tracker.compact(retention_days=30)["compactedRecords"] == 300
+    assert {qid: tracker.calculate_question_stats(qid) for qid in question_ids} == expected
+
+
+def test_parallel_and_incremental_refresh_jobs(tmp_path, make_question):
+    from core.question_bank import QuestionBank
+    from core.stats_jobs import StatsJobManager
+
+    question_ids = [f"q{i}" for i in range(6)]
+    bank = QuestionBank(str(tmp_path / "questions.json"), snapshot=False, shared_cold_store=False)
+    bank.add_many([make_question(qid) for qid in question_ids])
+    tracker = AnswerTracker(str(tmp_path / "answer_records.json"), log=True, log_fsync="off")
+    records = make_records(0, 300, datetime(2025, 1, 1))
+    tracker.add_records(records)
+
+    # 题目数不少于 parallel_min_questions 时交给 spawn 进程池计算
+    jobs = StatsJobManager(tracker, bank, workers=2, parallel_min_questions=1)
+    job = jobs.wait(jobs.start()["jobId"], timeout=120)
+    assert (job["status"], job["mode"], job["updatedQuestions"]) == ("completed", "full", 6)
+    assert {qid: saved_stats(bank, qid) for qid in question_ids} == \
+        {qid: reference_stats(records, qid) for qid in question_ids}
+
+    # 增量刷新只重新计算有新作答的题目
+    late = [r.model_copy(update={"questionId": "q2"}) for r in make_records(300, 20, datetime(2025, 2, 1))]
+    tracker.add_records(late)
+    job = jobs.wait(jobs.start()["jobId"], timeout=120)
+    assert (job["status"], job["mode"], job["totalQuestions"]) == ("completed", "incremental", 1)
+    assert saved_stats(bank, "q2") == reference_stats(records + late, "q2")
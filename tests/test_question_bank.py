@@ -0,0 +1,223 @@
+import json
+
+import pytest
+
+from core.question_bank import QuestionBank
+from schemas import QualityStats
+
+
+def open_bank(path, **options) -> QuestionBank:
+    options.setdefault("snapshot", False)
+    options.setdefault("shared_cold_store", False)
+    return QuestionBank(str(path), **options)
+
+
+def stats_for(question_id: str) -> QualityStats:
+    return QualityStats(questionId=question_id, totalAttempts=10, correctCount=7,
+                        correctRate=0.7, avgTimeSeconds=42.0)
+
+
+def saved_ids(path) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [item["questionId"] for item in json.load(f)]
+
+
+@pytest.mark.parametrize("journal", [False, True])
+def test_stats_update_keeps_questions_written_elsewhere(tmp_path, make_question, journal):
+    path = tmp_path / "questions.json"
+    bank = open_bank(path, journal=journal)
+    bank.add(make_question("q1"))
+
+    # 另一个进程（或另一个题库实例）在此期间新增了题目
+    other = open_bank(path, journal=journal)
+    other.add(make_question("q_new_x"))
+
+    assert bank.update_quality_stats_many([stats_for("q1")]) == 1
+    assert bank.get("q_new_x") is not None
+    assert bank.get("q1").totalAttempts == 10
+
+    bank.save()
+    assert sorted(saved_ids(path)) == ["q1", "q_new_x"]
+    assert open_bank(path).get("q_new_x") is not None
+
+
+def test_writes_keep_external_edits_to_the_file(tmp_path, make_question):
+    path = tmp_path / "questions.json"
+    bank = open_bank(path)
+    bank.add(make_question("q1"))
+    bank.add(make_question("q2"))
+
+    # 外部工具直接改写文件
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data[0]["topic"] = "极限"
+    data.append(make_question("q3").model_dump(mode="json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    bank.delete("q2")
+    assert saved_ids(path) == ["q1", "q3"]
+    assert bank.get("q1").topic == "极限"
+
+
+def test_compaction_keeps_changes_from_another_instance(tmp_path, make_question):
+    path = tmp_path / "questions.json"
+    bank = open_bank(path, journal=True, compact_threshold=1000)
+    bank.add(make_question("q1"))
+    other = open_bank(path, journal=True, compact_threshold=1000)
+    other.add(make_question("q2"))
+
+    bank.compact()
+    assert saved_ids(path) == ["q1", "q2"]
+    assert sorted(q.questionId for q in open_bank(path, journal=True).query()) == ["q1", "q2"]
+
+
+def test_unchanged_cold_fields_are_not_rewritten(tmp_path, make_question):
+    bank = open_bank(tmp_path / "questions.json")
+    bank.upsert_many([make_question(f"q{i}", solution="解析" * 200) for i in range(20)])
+    size = bank._cold_store.size
+
+    for _ in range(5):
+        bank.update_quality_stats_many([stats_for(f"q{i}") for i in range(20)])
+        bank.update(bank.get("q0"))
+    assert bank._cold_store.size == size
+
+
+def test_cold_store_space_is_reclaimed(tmp_path, make_question):
+    bank = open_bank(tmp_path / "questions.json", cold_reclaim_bytes=1)
+    bank.upsert_many([make_question(f"q{i}", solution="解析" * 200) for i in range(10)])
+    live = bank._cold_store.size
+
+    snapshot = bank.snapshot()
+    for round in range(50):
+        stats = [stats_for(f"q{i}").model_copy(update={"optionDistribution": {"A": round / 50}})
+                 for i in range(10)]
+        bank.update_quality_stats_many(stats)
+        if round == 10:
+            # 持有快照期间不回收，快照仍读到原来的冷数据
+            assert bank._cold_store.size > 2 * live
+            assert snapshot.get("q3").optionDistribution is None
+            assert snapshot.get("q3").solution == "解析" * 200
+            snapshot.release()
+
+    assert bank._cold_store.size <= 2 * live + 1024
+    assert bank.get("q3").optionDistribution == {"A": 49 / 50}
+    assert bank.get("q3").solution == "解析" * 200
+
+    bank.delete("q3")
+    assert bank._cold_store.garbage <= bank._cold_store.size
+
+
+def index_state(bank: QuestionBank) -> dict:
+    """题库的全部索引（比较快照恢复与逐条建立的结果）"""
+    return {
+        "indexes": {name: dict(keys) for name, keys in bank._indexes.items() if keys},
+        "indexed_keys": bank._indexed_keys,
+        "sequence": bank._sequence,
+        "facets": {facet: counter for facet, counter in bank._facets.items() if counter},
+        "facet_keys": bank._facet_keys,
+    }
+
+
+def test_startup_snapshot_restores_records_and_indexes(tmp_path, make_question, admin_record, monkeypatch):
+    from datetime import datetime
+    from schemas import IncompleteQuestion, dump_question, parse_question
+
+    path = tmp_path / "questions.json"
+    bank = open_bank(path)
+    bank.add(make_question("q1", abilityTags=["apply"], answerType="expr", createdAt=datetime(2025, 1, 2, 3, 4),
+                           optionDistribution={"A": 0.5}, knowledgePoints=["导数", "单调性"], chapter="第一章"))
+    bank.add(parse_question(admin_record))
+    bank.add(make_question("q2", difficulty="L3", type="fill", options=None, isRealExam=True, source="real_exam_2023"))
+
+    parsed = open_bank(path, snapshot=True)
+    assert (tmp_path / "questions.snapshot.bin").exists()
+
+    # 由快照恢复：不再逐条解析
+    def no_parsing(item):
+        raise AssertionError("snapshot should skip parsing")
+    monkeypatch.setattr(QuestionBank, "_parse_question", staticmethod(no_parsing))
+    restored = open_bank(path, snapshot=True)
+
+    dumped = lambda b: [dump_question(q) for q in b.query(include_incomplete=True)]
+    assert dumped(restored) == dumped(parsed) == dumped(bank)
+    assert index_state(restored) == index_state(parsed)
+    assert [q.questionId for q in restored.search("导数 OR 抛物线", include_incomplete=True)] == \
+        [q.questionId for q in parsed.search("导数 OR 抛物线", include_incomplete=True)]
+    assert isinstance(restored.get("q_admin", include_incomplete=True), IncompleteQuestion)
+    assert restored.get("q1").createdAt == datetime(2025, 1, 2, 3, 4)
+    assert restored.get_statistics() == parsed.get_statistics()
+
+    # 恢复后的题库照常修改
+    monkeypatch.undo()
+    restored.delete("q1")
+    restored.update(restored.get("q2").model_copy(update={"topic": "数列"}))
+    assert [q.questionId for q in restored.query(topic="数列")] == ["q2"]
+    assert restored.check_statistics()["drift"] == []
+
+
+def test_stale_or_corrupt_startup_snapshot_is_ignored(tmp_path, make_question):
+    path = tmp_path / "questions.json"
+    open_bank(path).upsert_many([make_question("q1"), make_question("q2")])
+    open_bank(path, snapshot=True)
+
+    # 外部修改题库文件后快照过期
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    data.append(make_question("q3").model_dump(mode="json"))
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    assert open_bank(path, snapshot=True).get("q3") is not None
+
+    # 快照损坏时回退到逐条解析
+    snapshot_file = tmp_path / "questions.snapshot.bin"
+    content = snapshot_file.read_bytes()
+    snapshot_file.write_bytes(content[:-10] + b"x" * 10)
+    bank = open_bank(path, snapshot=True)
+    assert sorted(q.questionId for q in bank.query()) == ["q1", "q2", "q3"]
+    assert snapshot_file.read_bytes() != content[:-10] + b"x" * 10
+
+
+def test_startup_snapshot_with_journal(tmp_path, make_question):
+    path = tmp_path / "questions.json"
+    bank = open_bank(path, journal=True, snapshot=True)
+    bank.upsert_many([make_question("q1"), make_question("q2")])
+    bank.compact()
+    snapshot_file = tmp_path / "questions.snapshot.bin"
+    assert snapshot_file.exists()
+
+    # 快照之后的变更由日志重放
+    bank.delete("q1")
+    bank.add(make_question("q3", topic="数列"))
+    bank.update(bank.get("q2").model_copy(update={"topic": "数列"}))
+    written = snapshot_file.stat().st_mtime_ns
+
+    reopened = open_bank(path, journal=True, snapshot=True)
+    assert snapshot_file.stat().st_mtime_ns == written
+    assert [q.questionId for q in reopened.query()] == ["q2", "q3"]
+    assert [q.questionId for q in reopened.query(topic="数列")] == ["q2", "q3"]
+    assert index_state(reopened) == index_state(bank)
+
+
+def test_snapshot_does_not_see_later_writes(tmp_path, make_question):
+    bank = open_bank(tmp_path / "questions.json")
+    bank.add_many([make_question(f"q{i}") for i in range(3)])
+
+    with bank.snapshot() as view:
+        # 快照之后：修改、删除、新增题目
+        bank.update(make_question("q0", difficulty="L2", question="改写后的题目"))
+        bank.delete("q1")
+        bank.add(make_question("q3"))
+
+        assert view.get("q0").question == "题目 q0：求函数的导数"
+        assert view.get("q1") is not None and view.get("q3") is None
+        assert [qid for _, qid in view.iter_query_ids(difficulty="L1")] == ["q0", "q1", "q2"]
+        assert [qid for _, qid in view.iter_query_ids()] == ["q0", "q1", "q2"]
+
+        # 题库本身与之后创建的快照看到最新版本
+        assert [q.questionId for q in bank.query(difficulty="L1")] == ["q2", "q3"]
+        with bank.snapshot() as latest:
+            assert latest.get("q0").question == "改写后的题目" and latest.get("q1") is None
+
+    # 所有快照释放后撤销日志回收
+    assert bank._undo == {}
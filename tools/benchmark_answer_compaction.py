@@ -0,0 +1,101 @@
+"""
+作答记录压缩基准：比较压缩前后列存储的磁盘占用、打开耗时与统计耗时，并校验统计结果不变
+生成跨度两年的作答记录（学生数为记录数的 1/200，题目 20000 道，每个学生反复练习一部分题目），
+按保留期压缩后只保留最近的原始记录
+
+用法: python benchmark_answer_compaction.py [记录数量 ...]    默认 100000 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_tracker import AnswerTracker
+from core.quality_stats import EncodedRecords, compute_encoded_stats
+
+QUESTION_COUNT = 20_000
+# 每个学生练习的题目数（同一题会作答多次）
+QUESTIONS_PER_STUDENT = 100
+HISTORY_DAYS = 730
+RETENTION_DAYS = 90
+
+
+def make_records(count: int):
+    """直接构造记录（跳过校验，只为节省生成时间），作答时间从两年前均匀分布到现在"""
+    students = max(1, count // 200)
+    start = datetime.now() - timedelta(days=HISTORY_DAYS)
+    step = timedelta(days=HISTORY_DAYS) / count
+    return [
+        AnswerRecord.model_construct(
+            recordId=f"r_{i}",
+            studentId=f"s_{i % students}",
+            questionId=f"q_{((i % students) * 7919 + (i // students) % QUESTIONS_PER_STUDENT) % QUESTION_COUNT}",
+            userAnswer="ABCD"[(i * 31) % 4],
+            isCorrect=(i * 13) % 5 < 3,
+            timeSpent=30 + i % 90,
+            answeredAt=start + step * i,
+        )
+        for i in range(count)
+    ]
+
+
+def disk_bytes(directory: str) -> int:
+    """目录中的文件大小合计（列文件按已写入的行数计算，不含预留容量）"""
+    total = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(".bin"):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+
+def measure(tracker: AnswerTracker):
+    """(磁盘字节数, 打开耗时, 全库统计耗时, 统计结果)"""
+    store = tracker.columns
+    used = sum(column.data.dtype.itemsize * store.count for column in store.columns.values())
+    used += int(store.columns["record_end"].data[store.count - 1]) if store.count else 0
+    used += disk_bytes(store.directory)
+
+    start = time.perf_counter()
+    reopened = AnswerTracker(tracker.data_file, log=False)
+    opened = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stats = compute_encoded_stats(EncodedRecords.from_columns(reopened.columns.view()))
+    computed = time.perf_counter() - start
+    return used, opened, computed, [s.model_dump() for s in stats]
+
+
+def main():
+    """主函数"""
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+
+    print(f"保留期 {RETENTION_DAYS} 天")
+    print(f"{'记录数':>10} {'':>6} {'原始记录':>10} {'汇总行':>8} {'磁盘':>10} {'打开':>8} {'全库统计':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            tracker = AnswerTracker(os.path.join(tmp, f"answers_{count}.json"), log=False)
+            tracker.records = make_records(count)
+
+            used, opened, computed, before = measure(tracker)
+            print(f"{count:>10} {'压缩前':>6} {tracker.columns.count:>10} {0:>8} "
+                  f"{used / 1024 / 1024:>8.1f}MB {opened:>7.2f}s {computed:>7.2f}s")
+
+            start = time.perf_counter()
+            result = tracker.compact(RETENTION_DAYS)
+            elapsed = time.perf_counter() - start
+
+            used, opened, computed, after = measure(tracker)
+            print(f"{'':>10} {'压缩后':>6} {result['remainingRecords']:>10} {result['rollupRows']:>8} "
+                  f"{used / 1024 / 1024:>8.1f}MB {opened:>7.2f}s {computed:>7.2f}s  "
+                  f"(压缩耗时 {elapsed:.2f}s，统计{'一致' if before == after else '不一致'})")
+            del tracker
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+作答记录索引基准：比较按学生/题目查询作答记录时全表扫描与下标索引的耗时
+生成指定数量的作答记录（学生数为记录数的 1/200，题目 20000 道），分别计时：
+  - 建立索引
+  - get_student_records / get_question_records：全表扫描 vs 索引
+  - calculate_student_profile（不带题库）
+
+用法: python benchmark_answer_index.py [记录数量 ...]    默认 1000000 10000000
+（1000 万条记录约需 6GB 内存）
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_tracker import AnswerTracker
+
+QUESTION_COUNT = 20_000
+SAMPLES = 200
+
+
+def make_records(count: int):
+    """直接构造记录（跳过校验，只为节省生成时间）"""
+    students = max(1, count // 200)
+    start = datetime(2025, 1, 1)
+    return [
+        AnswerRecord.model_construct(
+            recordId=f"r_{i}",
+            studentId=f"s_{i % students}",
+            questionId=f"q_{(i * 7919) % QUESTION_COUNT}",
+            userAnswer="A",
+            isCorrect=i % 3 != 0,
+            timeSpent=30 + i % 90,
+            answeredAt=start + timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def per_call_ms(func, keys) -> float:
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys) * 1000
+
+
+def main():
+    """主函数"""
+    counts = [int(arg) for arg in sys.argv[1:]] or [1_000_000, 10_000_000]
+
+    print(f"{'记录数':>10} {'建索引':>9} {'学生-扫描':>10} {'学生-索引':>10} "
+          f"{'题目-扫描':>10} {'题目-索引':>10} {'画像-索引':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            tracker = AnswerTracker(os.path.join(tmp, f"answers_{count}.json"), log=False)
+            records = make_records(count)
+            tracker.records = records
+
+            start = time.perf_counter()
+            tracker._rebuild_indexes()
+            build = time.perf_counter() - start
+            tracker.rebuild_profiles()
+
+            students = random.sample(sorted(tracker._by_student), min(SAMPLES, len(tracker._by_student)))
+            questions = random.sample(sorted(tracker._by_question), min(SAMPLES, len(tracker._by_question)))
+            # 全表扫描只取少量样本，否则千万级记录要跑很久
+            scan_students, scan_questions = students[:5], questions[:5]
+
+            student_scan = per_call_ms(lambda sid: [r for r in records if r.studentId == sid], scan_students)
+            student_index = per_call_ms(tracker.get_student_records, students)
+            question_scan = per_call_ms(lambda qid: [r for r in records if r.questionId == qid], scan_questions)
+            question_index = per_call_ms(tracker.get_question_records, questions)
+            profile = per_call_ms(tracker.calculate_student_profile, students)
+
+            print(f"{count:>10} {build:>8.2f}s {student_scan:>8.1f}ms {student_index:>8.3f}ms "
+                  f"{question_scan:>8.1f}ms {question_index:>8.3f}ms {profile:>8.3f}ms")
+            del tracker, records
+
+
+if __name__ == "__main__":
+    main()
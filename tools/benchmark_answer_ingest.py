@@ -0,0 +1,86 @@
+"""
+作答记录提交基准：比较请求线程中直接 add_record 与放入写入队列（core.answer_ingest）的每条耗时
+多个线程模拟并发请求，各自提交记录，统计提交调用本身的耗时分布（p50/p99）与全部记录写入完成的总耗时
+
+用法: python benchmark_answer_ingest.py [记录数量] [并发线程数]    默认 5000 8
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_ingest import AnswerIngestQueue
+from core.answer_tracker import AnswerTracker
+
+START = datetime(2025, 1, 1)
+
+
+def make_record(i: int) -> AnswerRecord:
+    return AnswerRecord(
+        recordId=f"r_{i}",
+        studentId=f"s_{i % 500}",
+        questionId=f"q_{(i * 7919) % 20000}",
+        userAnswer="A",
+        isCorrect=i % 3 != 0,
+        timeSpent=30 + i % 90,
+        answeredAt=START + timedelta(seconds=i),
+    )
+
+
+def run(records, threads: int, submit) -> tuple:
+    """多线程提交，返回 (每条耗时列表, 总耗时)"""
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(part):
+        local = []
+        for record in part:
+            start = time.perf_counter()
+            submit(record)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(records[i::threads],)) for i in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return sorted(latencies), time.perf_counter() - start
+
+
+def main():
+    """主函数"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    records = [make_record(i) for i in range(count)]
+
+    print(f"{count} 条记录，{threads} 个并发线程")
+    print(f"{'方式':<24} {'p50':>10} {'p99':>10} {'全部写入':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for fsync in ("always", "interval"):
+            for mode in ("direct", "queue"):
+                tracker = AnswerTracker(os.path.join(tmp, f"{fsync}_{mode}", "answers.json"), log_fsync=fsync)
+                if mode == "direct":
+                    latencies, total = run(records, threads, tracker.add_record)
+                else:
+                    ingest = AnswerIngestQueue(tracker, maxsize=count)
+                    latencies, total = run(records, threads, ingest.submit)
+                    start = time.perf_counter()
+                    ingest.close()
+                    total += time.perf_counter() - start
+                assert len(tracker.records) == count
+                p50 = latencies[len(latencies) // 2] * 1e6
+                p99 = latencies[int(len(latencies) * 0.99)] * 1e6
+                print(f"{mode + ' (fsync=' + fsync + ')':<24} {p50:>8.0f}us {p99:>8.0f}us {total:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+作答记录写入基准：比较不使用日志（每条记录都做检查点）与追加日志（各 fsync 策略）的写入耗时
+先写入指定数量的已有记录作为 answer_records.json 导入，再逐条 add_record，统计平均每条耗时
+
+用法: python benchmark_answer_log.py [已有记录数] [追加记录数]    默认 100000 500
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_tracker import AnswerTracker
+
+START = datetime(2025, 1, 1)
+
+
+def make_record(i: int) -> AnswerRecord:
+    return AnswerRecord(
+        recordId=f"r_{i}",
+        studentId=f"s_{i % 500}",
+        questionId=f"q_{(i * 7919) % 20000}",
+        userAnswer="A",
+        isCorrect=i % 3 != 0,
+        timeSpent=30 + i % 90,
+        answeredAt=START + timedelta(seconds=i),
+    )
+
+
+def run(tmp: str, base: list, appends: int, label: str, **options):
+    data_file = os.path.join(tmp, label, "answer_records.json")
+    os.makedirs(os.path.dirname(data_file))
+    with open(data_file, 'w', encoding='utf-8') as f:
+        json.dump(base, f, ensure_ascii=False)
+    tracker = AnswerTracker(data_file, **options)
+
+    start = time.perf_counter()
+    for i in range(appends):
+        tracker.add_record(make_record(len(base) + i))
+    if tracker._log is not None:
+        tracker._log.sync()
+    elapsed = time.perf_counter() - start
+
+    if tracker._log is not None:
+        tracker._log.close()
+    print(f"{label:<16} {elapsed / appends * 1000:>10.3f}ms {appends / elapsed:>12.0f}")
+
+
+def main():
+    """主函数"""
+    existing = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    appends = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    base = [make_record(i).model_dump(mode='json') for i in range(existing)]
+
+    print(f"{'写入方式':<12} {'每条耗时':>10} {'每秒条数':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        run(tmp, base, appends, "checkpoint", log=False)
+        run(tmp, base, appends, "log-always", log_fsync="always")
+        run(tmp, base, appends, "log-interval", log_fsync="interval")
+        run(tmp, base, appends, "log-batch", log_fsync="batch")
+        run(tmp, base, appends, "log-off", log_fsync="off")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+内存基准：比较 AnswerRecord 列表与列式存储（core.answer_columns）每条作答记录占用的字节数
+记录ID、学生ID、题目ID 均为 UUID 字符串（与线上数据一致），学生数为记录数的 1/200，题目 20000 道
+
+列式存储分别统计：
+  - 列文件字节数（mmap 映射，按需换入，可被操作系统回收）
+  - Python 堆（字典编码表与按学生/题目的下标索引）
+
+用法: python benchmark_answer_memory.py [记录数量 ...]    默认 100000 1000000
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_tracker import AnswerTracker
+
+QUESTION_COUNT = 20_000
+
+
+def make_items(count: int):
+    """生成记录字段（字符串在各方案间共享，不计入被测结构）"""
+    students = [str(uuid.uuid4()) for _ in range(max(1, count // 200))]
+    questions = [str(uuid.uuid4()) for _ in range(QUESTION_COUNT)]
+    start = datetime(2025, 1, 1)
+    return [
+        {
+            "recordId": str(uuid.uuid4()),
+            "studentId": students[i % len(students)],
+            "questionId": questions[(i * 7919) % QUESTION_COUNT],
+            "userAnswer": "ABCD"[i % 4],
+            "isCorrect": i % 3 != 0,
+            "timeSpent": 30 + i % 90,
+            "answeredAt": (start + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+
+
+def measure_models(items) -> float:
+    """AnswerRecord 列表每条记录的堆内存"""
+    gc.collect()
+    tracemalloc.start()
+    records = [AnswerRecord(**item) for item in items]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current / len(items)
+
+
+def measure_columns(items, directory: str):
+    """列式存储每条记录的 (列文件字节数, 堆内存)，以及重新打开的耗时"""
+    records = [AnswerRecord(**item) for item in items]
+    tracker = AnswerTracker(os.path.join(directory, "answer_records.json"), log=False)
+    tracker.records = records
+    del records, tracker
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tracker = AnswerTracker(os.path.join(directory, "answer_records.json"), log=False)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    heap, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    store = tracker.columns
+    file_bytes = sum(
+        column.data.dtype.itemsize * store.count for column in store.columns.values()
+    ) + int(store.columns["record_end"].data[store.count - 1])
+    return file_bytes / len(items), heap / len(items), elapsed
+
+
+def main():
+    """主函数"""
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+
+    print(f"{'记录数':>10} {'AnswerRecord':>14} {'列文件':>10} {'列-堆内存':>10} {'节省(堆)':>9} {'打开列存储':>10}")
+    for count in counts:
+        items = make_items(count)
+        model_bytes = measure_models(items)
+        with tempfile.TemporaryDirectory() as tmp:
+            file_bytes, heap_bytes, elapsed = measure_columns(items, tmp)
+        print(f"{count:>10} {model_bytes:>12.0f} B {file_bytes:>8.0f} B {heap_bytes:>8.0f} B "
+              f"{1 - heap_bytes / model_bytes:>8.1%} {elapsed:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+作答记录分片基准：比较不同分片数下多线程并发 add_record 的吞吐量，以及合并各分片计算全库质量统计的耗时
+写入使用 fsync=always（每条记录同步落盘），并发线程模拟同时提交答案的大量学生
+
+用法: python benchmark_answer_shards.py [写入记录数] [并发线程数] [统计记录数]    默认 4000 16 200000
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_shards import ShardedAnswerTracker
+from core.answer_tracker import AnswerTracker
+from core.quality_stats import compute_encoded_stats
+
+SHARD_COUNTS = (1, 2, 4, 8)
+START = datetime(2025, 1, 1)
+
+
+def make_record(i: int, students: int = 2000) -> AnswerRecord:
+    return AnswerRecord.model_construct(
+        recordId=f"r_{i}",
+        studentId=f"s_{(i * 7) % students}",
+        questionId=f"q_{(i * 7919) % 20000}",
+        userAnswer="ABCD"[i % 4],
+        isCorrect=(i * 13) % 5 < 3,
+        timeSpent=30 + i % 90,
+        answeredAt=START + timedelta(seconds=i),
+    )
+
+
+def make_tracker(directory: str, shards: int, **options):
+    """分片数为 1 时使用未分片的 AnswerTracker"""
+    data_file = os.path.join(directory, "answer_records.json")
+    if shards == 1:
+        return AnswerTracker(data_file, **options)
+    return ShardedAnswerTracker(shards, data_file, **options)
+
+
+def write_throughput(directory: str, shards: int, records, threads: int) -> float:
+    """并发写入，返回每秒写入的记录数"""
+    tracker = make_tracker(directory, shards, log_fsync="always")
+    workers = [
+        threading.Thread(target=lambda part: [tracker.add_record(r) for r in part], args=(records[i::threads],))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    assert len(tracker.records) == len(records)
+    return len(records) / elapsed
+
+
+def stats_time(directory: str, shards: int, records) -> float:
+    """合并（或单个存储）编码 + 全库质量统计的耗时"""
+    tracker = make_tracker(directory, shards, log=False)
+    tracker.records = records
+    start = time.perf_counter()
+    compute_encoded_stats(tracker.encoded_records()[0])
+    return time.perf_counter() - start
+
+
+def main():
+    """主函数"""
+    writes = int(sys.argv[1]) if len(sys.argv) > 1 else 4000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    stats_records = int(sys.argv[3]) if len(sys.argv) > 3 else 200_000
+
+    records = [make_record(i) for i in range(writes)]
+    big = [make_record(i, students=max(1, stats_records // 200)) for i in range(stats_records)]
+
+    print(f"并发写入 {writes} 条（{threads} 个线程，fsync=always）；全库统计 {stats_records} 条")
+    print(f"{'分片数':>6} {'写入吞吐':>14} {'全库统计':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for shards in SHARD_COUNTS:
+            throughput = write_throughput(os.path.join(tmp, f"w{shards}"), shards, records, threads)
+            elapsed = stats_time(os.path.join(tmp, f"s{shards}"), shards, big)
+            print(f"{shards:>6} {throughput:>10.0f} 条/秒 {elapsed:>9.2f}s")
+
+
+if __name__ == "__main__":
+    main()
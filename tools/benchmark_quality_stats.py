@@ -0,0 +1,69 @@
+"""
+题目质量统计基准：比较逐题调用 calculate_question_stats 与一次向量化计算全部题目的耗时
+生成指定数量的作答记录（学生数为记录数的 1/200，题目 20000 道）；
+逐题计算每题都要重扫全部记录，只对少量题目计时后按题目数折算全库耗时
+
+用法: python benchmark_quality_stats.py [记录数量 ...]    默认 100000 1000000
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import AnswerRecord
+from core.answer_tracker import AnswerTracker
+from core.quality_stats import EncodedRecords, compute_encoded_stats
+
+QUESTION_COUNT = 20_000
+SAMPLES = 3
+
+
+def make_records(count: int):
+    """直接构造记录（跳过校验，只为节省生成时间）"""
+    students = max(1, count // 200)
+    start = datetime(2025, 1, 1)
+    return [
+        AnswerRecord.model_construct(
+            recordId=f"r_{i}",
+            studentId=f"s_{i % students}",
+            questionId=f"q_{(i * 7919) % QUESTION_COUNT}",
+            userAnswer="ABCD"[(i * 31) % 4],
+            isCorrect=(i * 13) % 5 < 3,
+            timeSpent=30 + i % 90,
+            answeredAt=start + timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+def main():
+    """主函数"""
+    counts = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+
+    print(f"{'记录数':>10} {'题目数':>8} {'逐题(每题)':>12} {'逐题(全库折算)':>14} {'向量化(全库)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in counts:
+            tracker = AnswerTracker(os.path.join(tmp, f"answers_{count}.json"), log=False)
+            tracker.records = make_records(count)
+
+            start = time.perf_counter()
+            stats = compute_encoded_stats(EncodedRecords.from_columns(tracker.columns.view()))
+            vectorized = time.perf_counter() - start
+
+            sample = [s.questionId for s in stats[:SAMPLES]]
+            start = time.perf_counter()
+            for qid in sample:
+                tracker.calculate_question_stats(qid)
+            per_question = (time.perf_counter() - start) / len(sample)
+
+            print(f"{count:>10} {len(stats):>8} {per_question * 1000:>10.1f}ms "
+                  f"{per_question * len(stats):>13.1f}s {vectorized:>11.2f}s")
+            del tracker
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+内存基准：比较 QuestionMetadata 与紧凑记录（CompactQuestion，可选冷热分离）每道题占用的字节数
+以 data/questions.json 中的题目为样本复制出指定数量的题目（题干各不相同，标签沿用样本）
+
+用法: python benchmark_question_memory.py [题目数量 ...]    默认 10000 100000
+"""
+import gc
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from schemas import QuestionMetadata
+from core.compact_question import CompactQuestion
+from core.cold_store import ColdStore
+
+
+def make_dataset(samples, count: int) -> str:
+    """生成 count 道题目的JSON文本"""
+    items = []
+    for i in range(count):
+        item = dict(samples[i % len(samples)])
+        item["questionId"] = f"bench_{i}"
+        item["question"] = f"{item['question']} （{i}）"
+        item["solution"] = f"{item['solution']} （{i}）"
+        items.append(item)
+    return json.dumps(items, ensure_ascii=False)
+
+
+def measure(raw: str, count: int, compact: bool, cold: bool = False) -> float:
+    """按 QuestionBank.load 的方式加载题目，返回每道题常驻内存的字节数（冷数据文件不计入）"""
+    gc.collect()
+    tracemalloc.start()
+    items = json.loads(raw)
+    questions = [QuestionMetadata(**item) for item in items]
+    del items
+    if compact:
+        cold_store = ColdStore() if cold else None
+        questions = [CompactQuestion.from_model(q, cold_store) for q in questions]
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del questions
+    return current / count
+
+
+def main():
+    """主函数"""
+    counts = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    data_file = Path(__file__).parent.parent / "data" / "questions.json"
+    with open(data_file, 'r', encoding='utf-8') as f:
+        samples = [item for item in json.load(f) if "questionId" in item]
+
+    print(f"{'题目数':>8} {'QuestionMetadata':>18} {'CompactQuestion':>17} {'节省':>7} "
+          f"{'+冷热分离':>12} {'节省':>7} {'to_model':>10}")
+    for count in counts:
+        raw = make_dataset(samples, count)
+        model_bytes = measure(raw, count, compact=False)
+        compact_bytes = measure(raw, count, compact=True)
+        cold_bytes = measure(raw, count, compact=True, cold=True)
+
+        # 转换回模型的开销（API 边界上每道题都要付出）
+        records = [CompactQuestion.from_model(QuestionMetadata(**item)) for item in json.loads(raw)[:10_000]]
+        start = time.perf_counter()
+        for record in records:
+            record.to_model()
+        per_model_us = (time.perf_counter() - start) / len(records) * 1e6
+
+        print(f"{count:>8} {model_bytes:>16.0f} B {compact_bytes:>15.0f} B {1 - compact_bytes / model_bytes:>6.1%} "
+              f"{cold_bytes:>12.0f} B {1 - cold_bytes / model_bytes:>6.1%} {per_model_us:>7.1f} µs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+启动时间基准：比较逐条 pydantic 校验加载与启动快照加载
+在临时目录中生成题库和作答记录，分别计时：
+  - 无快照：每次启动都逐条校验
+  - 首次启动：逐条校验并写入快照
+  - 再次启动：由快照恢复紧凑记录与索引（不经校验，也不重建索引）
+作答记录没有单独的无快照模式：首次启动从 JSON 逐条校验导入列存储，再次启动直接映射列文件
+
+用法: python benchmark_startup.py [题目数量] [作答记录数量]    默认 100000 1000000
+"""
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.question_bank import QuestionBank
+from core.answer_tracker import AnswerTracker
+
+
+def timed(factory):
+    """返回 (对象, 耗时秒数)"""
+    start = time.perf_counter()
+    result = factory()
+    return result, time.perf_counter() - start
+
+
+def write_questions(path: str, samples, count: int):
+    items = []
+    for i in range(count):
+        item = dict(samples[i % len(samples)])
+        item["questionId"] = f"bench_{i}"
+        items.append(item)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f, ensure_ascii=False)
+
+
+def write_records(path: str, count: int):
+    start = datetime(2025, 1, 1)
+    items = [
+        {
+            "recordId": f"r_{i}",
+            "studentId": f"s_{i % 5000}",
+            "questionId": f"bench_{i % 10000}",
+            "userAnswer": "A",
+            "isCorrect": i % 3 != 0,
+            "timeSpent": 30 + i % 90,
+            "answeredAt": (start + timedelta(seconds=i)).isoformat(),
+        }
+        for i in range(count)
+    ]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(items, f)
+
+
+def report(name: str, count: int, load):
+    """分别计时无快照、首次启动（写快照）、再次启动（读快照）"""
+    _, plain = timed(lambda: load(False))
+    _, first = timed(lambda: load(True))
+    _, warm = timed(lambda: load(True))
+    print(f"{name:<14} {count:>9} {plain:>9.2f}s {first:>9.2f}s {warm:>9.2f}s {plain / warm:>7.1f}x")
+
+
+def main():
+    """主函数"""
+    question_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    record_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000
+
+    data_file = Path(__file__).parent.parent / "data" / "questions.json"
+    with open(data_file, 'r', encoding='utf-8') as f:
+        samples = [item for item in json.load(f) if "questionId" in item]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        questions_file = os.path.join(tmp, "questions.json")
+        records_file = os.path.join(tmp, "answer_records.json")
+        write_questions(questions_file, samples, question_count)
+        write_records(records_file, record_count)
+
+        print(f"{'数据':<14} {'条数':>9} {'无快照':>10} {'首次启动':>10} {'再次启动':>10} {'加速':>8}")
+        report("QuestionBank", question_count,
+               lambda snapshot: QuestionBank(questions_file, journal=False, snapshot=snapshot))
+
+        def load_records(fresh: bool):
+            if fresh:
+                for path in glob.glob(os.path.join(tmp, "answer_records.columns*")):
+                    shutil.rmtree(path) if os.path.isdir(path) else os.remove(path)
+            return AnswerTracker(records_file, log=False)
+
+        _, imported = timed(lambda: load_records(True))
+        _, warm = timed(lambda: load_records(False))
+        print(f"{'AnswerTracker':<14} {record_count:>9} {imported:>9.2f}s {imported:>9.2f}s "
+              f"{warm:>9.2f}s {imported / warm:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+多进程内存基准：比较各工作进程私有冷数据文件与共享冷数据文件的内存占用
+启动若干个独立进程（与 uvicorn --workers 相同，各自导入并加载题库），
+每个进程读取全部题目的冷字段后报告：
+  - 私有冷数据字节数（各进程各有一份，页缓存中 N 份）
+  - 共享冷数据文件字节数（所有进程映射同一个文件，页缓存中 1 份）
+  - PSS（按共享进程数分摊后的常驻内存，仅 Linux）
+
+用法: python benchmark_workers.py [题目数量] [进程数]    默认 20000 4
+"""
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.question_bank import QuestionBank
+
+
+def pss_bytes() -> int:
+    """当前进程的 PSS（字节），无法读取时返回 0"""
+    try:
+        with open("/proc/self/smaps_rollup", 'r') as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def worker(data_file: str, shared: bool, ready, results, release):
+    bank = QuestionBank(data_file, journal=False, snapshot=False, shared_cold_store=shared)
+    for qid in bank.questions:
+        bank.get(qid)
+    store = bank._cold_store
+    shared_size = store.shared.size if store.shared is not None else 0
+    ready.wait()
+    results.put((store.size, shared_size, pss_bytes()))
+    # 等所有进程都报告后再退出，PSS 才能反映共享情况
+    release.wait()
+
+
+def run(data_file: str, workers: int, shared: bool):
+    ctx = multiprocessing.get_context("spawn")
+    ready, release = ctx.Barrier(workers), ctx.Event()
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(data_file, shared, ready, results, release))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    reports = [results.get() for _ in processes]
+    release.set()
+    for process in processes:
+        process.join()
+
+    private = sum(r[0] for r in reports)
+    shared_file = max(r[1] for r in reports)
+    pss = sum(r[2] for r in reports)
+    label = "共享" if shared else "私有"
+    print(f"{label:<6} {workers:>6} {private / 1e6:>12.1f} MB {shared_file / 1e6:>12.1f} MB "
+          f"{(private + shared_file) / 1e6:>10.1f} MB {pss / 1e6:>10.1f} MB")
+
+
+def main():
+    """主函数"""
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+
+    data_file = Path(__file__).parent.parent / "data" / "questions.json"
+    with open(data_file, 'r', encoding='utf-8') as f:
+        samples = [item for item in json.load(f) if "questionId" in item]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        questions_file = os.path.join(tmp, "questions.json")
+        items = []
+        for i in range(count):
+            item = dict(samples[i % len(samples)])
+            item["questionId"] = f"bench_{i}"
+            item["solution"] = f"{item['solution']} （{i}）"
+            items.append(item)
+        with open(questions_file, 'w', encoding='utf-8') as f:
+            json.dump(items, f, ensure_ascii=False)
+
+        print(f"{'冷数据':<5} {'进程数':>5} {'私有文件合计':>12} {'共享文件':>13} {'页缓存合计':>10} {'PSS合计':>11}")
+        run(questions_file, workers, shared=False)
+        run(questions_file, workers, shared=True)
+
+
+if __name__ == "__main__":
+    main()
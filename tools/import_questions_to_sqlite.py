@@ -0,0 +1,37 @@
+"""
+一次性导入脚本：将 questions.json 导入SQLite题库
+导入后设置 QUESTION_BANK_BACKEND=sqlite 即可切换存储后端
+"""
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.question_bank_sqlite import SQLiteQuestionBank, DEFAULT_DB_FILE
+
+
+def main():
+    """主函数"""
+    default_input = str(Path(__file__).parent.parent / "data" / "questions.json")
+
+    input_file = sys.argv[1] if len(sys.argv) > 1 else default_input
+    db_file = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_DB_FILE
+
+    if not os.path.exists(input_file):
+        print(f"错误：文件不存在 {input_file}")
+        print(f"用法: python import_questions_to_sqlite.py [输入文件路径] [数据库路径]")
+        return
+
+    bank = SQLiteQuestionBank(db_file)
+    count = bank.import_from_json(input_file)
+
+    print(f"✅ 已导入 {count} 道题目到 {db_file}")
+    stats = bank.get_statistics()
+    print(f"题库总数：{stats['total']}")
+    for level, num in stats['difficultyStats'].items():
+        print(f"  {level}: {num}")
+
+
+if __name__ == "__main__":
+    main()